@@ -5,10 +5,22 @@ Categories: navigation, DOM reading, interaction, scroll, keyboard,
             tab management, screenshot, file/download, page state, control.
 """
 
+import atexit
+import functools
+import hashlib
+import inspect
+import io
 import os as _os_init
-from flask import Flask, jsonify, request, Response, send_from_directory
+import shutil
+import sys
+import tempfile
+import threading
+import orjson
+from flask import Flask, g, request, Response, send_file, send_from_directory
+from flask_compress import Compress
 from flask_cors import CORS
 from browser_manager import BrowserManager
+import compressor_manager
 import config
 
 # Serve frontend — check two locations:
@@ -27,8 +39,18 @@ for _d in _FRONTEND_CANDIDATES:
 _HAS_FRONTEND = _FRONTEND_DIST is not None
 
 app = Flask(__name__, static_folder=_FRONTEND_DIST if _HAS_FRONTEND else None, static_url_path="" if _HAS_FRONTEND else None)
+app.url_map.strict_slashes = False  # /api/x/ matches /api/x without a redirect
 CORS(app)
 
+# HTTP compression (br/gzip) — opt-in per endpoint for the large DOM/HTML replies
+app.config.update(
+    COMPRESS_REGISTER=False,
+    COMPRESS_MIMETYPES=["application/json", "text/html", "text/plain"],
+    COMPRESS_ALGORITHM=["br", "gzip"],
+    COMPRESS_LEVEL=4,
+)
+compress = Compress(app)
+
 # Chat Agent API (orchestrator layer)
 from routes.chat import chat_bp
 app.register_blueprint(chat_bp)
@@ -40,6 +62,7 @@ class _PlaywrightThreadProxy:
     threaded=True serves each request on a different thread.  This proxy
     ensures every manager.xxx() call runs on the single Playwright worker
     thread, preventing "cannot switch to a different thread" errors.
+    Methods marked @_off_pw_thread run on the calling thread instead.
     """
 
     def __init__(self, target: BrowserManager):
@@ -48,7 +71,8 @@ class _PlaywrightThreadProxy:
 
     def __getattr__(self, name):
         attr = getattr(self._target, name)
-        if not callable(attr) or name.startswith('_'):
+        if (not callable(attr) or name.startswith('_')
+                or getattr(attr, 'off_pw_thread', False)):
             return attr
 
         def wrapper(*args, **kwargs):
@@ -58,27 +82,83 @@ class _PlaywrightThreadProxy:
 
 manager = _PlaywrightThreadProxy(BrowserManager())
 
+# Select-all modifier for the legacy /type path — the OS can't change at runtime
+_MOD_KEY = "Meta" if sys.platform == "darwin" else "Control"
+
+# Max seconds the legacy selector paths wait for the browser lock before 429
+_LOCK_WAIT = 2.0
+
+# Accepted truthy spellings for boolean query params (?lite=1)
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+
+def _json(obj, status=200):
+    """Serialize *obj* with orjson (UTF-8 bytes, no ASCII escaping)."""
+    return Response(orjson.dumps(obj), status=status, mimetype="application/json")
+
+
+def _png(data):
+    """Stream PNG bytes back in chunks (Range-aware) instead of one blob."""
+    resp = send_file(io.BytesIO(data), mimetype="image/png", conditional=True)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
 
 def _body():
-    return request.get_json(force=True, silent=True) or {}
+    """Parse the JSON request body once per request ({} if missing/invalid).
 
+    The raw bytes are read with cache=False so Flask doesn't keep a second
+    copy; the parsed dict is stashed on ``g`` for repeat calls in one request.
+    """
+    if "body" in g:
+        return g.body
+    data = request.get_data(cache=False)
+    body = {}
+    if data:
+        try:
+            body = orjson.loads(data) or {}
+        except orjson.JSONDecodeError:
+            body = {}
+    g.body = body
+    return body
 
-def _err(msg, code=400):
-    return jsonify({"status": "error", "message": msg}), code
 
+def _err(msg, code=400):
+    return _json({"status": "error", "message": msg}, code)
 
-def _rd(body=None):
-    """Extract refresh_dom flag from request body (default True)."""
-    if body is None:
-        body = _body()
-    return body.get("refresh_dom", True)
 
+def _api(view):
+    """Route wrapper shared by the browser endpoints.
 
-def _fields(body=None):
-    """Extract optional fields list from request body."""
-    if body is None:
-        body = _body()
-    return body.get("fields")
+    Parses the body once and passes ``body`` / ``rd`` (refresh_dom, default
+    True) / ``fld`` (fields) to the view — only the ones it declares, worked
+    out once at import time.  Plain return values are sent through _json();
+    Response objects and (body, status) tuples pass through untouched.  Any
+    exception becomes a 400 via _err().
+    """
+    params = inspect.signature(view).parameters
+    want_body = "body" in params
+    want_rd = "rd" in params
+    want_fld = "fld" in params
+
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        if want_body or want_rd or want_fld:
+            body = _body()
+            if want_body:
+                kwargs["body"] = body
+            if want_rd:
+                kwargs["rd"] = body.get("refresh_dom", True)
+            if want_fld:
+                kwargs["fld"] = body.get("fields")
+        try:
+            result = view(**kwargs)
+        except Exception as e:
+            return _err(str(e))
+        if isinstance(result, (Response, tuple)):
+            return result
+        return _json(result)
+    return wrapper
 
 
 # ======================================================================
@@ -86,45 +166,33 @@ def _fields(body=None):
 # ======================================================================
 
 @app.route("/api/browser/open", methods=["POST"])
-def api_open():
-    body = _body()
-    url = body.get("url")
-    try:
-        return jsonify(manager.open(url, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_open(body, rd, fld):
+    return manager.open(body.get("url"), refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/back", methods=["POST"])
-def api_back():
-    try:
-        return jsonify(manager.back(refresh_dom=_rd(), fields=_fields()))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_back(rd, fld):
+    return manager.back(refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/forward", methods=["POST"])
-def api_forward():
-    try:
-        return jsonify(manager.forward(refresh_dom=_rd(), fields=_fields()))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_forward(rd, fld):
+    return manager.forward(refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/refresh", methods=["POST"])
-def api_refresh():
-    try:
-        return jsonify(manager.refresh(refresh_dom=_rd(), fields=_fields()))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_refresh(rd, fld):
+    return manager.refresh(refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/url", methods=["GET"])
+@_api
 def api_get_url():
-    try:
-        return jsonify(manager.get_url())
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_url()
 
 
 # ======================================================================
@@ -132,6 +200,8 @@ def api_get_url():
 # ======================================================================
 
 @app.route("/api/browser/dom", methods=["GET", "POST"])
+@compress.compressed()
+@_api
 def api_get_dom():
     fields = None
     lite = False
@@ -140,63 +210,50 @@ def api_get_dom():
         fields = body.get("fields")
         lite = bool(body.get("lite", False))
     else:
-        if request.args.get("fields"):
-            fields = request.args.get("fields").split(",")
-        lite = request.args.get("lite", "").lower() in ("1", "true", "yes")
-    try:
-        return jsonify(manager.get_dom(fields=fields, lite=lite))
-    except Exception as e:
-        return _err(str(e))
+        raw = request.args.get("fields")
+        fields = raw.split(",") if raw else None
+        lite = request.args.get("lite", "").lower() in _TRUTHY
+    return manager.get_dom(fields=fields, lite=lite)
 
 
 @app.route("/api/browser/dom/detail", methods=["POST"])
-def api_get_dom_detail():
-    node_id = _body().get("node_id")
+@_api
+def api_get_dom_detail(body):
+    node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.get_dom_detail(node_id))
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_dom_detail(node_id)
 
 
 @app.route("/api/browser/dom/children", methods=["POST"])
-def api_get_dom_children():
-    node_id = _body().get("node_id")
+@_api
+def api_get_dom_children(body):
+    node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.get_dom_children(node_id))
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_dom_children(node_id)
 
 
 @app.route("/api/browser/dom/source", methods=["POST"])
-def api_get_dom_source():
-    node_id = _body().get("node_id")
+@_api
+def api_get_dom_source(body):
+    node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.get_dom_source(node_id))
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_dom_source(node_id, body.get("max_length"))
 
 
 @app.route("/api/browser/source", methods=["GET"])
+@compress.compressed()
+@_api
 def api_get_page_source():
-    try:
-        return jsonify(manager.get_page_source())
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_page_source()
 
 
 @app.route("/api/browser/text", methods=["POST"])
-def api_get_text():
-    node_id = _body().get("node_id")
-    try:
-        return jsonify(manager.get_text(node_id))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_get_text(body):
+    return manager.get_text(body.get("node_id"))
 
 
 # ======================================================================
@@ -204,141 +261,115 @@ def api_get_text():
 # ======================================================================
 
 @app.route("/api/browser/click", methods=["POST"])
-def api_click():
-    body = _body()
+@_api
+def api_click(body, rd, fld):
     node_id = body.get("node_id")
     selector = body.get("selector")
-    rd = _rd(body)
-    fld = _fields(body)
     if not node_id and not selector:
         return _err("node_id or selector is required")
+    if node_id:
+        return manager.click(node_id, refresh_dom=rd, fields=fld)
+    # Legacy: direct CSS selector from frontend
+    # Bind the lock: a session reset swaps manager._lock meanwhile
+    lock = manager._lock
+    if not lock.acquire(timeout=_LOCK_WAIT):
+        return _err("Browser is busy, try again", 429)
     try:
-        if node_id:
-            return jsonify(manager.click(node_id, refresh_dom=rd, fields=fld))
-        # Legacy: direct CSS selector from frontend
-        with manager._lock:
-            manager._ensure_open()
-            manager._page.locator(selector).first.click(timeout=5000)
-            result = manager._action_result("Clicked element", refresh_dom=rd, fields=fld)
-        return jsonify(result)
-    except Exception as e:
-        return _err(str(e))
+        manager._ensure_open()
+        manager._page.locator(selector).first.click(timeout=5000)
+        return manager._action_result("Clicked element", refresh_dom=rd, fields=fld)
+    finally:
+        lock.release()
 
 
 @app.route("/api/browser/input", methods=["POST"])
-def api_input_text():
-    body = _body()
+@_api
+def api_input_text(body, rd, fld):
     node_id = body.get("node_id")
-    text = body.get("text", "")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.input_text(node_id, text, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.input_text(node_id, body.get("text", ""), refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/type", methods=["POST"])
-def api_type():
+@_api
+def api_type(body, rd, fld):
     """Accepts both node_id and legacy selector. Uses keyboard events."""
-    body = _body()
     node_id = body.get("node_id")
     selector = body.get("selector")
     text = body.get("text", "")
-    rd = _rd(body)
-    fld = _fields(body)
     if not node_id and not selector:
         return _err("node_id or selector is required")
-    try:
-        if node_id:
-            return jsonify(manager.input_text(node_id, text, refresh_dom=rd, fields=fld))
-        # Legacy: direct CSS selector from frontend — use keyboard events
-        with manager._lock:
-            manager._ensure_open()
-            manager._page.locator(selector).first.click(timeout=5000)
-            mod = "Meta" if manager._is_mac() else "Control"
-            manager._page.keyboard.press(f"{mod}+a")
-            manager._page.keyboard.type(text, delay=20)
-            result = manager._action_result("Typed into element", refresh_dom=rd, fields=fld)
-        return jsonify(result)
-    except Exception as e:
-        return _err(str(e))
+    if node_id:
+        return manager.input_text(node_id, text, refresh_dom=rd, fields=fld)
+    # Legacy: direct CSS selector from frontend — use keyboard events
+    # Bind the lock: a session reset swaps manager._lock meanwhile
+    lock = manager._lock
+    if not lock.acquire(timeout=_LOCK_WAIT):
+        return _err("Browser is busy, try again", 429)
+    try:
+        manager._ensure_open()
+        manager._page.locator(selector).first.click(timeout=5000)
+        manager._page.keyboard.press(f"{_MOD_KEY}+a")
+        manager._page.keyboard.type(text, delay=20)
+        return manager._action_result("Typed into element", refresh_dom=rd, fields=fld)
+    finally:
+        lock.release()
 
 
 @app.route("/api/browser/fill", methods=["POST"])
-def api_fill():
+@_api
+def api_fill(body, rd, fld):
     """Fast-path fill using Playwright .fill() for simple forms."""
-    body = _body()
     node_id = body.get("node_id")
-    text = body.get("text", "")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.fill_text(node_id, text, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.fill_text(node_id, body.get("text", ""), refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/select", methods=["POST"])
-def api_select():
-    body = _body()
+@_api
+def api_select(body, rd, fld):
     node_id = body.get("node_id")
-    value = body.get("value", "")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.select(node_id, value, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.select(node_id, body.get("value", ""), refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/check", methods=["POST"])
-def api_check():
-    body = _body()
+@_api
+def api_check(body, rd, fld):
     node_id = body.get("node_id")
-    checked = body.get("checked", True)
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.check(node_id, checked, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.check(node_id, body.get("checked", True), refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/submit", methods=["POST"])
-def api_submit():
-    body = _body()
+@_api
+def api_submit(body, rd, fld):
     node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.submit(node_id, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.submit(node_id, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/hover", methods=["POST"])
-def api_hover():
-    body = _body()
+@_api
+def api_hover(body, rd, fld):
     node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.hover(node_id, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.hover(node_id, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/focus", methods=["POST"])
-def api_focus():
-    body = _body()
+@_api
+def api_focus(body, rd, fld):
     node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.focus(node_id, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.focus(node_id, refresh_dom=rd, fields=fld)
 
 
 # ======================================================================
@@ -346,35 +377,30 @@ def api_focus():
 # ======================================================================
 
 @app.route("/api/browser/scroll/down", methods=["POST"])
-def api_scroll_down():
-    body = _body()
-    pixels = body.get("pixels", config.get("scroll_pixels"))
-    try:
-        return jsonify(manager.scroll_down(pixels, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_scroll_down(body, rd, fld):
+    pixels = body.get("pixels")
+    if pixels is None:
+        pixels = config.get("scroll_pixels")
+    return manager.scroll_down(pixels, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/scroll/up", methods=["POST"])
-def api_scroll_up():
-    body = _body()
-    pixels = body.get("pixels", config.get("scroll_pixels"))
-    try:
-        return jsonify(manager.scroll_up(pixels, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_scroll_up(body, rd, fld):
+    pixels = body.get("pixels")
+    if pixels is None:
+        pixels = config.get("scroll_pixels")
+    return manager.scroll_up(pixels, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/scroll/to", methods=["POST"])
-def api_scroll_to():
-    body = _body()
+@_api
+def api_scroll_to(body, rd, fld):
     node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.scroll_to(node_id, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.scroll_to(node_id, refresh_dom=rd, fields=fld)
 
 
 # ======================================================================
@@ -382,27 +408,21 @@ def api_scroll_to():
 # ======================================================================
 
 @app.route("/api/browser/keypress", methods=["POST"])
-def api_keypress():
-    body = _body()
+@_api
+def api_keypress(body, rd, fld):
     key = body.get("key")
     if not key:
         return _err("key is required")
-    try:
-        return jsonify(manager.keypress(key, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.keypress(key, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/hotkey", methods=["POST"])
-def api_hotkey():
-    body = _body()
+@_api
+def api_hotkey(body, rd, fld):
     keys = body.get("keys")
     if not keys:
         return _err("keys is required")
-    try:
-        return jsonify(manager.hotkey(keys, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.hotkey(keys, refresh_dom=rd, fields=fld)
 
 
 # ======================================================================
@@ -410,42 +430,31 @@ def api_hotkey():
 # ======================================================================
 
 @app.route("/api/browser/tabs", methods=["GET"])
+@_api
 def api_get_tabs():
-    try:
-        return jsonify(manager.get_tabs())
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_tabs()
 
 
 @app.route("/api/browser/tabs/switch", methods=["POST"])
-def api_switch_tab():
-    body = _body()
+@_api
+def api_switch_tab(body, rd, fld):
     tab_id = body.get("tab_id")
     if tab_id is None:
         return _err("tab_id is required")
-    try:
-        return jsonify(manager.switch_tab(int(tab_id), refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.switch_tab(int(tab_id), refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/tabs/close", methods=["POST"])
-def api_close_tab():
-    tab_id = _body().get("tab_id")
-    try:
-        return jsonify(manager.close_tab(int(tab_id) if tab_id is not None else None))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_close_tab(body):
+    tab_id = body.get("tab_id")
+    return manager.close_tab(int(tab_id) if tab_id is not None else None)
 
 
 @app.route("/api/browser/tabs/new", methods=["POST"])
-def api_new_tab():
-    body = _body()
-    url = body.get("url")
-    try:
-        return jsonify(manager.new_tab(url, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_new_tab(body, rd, fld):
+    return manager.new_tab(body.get("url"), refresh_dom=rd, fields=fld)
 
 
 # ======================================================================
@@ -458,23 +467,18 @@ def api_screenshot():
         png = manager.screenshot()
         if png is None:
             return "", 204
-        return Response(png, mimetype="image/png",
-                        headers={"Cache-Control": "no-store"})
+        return _png(png)
     except Exception as e:
         return "", 204
 
 
 @app.route("/api/browser/screenshot/element", methods=["POST"])
-def api_screenshot_element():
-    node_id = _body().get("node_id")
+@_api
+def api_screenshot_element(body):
+    node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        png = manager.screenshot_element(node_id)
-        return Response(png, mimetype="image/png",
-                        headers={"Cache-Control": "no-store"})
-    except Exception as e:
-        return _err(str(e))
+    return _png(manager.screenshot_element(node_id))
 
 
 # ======================================================================
@@ -482,24 +486,19 @@ def api_screenshot_element():
 # ======================================================================
 
 @app.route("/api/browser/upload", methods=["POST"])
-def api_upload():
-    body = _body()
+@_api
+def api_upload(body, rd, fld):
     node_id = body.get("node_id")
     file_path = body.get("file_path")
     if not node_id or not file_path:
         return _err("node_id and file_path are required")
-    try:
-        return jsonify(manager.upload(node_id, file_path, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.upload(node_id, file_path, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/downloads", methods=["GET"])
+@_api
 def api_get_downloads():
-    try:
-        return jsonify(manager.get_downloads())
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_downloads()
 
 
 # ======================================================================
@@ -507,53 +506,39 @@ def api_get_downloads():
 # ======================================================================
 
 @app.route("/api/browser/cookies", methods=["GET"])
+@_api
 def api_get_cookies():
-    try:
-        return jsonify(manager.get_cookies())
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_cookies()
 
 
 @app.route("/api/browser/cookies/set", methods=["POST"])
-def api_set_cookie():
-    body = _body()
+@_api
+def api_set_cookie(body):
     name = body.get("name")
-    value = body.get("value")
     if not name:
         return _err("name is required")
-    try:
-        return jsonify(manager.set_cookie(name, value or ""))
-    except Exception as e:
-        return _err(str(e))
+    return manager.set_cookie(name, body.get("value") or "")
 
 
 @app.route("/api/browser/viewport", methods=["GET"])
+@_api
 def api_get_viewport():
-    try:
-        return jsonify(manager.get_viewport())
-    except Exception as e:
-        return _err(str(e))
+    return manager.get_viewport()
 
 
 @app.route("/api/browser/wait", methods=["POST"])
-def api_wait():
-    seconds = _body().get("seconds", 1)
-    try:
-        return jsonify(manager.wait(seconds))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_wait(body):
+    return manager.wait(body.get("seconds", 1))
 
 
 @app.route("/api/browser/wait-for", methods=["POST"])
-def api_wait_for():
-    body = _body()
+@_api
+def api_wait_for(body, rd, fld):
     node_id = body.get("node_id")
     if not node_id:
         return _err("node_id is required")
-    try:
-        return jsonify(manager.wait_for(node_id, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.wait_for(node_id, refresh_dom=rd, fields=fld)
 
 
 # ======================================================================
@@ -561,15 +546,13 @@ def api_wait_for():
 # ======================================================================
 
 @app.route("/api/browser/execute-js", methods=["POST"])
-def api_execute_js():
-    body = _body()
+@_api
+def api_execute_js(body, rd, fld):
     script = body.get("script", "")
     if not script:
         return _err("script is required")
-    try:
-        return jsonify(manager.execute_js(script, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.execute_js(script, refresh_dom=rd, fields=fld,
+                              timeout=body.get("timeout"))
 
 
 # ======================================================================
@@ -577,22 +560,26 @@ def api_execute_js():
 # ======================================================================
 
 @app.route("/api/browser/close", methods=["POST"])
-def api_close():
-    body = _body()
-    save_session = body.get("save_session", True)
-    try:
-        return jsonify(manager.close(save_session=save_session))
-    except Exception as e:
-        return _err(str(e))
+@_api
+def api_close(body):
+    return manager.close(save_session=body.get("save_session", True))
 
 
 # ======================================================================
 # Legacy / Frontend-specific endpoints
 # ======================================================================
 
+_last_status: tuple[dict, bytes] | None = None  # (status dict, serialized body)
+
+
 @app.route("/api/browser/status", methods=["GET"])
 def api_status():
-    return jsonify(manager.get_status())
+    """Polled by the frontend — reuse the serialized body while unchanged."""
+    global _last_status
+    status = manager.get_status()
+    if _last_status is None or _last_status[0] != status:
+        _last_status = (status, orjson.dumps(status))
+    return Response(_last_status[1], mimetype="application/json")
 
 
 @app.route("/api/server/shutdown", methods=["POST"])
@@ -604,27 +591,25 @@ def api_server_shutdown():
         _t.sleep(0.5)
         os.kill(os.getpid(), _sig.SIGTERM)
     threading.Thread(target=_shutdown, daemon=True).start()
-    return jsonify({"status": "shutting_down"})
+    return _json({"status": "shutting_down"})
 
 
 @app.route("/api/browser/navigate", methods=["POST"])
-def api_navigate():
-    body = _body()
+@_api
+def api_navigate(body, rd, fld):
     url = body.get("url", "")
     if not url:
         return _err("URL is required")
-    try:
-        return jsonify(manager.open(url, refresh_dom=_rd(body), fields=_fields(body)))
-    except Exception as e:
-        return _err(str(e))
+    return manager.open(url, refresh_dom=rd, fields=fld)
 
 
 @app.route("/api/browser/interactive-dom", methods=["GET"])
+@compress.compressed()
 def api_interactive_dom():
     nodes = manager.get_interactive_dom()
     if nodes is None:
         return "", 204
-    return jsonify({"status": "ok", "nodes": nodes})
+    return _json({"status": "ok", "nodes": nodes})
 
 
 # ======================================================================
@@ -632,7 +617,8 @@ def api_interactive_dom():
 # ======================================================================
 
 @app.route("/api/benchmark", methods=["POST"])
-def api_benchmark():
+@_api
+def api_benchmark(body):
     """Score a page's DOM compression quality.
 
     Body:  {"url": "https://..."}
@@ -640,17 +626,15 @@ def api_benchmark():
 
     Returns: compression stats, completeness %, token saving %, etc.
     """
-    url = _body().get("url")
+    url = body.get("url")
     if not url:
         return _err("url is required")
-    try:
-        return jsonify(manager.benchmark(url))
-    except Exception as e:
-        return _err(str(e))
+    return manager.benchmark(url)
 
 
 @app.route("/api/benchmark/batch", methods=["POST"])
-def api_benchmark_batch():
+@_api
+def api_benchmark_batch(body):
     """Score multiple pages in one call.
 
     Body:  {"urls": ["https://...", "https://..."]}
@@ -658,29 +642,33 @@ def api_benchmark_batch():
 
     Returns: list of benchmark results.
     """
-    urls = _body().get("urls", [])
+    urls = body.get("urls", [])
     if not urls:
         return _err("urls list is required")
-    try:
-        results = manager.benchmark_batch(urls)
-        return jsonify({"status": "ok", "results": results})
-    except Exception as e:
-        return _err(str(e))
+    return {"status": "ok", "results": manager.benchmark_batch(urls)}
 
 
 # ======================================================================
 # Settings — runtime configuration
 # ======================================================================
 
+_config_payload: bytes | None = None  # serialized GET /api/config, reset on set/reset
+
+
 @app.route("/api/config", methods=["GET"])
 def api_config_get():
     """Return all config values (defaults + overrides)."""
-    return jsonify({
-        "status": "ok",
-        "config": config.get_all(),
-        "defaults": config.DEFAULTS,
-        "overrides": config.get_overrides(),
-    })
+    global _config_payload
+    if config.reload_if_stale():  # file edited by hand since last read
+        _config_payload = None
+    if _config_payload is None:
+        _config_payload = orjson.dumps({
+            "status": "ok",
+            "config": config.get_all(),
+            "defaults": dict(config.DEFAULTS),
+            "overrides": config.get_overrides(),
+        })
+    return Response(_config_payload, mimetype="application/json")
 
 
 @app.route("/api/config", methods=["POST"])
@@ -690,6 +678,7 @@ def api_config_set():
     Body:  {"max_nodes": 10000, "nav_timeout": 20000, ...}
     Only known keys are accepted; unknown keys are ignored.
     """
+    global _config_payload
     updates = _body()
     if not updates:
         return _err("No values provided")
@@ -697,6 +686,7 @@ def api_config_set():
     llm_keys = {"llm_provider", "llm_api_key", "llm_api_base", "llm_model"}
     llm_changed = any(k in updates for k in llm_keys)
     config.set_values(updates)
+    _config_payload = None
     # Reload settings singleton + rebuild Doudou's chat agent graph
     if llm_changed:
         try:
@@ -706,14 +696,16 @@ def api_config_set():
             reset_graph()
         except Exception as e:
             print(f"[config] Failed to reset chat graph: {e}")
-    return jsonify({"status": "ok", "config": config.get_all()})
+    return _json({"status": "ok", "config": config.get_all()})
 
 
 @app.route("/api/config/reset", methods=["POST"])
 def api_config_reset():
     """Reset all config to defaults."""
+    global _config_payload
     config.reset()
-    return jsonify({"status": "ok", "config": config.get_all()})
+    _config_payload = None
+    return _json({"status": "ok", "config": config.get_all()})
 
 
 @app.route("/api/models", methods=["GET"])
@@ -752,9 +744,9 @@ def api_models():
                 seen.add(name)
                 models.append(name)
 
-        return jsonify({"status": "ok", "provider": provider, "models": models})
+        return _json({"status": "ok", "provider": provider, "models": models})
     except Exception as e:
-        return jsonify({"status": "ok", "provider": provider, "models": [],
+        return _json({"status": "ok", "provider": provider, "models": [],
                         "warning": str(e)})
 
 
@@ -764,38 +756,42 @@ def api_models():
 
 @app.route("/api/compressors", methods=["GET"])
 def api_compressors_list():
-    """List all compressor scripts."""
-    import compressor_manager
-    return jsonify({"status": "ok", "scripts": compressor_manager.list_scripts()})
+    """List all compressor scripts (metadata only unless ?include_code=1)."""
+    include_code = request.args.get("include_code", "").lower() in _TRUTHY
+    return _json({"status": "ok",
+                  "scripts": compressor_manager.list_scripts(include_code)})
 
 
 @app.route("/api/compressors/template", methods=["GET"])
 def api_compressor_template():
     """Return the new-script template code."""
-    import compressor_manager
-    return jsonify({"status": "ok", "code": compressor_manager.SCRIPT_TEMPLATE})
+    return _json({"status": "ok", "code": compressor_manager.SCRIPT_TEMPLATE})
 
 
 @app.route("/api/compressors/<name>", methods=["GET"])
 def api_compressor_read(name):
-    """Read a script's source code."""
-    import compressor_manager
+    """Read a script's source code (ETag = content hash, 304 if unchanged)."""
     code = compressor_manager.read_script(name)
     if code is None:
         return _err(f"Script '{name}' not found")
-    return jsonify({"status": "ok", "name": name, "code": code})
+    etag = hashlib.blake2b(code.encode("utf-8"), digest_size=8).hexdigest()
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = _json({"status": "ok", "name": name, "code": code})
+    resp.set_etag(etag)
+    return resp
 
 
 @app.route("/api/compressors/<name>", methods=["PUT"])
 def api_compressor_write(name):
     """Create or update a user script."""
-    import compressor_manager
     code = _body().get("code", "")
     if not code.strip():
         return _err("code is required")
     try:
         compressor_manager.write_script(name, code)
-        return jsonify({"status": "ok", "name": name})
+        return _json({"status": "ok", "name": name})
     except ValueError as e:
         return _err(str(e))
     except SyntaxError as e:
@@ -805,10 +801,9 @@ def api_compressor_write(name):
 @app.route("/api/compressors/<name>", methods=["DELETE"])
 def api_compressor_delete(name):
     """Delete a user script."""
-    import compressor_manager
     try:
         compressor_manager.delete_script(name)
-        return jsonify({"status": "ok"})
+        return _json({"status": "ok"})
     except ValueError as e:
         return _err(str(e))
 
@@ -820,18 +815,39 @@ def api_compressor_delete(name):
 import os as _os
 
 _SKILL_DIR = _os.path.join(_os.path.dirname(__file__), "skill")
+_SKILL_REAL = _os.path.realpath(_SKILL_DIR)
 _PORT = 5001  # default, updated in __main__
+# Rendered ({{BASE_URL}}-substituted) copies, served with conditional GET support
+_SKILL_RENDER_DIR = tempfile.mkdtemp(prefix="clawome-skill-")
+atexit.register(shutil.rmtree, _SKILL_RENDER_DIR, True)
+_SKILL_CACHE: dict[str, tuple[float, int]] = {}  # filename → (source mtime, port) rendered
 
 
 def _serve_skill(filename):
-    """Read a skill md file and replace {{BASE_URL}} with actual address."""
+    """Serve a skill md file with {{BASE_URL}} replaced by the actual address.
+
+    Each file is rendered once into _SKILL_RENDER_DIR (again only when its
+    mtime or the port changes) and served from there, so clients get
+    ETag / Last-Modified revalidation and a short max-age.
+    """
     path = _os.path.join(_SKILL_DIR, filename)
-    if not _os.path.isfile(path):
+    try:
+        mtime = _os.stat(path).st_mtime
+    except OSError:
+        _SKILL_CACHE.pop(filename, None)
         return Response("Not found", status=404, content_type="text/plain")
-    with open(path, "r", encoding="utf-8") as f:
-        text = f.read()
-    text = text.replace("{{BASE_URL}}", f"http://localhost:{_PORT}")
-    return Response(text, content_type="text/plain; charset=utf-8")
+    if _SKILL_CACHE.get(filename) != (mtime, _PORT):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        text = text.replace("{{BASE_URL}}", f"http://localhost:{_PORT}")
+        rendered = _os.path.join(_SKILL_RENDER_DIR, filename)
+        tmp = f"{rendered}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        _os.replace(tmp, rendered)
+        _SKILL_CACHE[filename] = (mtime, _PORT)
+    return send_from_directory(_SKILL_RENDER_DIR, filename, mimetype="text/plain",
+                               conditional=True, max_age=60)
 
 
 @app.route("/skill")
@@ -841,10 +857,11 @@ def skill_index():
 
 @app.route("/skill/<name>")
 def skill_file(name):
-    # Only allow .md files, prevent path traversal
-    if not name.endswith(".md") or "/" in name or "\\" in name:
+    # Only allow .md files directly inside the skill dir (resolves ../ and symlinks)
+    path = _os.path.realpath(_os.path.join(_SKILL_DIR, name))
+    if _os.path.dirname(path) != _SKILL_REAL or not path.endswith(".md"):
         return Response("Not found", status=404, content_type="text/plain")
-    return _serve_skill(name)
+    return _serve_skill(_os.path.basename(path))
 
 
 # ── Frontend SPA catch-all ──────────────────────────────────────────
@@ -864,9 +881,14 @@ if _HAS_FRONTEND:
         return send_from_directory(_FRONTEND_DIST, "index.html")
 
 
+# All routes are registered — build the URL matcher now, not on first request
+app.url_map.update()
+
+
 if __name__ == "__main__":
     _PORT = 5001
-    import threading
     from task_agent.chat.orchestrator import warmup
     threading.Thread(target=warmup, daemon=True).start()
-    app.run(debug=True, port=_PORT, threaded=True)
+    # Debugger only on request; never the reloader (it imports everything twice)
+    debug = _os_init.environ.get("CLAWOME_DEBUG") == "1"
+    app.run(debug=debug, port=_PORT, threaded=True, use_reloader=False)
@@ -5,33 +5,128 @@ Categories: navigation, DOM reading, interaction, scroll, keyboard,
             tab management, screenshot, file/download, page state, control.
 """
 
-import json
+import asyncio
+import atexit
 import os
 import platform
 import time
 import tempfile
 import threading
+import collections
 import concurrent.futures
+import functools
+import itertools
+from urllib.parse import urlsplit
+import orjson
 from playwright.sync_api import sync_playwright
 import config as cfg
 
+try:
+    import ahocorasick  # pyahocorasick — single-pass multi-probe search
+except ImportError:
+    ahocorasick = None
+
+_Hints = collections.namedtuple("_Hints", [
+    "prefix_re", "material_re", "semantic_keywords", "clone_sel",
+    "state_classes", "inject_cfg", "walker_cfg",
+])
+
+
+@functools.lru_cache(maxsize=4)
+def _get_hints_cached(version):
+    """Icon/carousel/state hints, their derived JS-regex strings, and the
+    full dom_walker.js config built from them.
+
+    Keyed on cfg.version, so a Settings change produces a fresh entry.
+    """
+    semantic_kw = cfg.get("semantic_keywords")
+    state_classes = cfg.get("switchable_state_classes") or []
+    prefix_re = "|".join(cfg.get("icon_class_prefixes"))
+    material_re = "|".join(
+        c.replace("-", "[_-]") for c in cfg.get("material_icon_classes")
+    )
+    clone_sel = ", ".join(cfg.get("carousel_clone_selectors") or [])
+    return _Hints(
+        prefix_re=prefix_re,
+        material_re=material_re,
+        semantic_keywords=semantic_kw,
+        clone_sel=clone_sel,
+        state_classes=state_classes,
+        inject_cfg={
+            "prefixRe": prefix_re,
+            "materialRe": material_re,
+            "semantic": semantic_kw,
+            "cloneSel": clone_sel,
+            "stateClasses": state_classes,
+        },
+        walker_cfg={
+            "skipTags": [
+                "script", "style", "meta", "link", "noscript",
+                "head", "br", "hr", "iframe", "object", "embed",
+                "template", "slot", "col",
+            ],
+            "inlineTags": [
+                "a", "span", "strong", "em", "b", "i", "u", "s",
+                "code", "kbd", "mark", "small", "sub", "sup",
+                "abbr", "cite", "time", "label",
+            ],
+            "attrRules": {
+                "a": ["href"], "img": ["src", "alt"],
+                "input": ["type", "name", "placeholder", "value"],
+                "textarea": ["name", "placeholder"],
+                "select": ["name"], "option": ["value"],
+                "button": ["type"],
+                "form": ["action", "method"],
+                "video": ["src"], "audio": ["src"],
+                "source": ["src", "type"],
+                "th": ["colspan", "rowspan"], "td": ["colspan", "rowspan"],
+            },
+            "globalAttrs": ["id", "role", "aria-label", "title"],
+            "stateAttrs": [
+                "disabled", "checked", "readonly", "required",
+                "aria-expanded", "aria-selected", "aria-checked",
+                "aria-pressed", "aria-current",
+                "aria-valuenow", "aria-valuemin", "aria-valuemax",
+            ],
+            "maxTextLen": 0,  # 0 = no truncation; agent needs full text
+            "maxDepth": cfg.get("max_depth"),
+            "maxNodes": cfg.get("max_nodes"),
+            "iconPrefixes": prefix_re,
+            "materialClasses": material_re,
+            "semanticKeywords": semantic_kw,
+            "cloneSelectors": clone_sel,
+            "stateClasses": state_classes,
+            "typeableInputTypes": [
+                "text", "search", "email", "password", "url", "tel", "number", "",
+            ],
+            "clickableInputTypes": ["submit", "button", "reset", "image"],
+            "grayTextMinRgb": cfg.get("gray_text_min_rgb"),
+            "grayTextMaxDiff": cfg.get("gray_text_max_diff"),
+            "iconMaxSize": cfg.get("icon_max_size"),
+        },
+    )
+
+
 def _get_hints():
     """Read icon/carousel/state hints from config (runtime-updatable)."""
-    return {
-        "icon_class_prefixes": cfg.get("icon_class_prefixes"),
-        "material_icon_classes": cfg.get("material_icon_classes"),
-        "semantic_keywords": cfg.get("semantic_keywords"),
-        "carousel_clone_selectors": cfg.get("carousel_clone_selectors"),
-        "switchable_state_classes": cfg.get("switchable_state_classes"),
-    }
+    return _get_hints_cached(cfg.version)
 
 _JS_WALKER_PATH = os.path.join(os.path.dirname(__file__), "dom_walker.js")
 _JS_WALKER_MTIME = 0.0
 _JS_DOM_WALKER = ""
+_JS_WALKER_LAST_STAT = 0.0   # monotonic time of the last mtime check
+_JS_WALKER_STAT_INTERVAL = 1.0
 
 def _load_js_walker():
-    """(Re-)load dom_walker.js if file changed — no restart needed."""
-    global _JS_DOM_WALKER, _JS_WALKER_MTIME
+    """(Re-)load dom_walker.js if file changed — no restart needed.
+
+    The file is stat'ed at most once per _JS_WALKER_STAT_INTERVAL seconds.
+    """
+    global _JS_DOM_WALKER, _JS_WALKER_MTIME, _JS_WALKER_LAST_STAT
+    now = time.monotonic()
+    if _JS_DOM_WALKER and now - _JS_WALKER_LAST_STAT < _JS_WALKER_STAT_INTERVAL:
+        return
+    _JS_WALKER_LAST_STAT = now
     try:
         mt = os.path.getmtime(_JS_WALKER_PATH)
     except OSError:
@@ -44,10 +139,529 @@ def _load_js_walker():
 
 _load_js_walker()  # initial load
 
+
+def _unobserved(name: str, fn_src: str) -> str:
+    """JS defining window.<name>(cfg) as *fn_src* run with the page's change
+    observer (window.__bObserver) paused, so our own data-* writes neither
+    flood it nor count as page changes."""
+    return f"""window.{name} = (() => {{
+    const fn = {fn_src}
+    return (cfg) => {{
+        const obs = window.__bObserver
+        if (obs) obs.disconnect()
+        try {{
+            return fn(cfg)
+        }} finally {{
+            if (obs) obs.observe(document, {{
+                childList: true, subtree: true,
+                attributes: true, characterData: true
+            }})
+        }}
+    }}
+}})()"""
+
+
+def _walker_init_script() -> str:
+    """Script that registers the current walker as window.__bWalker.
+
+    Added to the context as an init script so every page already has the
+    walker compiled; __bWalkerVer lets a page with a stale copy be detected.
+    """
+    walker = _JS_DOM_WALKER.rstrip().rstrip(";")
+    return (_unobserved("__bWalker", walker) + ";\n"
+            f"window.__bWalkerVer = {_JS_WALKER_MTIME!r};")
+
+
+# BS4 fallback input: a detached copy of <body> without the tags parse_dom
+# skips anyway, so only markup it actually reads crosses CDP.  htmlLen keeps
+# the full-document size the compression stats are measured against.
+_JS_BODY_SNAPSHOT = """() => {
+    const body = document.body.cloneNode(true)
+    body.querySelectorAll('script, style, noscript, link, meta, template')
+        .forEach(el => el.remove())
+    return {
+        html: body.outerHTML,
+        htmlLen: document.documentElement.outerHTML.length,
+        stamp: [window.__bLastMut ?? null, location.href],
+    }
+}"""
+
+
+# Walker + page size + URL in a single evaluate; null means the page lacks
+# the current walker (see _run_walker).  When *since* (a previous stamp)
+# still matches, the walk is skipped and {unchanged: true} comes back.
+_JS_WALK_CALL = """([cfg, ver, since]) => {
+    if (window.__bWalkerVer !== ver) return null
+    if (since && window.__bLastMut === since[0] && location.href === since[1]) {
+        return {unchanged: true}
+    }
+    const nodes = window.__bWalker(cfg)
+    return {
+        nodes: nodes,
+        htmlLen: document.documentElement.outerHTML.length,
+        url: location.href,
+        stamp: [window.__bLastMut ?? null, location.href],
+    }
+}"""
+
+# Benchmark: visible-only text (same hidden logic as dom_walker), title and
+# a _JS_WALK_CALL result fused into one evaluate.
+_JS_VISIBLE_TEXT = """() => {
+    const SKIP = new Set([
+        'SCRIPT','STYLE','NOSCRIPT','TEMPLATE','SVG','LINK','META',
+        'HEAD','IFRAME','OBJECT','EMBED'
+    ]);
+
+    function isHidden(el) {
+        if (!el || el.nodeType !== 1) return false;
+        if (el.hasAttribute('hidden')) return true;
+        if ((el.getAttribute('aria-hidden') || '').toLowerCase() === 'true') return true;
+        if (el.tagName === 'INPUT' && (el.getAttribute('type') || '').toLowerCase() === 'hidden') return true;
+        if (el.tagName === 'DIALOG' && !el.hasAttribute('open')) return true;
+        const cs = window.getComputedStyle(el);
+        if (cs.display === 'none' || cs.visibility === 'hidden' || cs.opacity === '0') return true;
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 && rect.height === 0 && el.children.length === 0) return true;
+        return false;
+    }
+
+    // One flat buffer joined once — no per-element join of the subtree
+    const out = [];
+    function collectText(el) {
+        if (SKIP.has(el.tagName)) return;
+        if (isHidden(el)) return;
+        for (const child of el.childNodes) {
+            if (child.nodeType === 3) {
+                const t = child.textContent.trim();
+                if (t) out.push(t);
+            } else if (child.nodeType === 1) {
+                collectText(child);
+            }
+        }
+    }
+
+    collectText(document.body);
+    return out.join('\\n');
+}"""
+_JS_BENCH_CALL = ("([cfg, ver]) => ({text: (" + _JS_VISIBLE_TEXT + ")(), "
+                  "title: document.title, "
+                  "walk: (" + _JS_WALK_CALL + ")([cfg, ver, null])})")
+
+_JS_SCROLL_BY = "(d) => window.scrollBy(0, d)"
+
+# Page change stamp [__bLastMut, url].  The walker and injector run with the
+# change observer paused (_unobserved), so only page changes or user input
+# move it.
+_JS_DOM_PEEK = "() => [window.__bLastMut ?? null, location.href]"
+
+
+def _nodes_from_columns(res) -> list[dict]:
+    """Rebuild the walker's per-node dicts from its columnar result."""
+    if not res:
+        return []
+    tags = res["tags"]
+    action_sets = res["actionSets"]
+    c = res["cols"]
+    return [
+        {
+            "idx": idx,
+            "depth": depth,
+            "tag": tags[tag],
+            "attrs": attrs,
+            "text": text,
+            "selector": f'[data-bid="{bid}"]' if bid else "",
+            "xpath": xpath,
+            "actions": action_sets[actions],
+            "label": label,
+            "formLabel": form_label,
+            "state": state,
+            "inlined": inlined,
+        }
+        for idx, (depth, tag, attrs, text, bid, xpath, actions, label,
+                  form_label, state, inlined) in enumerate(zip(
+            c["depth"], c["tag"], c["attrs"], c["text"], c["bid"], c["xpath"],
+            c["actions"], c["label"], c["formLabel"], c["state"], c["inlined"],
+        ), 1)
+    ]
+
+
+def _run_walker(page, walker_cfg, since=None):
+    """Walk *page* in one round-trip.
+
+    Returns (dom_nodes, html_len, url, stamp), or None when *since* is given
+    and the page hasn't changed since that stamp.
+    """
+    args = [walker_cfg, _JS_WALKER_MTIME, since]
+    res = page.evaluate(_JS_WALK_CALL, args)
+    if res is None:
+        # Page predates the init script, or holds an older walker
+        page.evaluate(_walker_init_script())
+        res = page.evaluate(_JS_WALK_CALL, args)
+    if res.get("unchanged"):
+        return None
+    stamp = res["stamp"] if res["stamp"][0] is not None else None
+    return _nodes_from_columns(res["nodes"]), res["htmlLen"], res["url"], stamp
+
 _SESSION_PATH = os.path.join(os.path.dirname(__file__), ".browser_session.json")
+_SESSION_DEBOUNCE = 2.0  # seconds a session save may sit before hitting disk
 
 _USE_JS_WALKER = os.environ.get("CLAWOME_JS_WALKER", "1") == "1"
 
+# Tabs whose last DOM snapshot is kept for unchanged-page reuse
+_SNAPSHOT_PAGES = 16
+
+_IS_MAC = platform.system() == "Darwin"
+
+# Session generation a Playwright worker thread serves (unset elsewhere);
+# see BrowserManager._stale
+_pw_thread = threading.local()
+
+
+def _serve_generation(gen):
+    """Executor initializer: tag a Playwright worker with its session."""
+    _pw_thread.gen = gen
+
+
+class _StaleSession(RuntimeError):
+    """A call ran on a Playwright thread abandoned by a session reset."""
+
+
+# Floor for action_hard_timeout: a tiny limit would reset the session on
+# every call.  Values <= 0 disable the limit.
+_MIN_HARD_TIMEOUT = 5.0
+
+
+def _hard_timeout():
+    """action_hard_timeout in seconds (None = no limit)."""
+    try:
+        ms = float(cfg.get("action_hard_timeout"))
+    except (TypeError, ValueError):
+        ms = float(cfg.DEFAULTS["action_hard_timeout"])
+    if ms <= 0:
+        return None
+    return max(ms / 1000, _MIN_HARD_TIMEOUT)
+
+
+def _close_abandoned(browser, playwright):
+    """Close an abandoned session's browser on the thread that owns it."""
+    if browser:
+        _best_effort(browser.close)
+    if playwright:
+        _best_effort(playwright.stop)
+
+# Link markers ⟨ ⟩ dropped from the tree before completeness scoring
+_TREE_MARKERS = str.maketrans("", "", "⟨⟩")
+
+
+def _best_effort(fn, attempts=2, delay=0.2):
+    """Call *fn*, retrying once on failure; teardown errors are swallowed."""
+    for i in range(attempts):
+        try:
+            return fn()
+        except Exception:
+            if i + 1 < attempts:
+                time.sleep(delay)
+    return None
+
+
+def _off_pw_thread(fn):
+    """Mark a public method as safe to call from any thread.
+
+    The app's Playwright-thread proxy normally funnels every public call
+    onto the single Playwright worker; marked methods are called directly
+    instead, so long jobs that don't touch the main browser (e.g. benchmarks
+    running their own Playwright) don't hold up interactive actions.
+    """
+    fn.off_pw_thread = True
+    return fn
+
+
+def _call_budget(budget):
+    """Mark a public method whose calls may legitimately run long.
+
+    ``budget(manager, *args, **kwargs)`` gives the seconds a call needs on
+    top of action_hard_timeout (see BrowserManager._on_pw_thread), so e.g.
+    a long wait() isn't mistaken for a hung page.
+    """
+    def mark(fn):
+        fn.call_budget = budget
+        return fn
+    return mark
+
+
+def _seconds(value) -> float:
+    """Non-negative seconds from a request value (0 if unusable)."""
+    try:
+        return max(float(value or 0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _open_action(fn):
+    """Run a public method under the manager lock with an open page.
+
+    Replaces the ``with self._lock: self._ensure_open()`` preamble every
+    page-facing method used to repeat.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._ensure_open()
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def _url_origin(url: str) -> str:
+    """Host part of *url* — the grouping key for benchmark context reuse."""
+    try:
+        return urlsplit(url).netloc
+    except ValueError:
+        return ""
+
+
+def _score_completeness(visible_text: str, tree: str) -> tuple[int, int]:
+    """Count visible text lines that survive into the compressed *tree*.
+
+    Returns (matched, total) where total is at least 1.
+    """
+    # Strip structural markers ⟨ ⟩, [edit] suffixes, etc.  Plain
+    # translate/replace — no regex needed for fixed strings.
+    clean_tree = tree.translate(_TREE_MARKERS)   # remove link markers
+    clean_tree = clean_tree.replace("[edit]", "")
+    clean_tree_lower = clean_tree.lower()
+
+    # Lowercased once for the whole text rather than per probe
+    visible_lines = [
+        s for ln in visible_text.lower().split('\n')
+        if len(s := ln.strip()) >= 3
+    ]
+
+    # Per line: exact first-N-chars probe, plus a shorter one for
+    # truncated content
+    probes = []
+    for line in visible_lines:
+        if "[edit]" in line:
+            line = line.replace("[edit]", "").strip()
+            if not line:
+                continue
+        probe = line[:50]
+        probes.append((probe, probe[:25] if len(line) >= 10 else None))
+
+    found = _find_substrings(
+        clean_tree_lower, {p for pair in probes for p in pair if p})
+    matched = sum(
+        1 for probe, short in probes
+        if probe in found or (short and short in found)
+    )
+    return matched, max(len(visible_lines), 1)
+
+
+def _find_substrings(haystack: str, needles: set) -> set:
+    """Return the subset of *needles* that occur in *haystack*.
+
+    With pyahocorasick installed this is one sweep over *haystack* for all
+    needles; otherwise each distinct needle is a separate substring scan.
+    """
+    if ahocorasick is None or not needles:
+        return {n for n in needles if n in haystack}
+    automaton = ahocorasick.Automaton()
+    for n in needles:
+        automaton.add_word(n, n)
+    automaton.make_automaton()
+    return {n for _, n in automaton.iter(haystack)}
+
+
+# BS4-fallback selector injector.  Registered once per page as
+# window.__bInject (context init script) so each call only ships the cfg.
+_JS_INJECT = _unobserved("__bInject", """(cfg) => {
+    const PREFIX_RE = new RegExp('(?:' + cfg.prefixRe + ')-([a-zA-Z][\\\\w-]*)')
+    const MATERIAL_RE = new RegExp(cfg.materialRe)
+    const SEMANTIC = cfg.semantic
+    const CLONE_SEL = cfg.cloneSel
+    const STATE_RE = cfg.stateClasses.length
+        ? new RegExp('\\\\b(' + cfg.stateClasses.join('|') + ')\\\\b', 'gi')
+        : null
+
+    // ── Phase 1: Mark carousel / framework clones ──
+    if (CLONE_SEL) {
+        try { document.querySelectorAll(CLONE_SEL).forEach(el => {
+            el.setAttribute('data-bhidden', '1')
+        }) } catch(e) {}
+    }
+
+    // ── Phase 2: Assign bid, detect visibility, detect icons ──
+    // Split into a write pass, a read-only pass and a final write pass so
+    // style/layout is computed once instead of being invalidated between
+    // every element's reads.
+
+    // 2a. Assign bid and clear stale marks (writes only)
+    const els = []
+    const tw = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT)
+    let c = 0
+    for (let el = tw.nextNode(); el; el = tw.nextNode()) {
+        el.setAttribute('data-bid', String(++c))
+        if (el.getAttribute('data-bhidden') !== '1') el.removeAttribute('data-bhidden')
+        el.removeAttribute('data-bicon')
+        el.removeAttribute('data-bgroup')
+        els.push(el)
+    }
+
+    // First <svg><use> / <svg><title> under each element, resolved with one
+    // query each instead of two querySelector calls per text-less element
+    const firstUse = new Map()
+    const firstTitle = new Map()
+    const indexAncestors = (map, nodes) => nodes.forEach(n => {
+        for (let a = n.parentElement; a; a = a.parentElement) {
+            if (!map.has(a)) map.set(a, n)
+        }
+    })
+    indexAncestors(firstUse, document.body.querySelectorAll('svg use'))
+    indexAncestors(firstTitle, document.body.querySelectorAll('svg > title'))
+
+    // Elements with any non-blank text below them, from one pass over text
+    // nodes — replaces a per-element innerText read, which forces layout and
+    // rebuilds the whole subtree's text for every ancestor
+    const hasText = new Set()
+    const NO_TEXT_PARENTS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT'])
+    const textWalker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT)
+    for (let t = textWalker.nextNode(); t; t = textWalker.nextNode()) {
+        const p = t.parentElement
+        if (!p || NO_TEXT_PARENTS.has(p.tagName) || !/\\S/.test(t.data)) continue
+        for (let a = p; a && !hasText.has(a); a = a.parentElement) hasText.add(a)
+    }
+
+    // 2b. Visibility + icon detection (reads only)
+    const HIDDEN = 1
+    const MARKED = 2  // already data-bhidden (clone / previous run)
+    const INTERACTIVE = new Set(['a','button','input','select','textarea'])
+    // Semantic class keywords.  A plain alphanumeric keyword matches exactly
+    // when it is a whole [\\s_-]-separated token of the class string, so those
+    // are one Map lookup per token (earliest list position wins); any other
+    // keyword keeps its regex.
+    const SEM_SEP = /[\\s_-]+/
+    const semIndex = new Map()
+    const semComplex = []
+    SEMANTIC.forEach((w, j) => {
+        if (/^[A-Za-z0-9]+$/.test(w)) { if (!semIndex.has(w)) semIndex.set(w, j) }
+        else semComplex.push([j, new RegExp('(?:^|[\\\\s_-])' + w + '(?:$|[\\\\s_-])')])
+    })
+    function semanticKeyword(nc) {
+        let best = -1
+        for (const tok of nc.split(SEM_SEP)) {
+            const j = semIndex.get(tok)
+            if (j !== undefined && (best < 0 || j < best)) best = j
+        }
+        for (const [j, re] of semComplex) {
+            if (best >= 0 && j >= best) break
+            if (re.test(nc)) { best = j; break }
+        }
+        return best < 0 ? '' : SEMANTIC[best]
+    }
+    const marks = new Array(els.length)
+    for (let k = 0; k < els.length; k++) {
+        const el = els[k]
+        if (el.getAttribute('data-bhidden') === '1') { marks[k] = MARKED; continue }
+
+        const cs = window.getComputedStyle(el)
+        if (cs.display === 'none' || cs.visibility === 'hidden' || cs.opacity === '0') {
+            marks[k] = HIDDEN
+            continue
+        }
+        const rect = el.getBoundingClientRect()
+        if (rect.width === 0 && rect.height === 0 && el.children.length === 0) {
+            marks[k] = HIDDEN
+            continue
+        }
+
+        // --- Icon detection (for elements without visible text) ---
+        if (hasText.has(el) || el.getAttribute('aria-label')) continue
+
+        let icon = ''
+        const cls = typeof el.className === 'string' ? el.className : ''
+        const cm = cls.match(PREFIX_RE)
+        if (cm) icon = cm[1]
+        if (!icon && MATERIAL_RE.test(cls)) {
+            const t = el.textContent?.trim()
+            if (t && t.length < 40) icon = t
+        }
+        if (!icon) {
+            const use = firstUse.get(el)
+            if (use) {
+                const href = use.getAttribute('href') || use.getAttributeNS('http://www.w3.org/1999/xlink', 'href') || ''
+                const m = href.match(/#(?:icon[_-]?)?(.+)/)
+                if (m) icon = m[1]
+            }
+        }
+        if (!icon) {
+            const svgTitle = firstTitle.get(el)
+            if (svgTitle && svgTitle.textContent) icon = svgTitle.textContent.trim()
+        }
+        if (!icon) {
+            const tag = el.tagName.toLowerCase()
+            const interactive = INTERACTIVE.has(tag)
+                || el.getAttribute('role') === 'button'
+                || el.getAttribute('role') === 'link'
+            const maxLevels = interactive ? 4 : 1
+            let node = el
+            for (let i = 0; i < maxLevels && node && node !== document.body; i++) {
+                const nc = typeof node.className === 'string' ? node.className.toLowerCase() : ''
+                if (nc) {
+                    const kw = semanticKeyword(nc)
+                    if (kw) icon = kw
+                }
+                if (icon) break
+                node = node.parentElement
+            }
+        }
+        if (icon) marks[k] = icon
+    }
+
+    // 2c. Apply marks (writes only); remember parents of hidden elements,
+    // in document order, as the candidates for Phase 3
+    const hiddenParents = new Set()
+    for (let k = 0; k < els.length; k++) {
+        const mark = marks[k]
+        if (mark === HIDDEN || mark === MARKED) {
+            if (mark === HIDDEN) els[k].setAttribute('data-bhidden', '1')
+            const parent = els[k].parentElement
+            if (parent) hiddenParents.add(parent)
+        } else if (mark) {
+            els[k].setAttribute('data-bicon', mark)
+        }
+    }
+
+    // ── Phase 3: Detect switchable sibling groups (tab panels, dropdowns) ──
+    if (!STATE_RE) return
+    hiddenParents.forEach(parent => {
+        const children = parent.children  // all body descendants carry data-bid
+        if (children.length < 2) return
+        const groups = new Map()
+        for (const child of children) {
+            const ncls = (child.getAttribute('class') || '')
+                .replace(STATE_RE, '').replace(/\\s+/g, ' ').trim()
+            const key = child.tagName + '|' + ncls
+            const members = groups.get(key)
+            if (members) members.push(child)
+            else groups.set(key, [child])
+        }
+        groups.forEach((members, key) => {
+            if (members.length < 2) return
+            // Skip classless elements — too generic for tab panel detection
+            if (key.endsWith('|')) return
+            const hid = members.filter(m => m.getAttribute('data-bhidden') === '1')
+            const vis = members.filter(m => m.getAttribute('data-bhidden') !== '1')
+            if (vis.length > 0 && hid.length > 0) {
+                vis.forEach(m => m.setAttribute('data-bgroup', 'active'))
+                hid.forEach(m => {
+                    m.removeAttribute('data-bhidden')
+                    m.setAttribute('data-bgroup', 'inactive')
+                    m.querySelectorAll('[data-bhidden]').forEach(d => d.removeAttribute('data-bhidden'))
+                })
+            }
+        })
+    })
+}""")
+
 
 class BrowserManager:
     """Wraps Playwright browser with thread-safe access.
@@ -59,33 +673,136 @@ class BrowserManager:
     """
 
     def __init__(self):
+        # Bumped when a stuck Playwright thread is abandoned; each worker
+        # thread is tagged with the generation it was started for
+        self._gen = 0
         self._playwright = None
         self._browser = None
         self._context = None
         self._page = None
         self._lock = threading.Lock()
+        self._abandon_lock = threading.Lock()  # see _on_pw_thread
         # Single-thread executor ensures ALL Playwright calls happen on the
         # same thread, preventing "cannot switch to a different thread" errors.
-        self._pw_executor = concurrent.futures.ThreadPoolExecutor(
-            max_workers=1, thread_name_prefix="playwright"
+        self._pw_executor = self._new_pw_executor()
+        # DOM compression runs here so it overlaps the next CDP round-trip
+        # (see _refresh_dom_with)
+        self._compress_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="compress"
         )
         self._node_map: dict[str, str] = {}   # hid → css selector
         self._xpath_map: dict[str, str] = {}  # hid → xpath expression
-        self._last_filtered: list[dict] = []  # cached interactive nodes for DOM diff
+        self._last_filtered: list[dict] = []  # interactive nodes of _last_result (never mutated)
         self._last_result: dict = {}            # cached full result for lite re-assembly
         self._download_dir = tempfile.mkdtemp()
         self._downloads: list[str] = []
         self._new_pages: list = []
+        self._tab_titles: dict = {}           # page → (url, title) for inactive tabs
+        self._snapshots: dict = {}            # page → ((cfg, scripts) version, change stamp, result), LRU order
+        self._locators: dict = {}             # (page, selector) → Locator, see _locate
+        self._walker_ver = None  # dom_walker.js mtime registered on the context
+        # Write-behind session persistence (see _save_session)
+        self._session_state = None
+        self._session_dirty = threading.Event()
+        self._session_write_lock = threading.Lock()
+        self._session_flusher = None
+
+    def _new_pw_executor(self):
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="playwright",
+            initializer=_serve_generation, initargs=(self._gen,),
+        )
+
+    def _stale(self) -> bool:
+        """True on a Playwright thread abandoned by _abandon_pw_thread.
+
+        A call stuck there may still return later; its result belongs to a
+        session that no longer exists.
+        """
+        gen = getattr(_pw_thread, "gen", None)
+        return gen is not None and gen != self._gen
+
+    def _check_session(self):
+        """Abort the running call if its Playwright thread was abandoned."""
+        if self._stale():
+            raise _StaleSession("browser session was reset")
 
     def _on_pw_thread(self, fn, *args, **kwargs):
         """Run fn(*args, **kwargs) on the dedicated Playwright thread.
 
         This ensures thread affinity: the same thread that called
         sync_playwright().start() is always used for subsequent calls.
-        Blocks until the callable returns (or raises).
+        Blocks until the callable returns (or raises).  A call still running
+        after ``action_hard_timeout`` (plus its own budget, for methods
+        marked @_call_budget) is abandoned with the whole session (see
+        _abandon_pw_thread) so one hung page can't wedge every caller.
         """
-        future = self._pw_executor.submit(fn, *args, **kwargs)
-        return future.result(timeout=120)  # generous timeout for slow pages
+        executor = self._pw_executor
+        future = executor.submit(self._in_session, fn, args, kwargs)
+        timeout = _hard_timeout()
+        budget = getattr(fn, "call_budget", None)
+        if timeout is not None and budget is not None:
+            timeout += budget(self, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            if future.done():
+                raise  # fn itself raised TimeoutError
+            # Queued behind a call that already got its thread abandoned
+            with self._abandon_lock:
+                if executor is self._pw_executor:
+                    self._abandon_pw_thread()
+            raise RuntimeError(
+                f"Browser call timed out after {timeout:g}s; the session "
+                "was reset, open the browser again"
+            ) from None
+
+    def _in_session(self, fn, args, kwargs):
+        # Calls still queued on an abandoned thread fail instead of running,
+        # and one that was stuck there doesn't hand back its late result
+        self._check_session()
+        result = fn(*args, **kwargs)
+        self._check_session()
+        return result
+
+    def _abandon_pw_thread(self):
+        """Give up on a Playwright thread that is stuck in a call.
+
+        Its Playwright objects can only be used from that thread, so their
+        close is queued behind the stuck call, and a fresh thread and lock
+        let open() start a new browser meanwhile.  Bumping the generation
+        makes the stuck call raise _StaleSession once it returns (see
+        _in_session).  Caller holds _abandon_lock.
+        """
+        stuck = self._pw_executor
+        browser, playwright = self._browser, self._playwright
+        self._gen += 1
+        self._pw_executor = self._new_pw_executor()
+        stuck.submit(_close_abandoned, browser, playwright)
+        stuck.shutdown(wait=False)
+        self._lock = threading.Lock()
+        self._forget_browser()
+        print("[Browser] call exceeded action_hard_timeout — session reset")
+
+    @_off_pw_thread
+    def run_async(self, name, *args, **kwargs):
+        """Awaitable form of public method *name*, for asyncio hosts.
+
+        The sync Playwright API can't run inside an event loop, so the call
+        is handed to the Playwright thread (or, for @_off_pw_thread methods
+        such as benchmarks, a worker thread) and awaited from there::
+
+            result = await manager.run_async("click", "3")
+        """
+        fn = getattr(self, name, None)
+        if name.startswith("_") or not callable(fn):
+            raise AttributeError(f"No public BrowserManager method '{name}'")
+        loop = asyncio.get_running_loop()
+        if getattr(fn, "off_pw_thread", False):
+            return loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+        return asyncio.wrap_future(
+            self._pw_executor.submit(self._in_session, fn, args, kwargs),
+            loop=loop)
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -105,231 +822,123 @@ class BrowserManager:
             raise ValueError(f"Node '{node_id}' not found. Call get_dom() first.")
         return sel
 
-    def _inject_selectors(self):
-        """Inject data-bid, data-bhidden, data-bicon, data-bgroup into live DOM (for BS4 fallback path)."""
-        hints = _get_hints()
-        icon_prefixes = hints["icon_class_prefixes"]
-        material_classes = hints["material_icon_classes"]
-        semantic_kw = hints["semantic_keywords"]
-        clone_selectors = hints.get("carousel_clone_selectors", [])
-        state_classes = hints.get("switchable_state_classes", [])
-        # Build JS-safe literals
-        prefix_re = "|".join(icon_prefixes)
-        material_re = "|".join(c.replace("-", "[_-]") for c in material_classes)
-        clone_sel = ", ".join(clone_selectors) if clone_selectors else ""
-        self._page.evaluate("""(cfg) => {
-            const PREFIX_RE = new RegExp('(?:' + cfg.prefixRe + ')-([a-zA-Z][\\\\w-]*)')
-            const MATERIAL_RE = new RegExp(cfg.materialRe)
-            const SEMANTIC = cfg.semantic
-            const CLONE_SEL = cfg.cloneSel
-            const STATE_RE = cfg.stateClasses.length
-                ? new RegExp('\\\\b(' + cfg.stateClasses.join('|') + ')\\\\b', 'gi')
-                : null
-
-            // ── Phase 1: Mark carousel / framework clones ──
-            if (CLONE_SEL) {
-                try { document.querySelectorAll(CLONE_SEL).forEach(el => {
-                    el.setAttribute('data-bhidden', '1')
-                }) } catch(e) {}
-            }
-
-            // ── Phase 2: Assign bid, detect visibility, detect icons ──
-            let c = 0
-            document.body.querySelectorAll('*').forEach(el => {
-                el.setAttribute('data-bid', String(++c))
-                if (el.getAttribute('data-bhidden') !== '1') el.removeAttribute('data-bhidden')
-                el.removeAttribute('data-bicon')
-                el.removeAttribute('data-bgroup')
+    def _locate(self, sel: str):
+        """Locator for a resolved node selector on the active page.
 
-                if (el.getAttribute('data-bhidden') === '1') return
-
-                const cs = window.getComputedStyle(el)
-                if (cs.display === 'none' || cs.visibility === 'hidden' || cs.opacity === '0') {
-                    el.setAttribute('data-bhidden', '1')
-                    return
-                }
-                const rect = el.getBoundingClientRect()
-                if (rect.width === 0 && rect.height === 0 && el.children.length === 0) {
-                    el.setAttribute('data-bhidden', '1')
-                    return
-                }
-
-                // --- Icon detection (for elements without visible text) ---
-                const text = (el.innerText || '').trim()
-                const ariaLabel = el.getAttribute('aria-label')
-                if (text || ariaLabel) return
-
-                let icon = ''
-                const cls = typeof el.className === 'string' ? el.className : ''
-                const cm = cls.match(PREFIX_RE)
-                if (cm) icon = cm[1]
-                if (!icon && MATERIAL_RE.test(cls)) {
-                    const t = el.textContent?.trim()
-                    if (t && t.length < 40) icon = t
-                }
-                if (!icon) {
-                    const use = el.querySelector('svg use[href], svg use')
-                    if (use) {
-                        const href = use.getAttribute('href') || use.getAttributeNS('http://www.w3.org/1999/xlink', 'href') || ''
-                        const m = href.match(/#(?:icon[_-]?)?(.+)/)
-                        if (m) icon = m[1]
-                    }
-                }
-                if (!icon) {
-                    const svgTitle = el.querySelector('svg > title')
-                    if (svgTitle && svgTitle.textContent) icon = svgTitle.textContent.trim()
-                }
-                if (!icon) {
-                    const INTERACTIVE = new Set(['a','button','input','select','textarea'])
-                    const interactive = INTERACTIVE.has(el.tagName.toLowerCase())
-                        || el.getAttribute('role') === 'button'
-                        || el.getAttribute('role') === 'link'
-                    const maxLevels = interactive ? 4 : 1
-                    if (!window._semRe) {
-                        window._semRe = SEMANTIC.map(w => new RegExp('(?:^|[\\\\s_-])' + w + '(?:$|[\\\\s_-])'))
-                    }
-                    let node = el
-                    for (let i = 0; i < maxLevels && node && node !== document.body; i++) {
-                        const nc = typeof node.className === 'string' ? node.className.toLowerCase() : ''
-                        if (nc) {
-                            for (let j = 0; j < SEMANTIC.length; j++) {
-                                if (window._semRe[j].test(nc)) { icon = SEMANTIC[j]; break }
-                            }
-                        }
-                        if (icon) break
-                        node = node.parentElement
-                    }
-                }
-                if (icon) el.setAttribute('data-bicon', icon)
-            })
-
-            // ── Phase 3: Detect switchable sibling groups (tab panels, dropdowns) ──
-            if (!STATE_RE) return
-            const seen = new Set()
-            document.querySelectorAll('[data-bhidden="1"]').forEach(el => {
-                const parent = el.parentElement
-                if (!parent || seen.has(parent)) return
-                seen.add(parent)
-                const children = Array.from(parent.children).filter(ch => ch.hasAttribute('data-bid'))
-                if (children.length < 2) return
-                const groups = new Map()
-                children.forEach(child => {
-                    const ncls = (child.getAttribute('class') || '')
-                        .replace(STATE_RE, '').replace(/\\s+/g, ' ').trim()
-                    const key = child.tagName + '|' + ncls
-                    if (!groups.has(key)) groups.set(key, [])
-                    groups.get(key).push(child)
-                })
-                groups.forEach((members, key) => {
-                    if (members.length < 2) return
-                    // Skip classless elements — too generic for tab panel detection
-                    if (key.endsWith('|')) return
-                    const hid = members.filter(m => m.getAttribute('data-bhidden') === '1')
-                    const vis = members.filter(m => m.getAttribute('data-bhidden') !== '1')
-                    if (vis.length > 0 && hid.length > 0) {
-                        vis.forEach(m => m.setAttribute('data-bgroup', 'active'))
-                        hid.forEach(m => {
-                            m.removeAttribute('data-bhidden')
-                            m.setAttribute('data-bgroup', 'inactive')
-                            m.querySelectorAll('[data-bhidden]').forEach(d => d.removeAttribute('data-bhidden'))
-                        })
-                    }
-                })
-            })
-        }""", {
-            "prefixRe": prefix_re,
-            "materialRe": material_re,
-            "semantic": semantic_kw,
-            "cloneSel": clone_sel,
-            "stateClasses": state_classes,
-        })
+        Locators are lazy (resolved inside each action call), so they're
+        reused per (page, selector) until the node map is rebuilt.
+        """
+        key = (self._page, sel)
+        loc = self._locators.get(key)
+        if loc is None:
+            loc = self._locators[key] = self._page.locator(sel).first
+        return loc
 
-    def _walk_dom_js(self) -> list[dict]:
-        """Walk live DOM in browser JS, return flat node list."""
+    def _inject_selectors(self):
+        """Inject data-bid, data-bhidden, data-bicon, data-bgroup into live DOM (for BS4 fallback path)."""
+        inject_cfg = _get_hints().inject_cfg
+        # Pages that predate the init script (or lost it) get it defined once
+        if not self._page.evaluate(
+            "cfg => window.__bInject ? (window.__bInject(cfg), true) : false",
+            inject_cfg,
+        ):
+            self._page.evaluate(_JS_INJECT)
+            self._page.evaluate("cfg => window.__bInject(cfg)", inject_cfg)
+
+    def _walk_dom_js(self, since=None):
+        """Walk live DOM in browser JS.
+
+        Returns (flat node list, html length, url, stamp), or None if the
+        page is unchanged since the *since* stamp.
+        """
         _load_js_walker()  # hot-reload if file changed
-        hints = _get_hints()
-        prefix_re = "|".join(hints["icon_class_prefixes"])
-        material_re = "|".join(
-            c.replace("-", "[_-]") for c in hints["material_icon_classes"]
-        )
-        clone_sel = ", ".join(hints.get("carousel_clone_selectors", []))
-        walker_cfg = {
-            "skipTags": [
-                "script", "style", "meta", "link", "noscript",
-                "head", "br", "hr", "iframe", "object", "embed",
-                "template", "slot", "col",
-            ],
-            "inlineTags": [
-                "a", "span", "strong", "em", "b", "i", "u", "s",
-                "code", "kbd", "mark", "small", "sub", "sup",
-                "abbr", "cite", "time", "label",
-            ],
-            "attrRules": {
-                "a": ["href"], "img": ["src", "alt"],
-                "input": ["type", "name", "placeholder", "value"],
-                "textarea": ["name", "placeholder"],
-                "select": ["name"], "option": ["value"],
-                "button": ["type"],
-                "form": ["action", "method"],
-                "video": ["src"], "audio": ["src"],
-                "source": ["src", "type"],
-                "th": ["colspan", "rowspan"], "td": ["colspan", "rowspan"],
-            },
-            "globalAttrs": ["id", "role", "aria-label", "title"],
-            "stateAttrs": [
-                "disabled", "checked", "readonly", "required",
-                "aria-expanded", "aria-selected", "aria-checked",
-                "aria-pressed", "aria-current",
-                "aria-valuenow", "aria-valuemin", "aria-valuemax",
-            ],
-            "maxTextLen": 0,  # 0 = no truncation; agent needs full text
-            "maxDepth": cfg.get("max_depth"),
-            "maxNodes": cfg.get("max_nodes"),
-            "iconPrefixes": prefix_re,
-            "materialClasses": material_re,
-            "semanticKeywords": hints["semantic_keywords"],
-            "cloneSelectors": clone_sel,
-            "stateClasses": hints.get("switchable_state_classes", []),
-            "typeableInputTypes": [
-                "text", "search", "email", "password", "url", "tel", "number", "",
-            ],
-            "clickableInputTypes": ["submit", "button", "reset", "image"],
-            "grayTextMinRgb": cfg.get("gray_text_min_rgb"),
-            "grayTextMaxDiff": cfg.get("gray_text_max_diff"),
-            "iconMaxSize": cfg.get("icon_max_size"),
-        }
-        return self._page.evaluate(_JS_DOM_WALKER, walker_cfg)
+        if self._walker_ver != _JS_WALKER_MTIME and self._context:
+            # dom_walker.js was edited — register the new one for future pages
+            self._context.add_init_script(_walker_init_script())
+            self._walker_ver = _JS_WALKER_MTIME
+        return _run_walker(self._page, _get_hints().walker_cfg, since)
 
     def _refresh_dom(self) -> dict:
         """Refresh DOM, return unified result with tree + maps + interactive + stats."""
+        return self._refresh_dom_with(None)[0]
+
+    def _refresh_dom_with(self, overlap):
+        """_refresh_dom, running *overlap()* (if given) alongside compression.
+
+        The walker output is compressed on _compress_pool while *overlap*
+        runs here on the Playwright thread, so a follow-up CDP call (e.g.
+        _get_tabs_info) waits on the browser while Python does the CPU work.
+        Returns (dom_result, overlap_result).
+        """
+        # Nothing changed (no DOM mutation or user input) on this page under
+        # the same config and compressor scripts since its last refresh —
+        # reuse that snapshot. Kept per page so switching back to an
+        # untouched tab is also free.
+        import compressor_manager
+        page = self._page
+        version = (cfg.version, compressor_manager.scripts_version)
+        snap = self._snapshots.get(page)
+        since = snap[1] if snap and snap[0] == version else None
+        extra = None
+        stamp = None
         if _USE_JS_WALKER:
-            import compressor_manager
-            dom_nodes = self._walk_dom_js() or []
-            print(f"[DOM Walker] dom_nodes: {len(dom_nodes)}")
-            html_len = self._page.evaluate(
-                "document.documentElement.outerHTML.length"
-            )
-            url = self._page.url
-            result = compressor_manager.run(url, dom_nodes, html_len)
-            print(f"[DOM Walker] after filter: {result['stats']['nodes_after_filter']}")
+            walked = self._walk_dom_js(since)
+            if walked is None:
+                result, stamp = snap[2], since
+                if overlap:
+                    extra = overlap()
+            else:
+                dom_nodes, html_len, url, stamp = walked
+                print(f"[DOM Walker] dom_nodes: {len(dom_nodes)}")
+                future = self._compress_pool.submit(
+                    compressor_manager.run, url, dom_nodes, html_len)
+                if overlap:
+                    extra = overlap()
+                result = future.result()
+                print(f"[DOM Walker] after filter: {result['stats']['nodes_after_filter']}")
         else:
-            from dom_parser import extract_unified_dom
-            self._inject_selectors()
-            html = self._page.content()
-            result = extract_unified_dom(html)
+            from dom_parser import parse_dom, process_raw_nodes
+            if since and self._page.evaluate(_JS_DOM_PEEK) == since:
+                result, stamp = snap[2], since
+                if overlap:
+                    extra = overlap()
+            else:
+                self._inject_selectors()
+                raw = self._page.evaluate(_JS_BODY_SNAPSHOT)
+                future = self._compress_pool.submit(
+                    lambda: process_raw_nodes(parse_dom(raw["html"]), raw["htmlLen"]))
+                if overlap:
+                    extra = overlap()
+                result = future.result()
+                stamp = raw["stamp"] if raw["stamp"][0] is not None else None
+        # Re-insert (hit or miss) so the least recently refreshed page is evicted
+        self._snapshots.pop(page, None)
+        if stamp:
+            self._snapshots[page] = (version, stamp, result)
+            while len(self._snapshots) > _SNAPSHOT_PAGES:
+                self._snapshots.pop(next(iter(self._snapshots)))
+        if self._node_map is not result["node_map"]:
+            self._locators = {}
         self._node_map = result["node_map"]
         self._xpath_map = result["xpath_map"]
-        # Cache interactive nodes for DOM diff (before/after comparison)
+        # Cache interactive nodes for DOM diff (before/after comparison).
+        # Always rebound, never mutated, so actions can hold it as "before"
+        # without copying.
         self._last_filtered = result["interactive"]
         # Cache full result for lite-mode re-assembly
         self._last_result = result
-        return result
+        return result, extra
 
     def _is_mac(self) -> bool:
-        return platform.system() == "Darwin"
+        return _IS_MAC
 
     def _on_page_close(self, page):
         """Callback fired when any page (tab) is closed — including manually by the user."""
+        if self._stale():
+            return  # a page of an abandoned session
+        self._tab_titles.pop(page, None)
+        self._snapshots.pop(page, None)
+        self._locators = {}
         # Remove from new_pages tracking if present
         if page in self._new_pages:
             self._new_pages.remove(page)
@@ -343,6 +952,8 @@ class BrowserManager:
 
     def _on_new_page(self, page):
         """Callback fired by context when a new page (tab) is created externally."""
+        if self._stale():
+            return
         page.on("download", self._on_download)
         page.on("close", lambda: self._on_page_close(page))
         self._new_pages.append(page)
@@ -362,17 +973,58 @@ class BrowserManager:
                     tabs.append(url)
             except Exception:
                 pass
-        try:
-            with open(_SESSION_PATH, "w", encoding="utf-8") as f:
-                json.dump({"tabs": tabs, "active_index": active_idx}, f)
-        except Exception:
-            pass
+        # Hand the write to the flusher thread; only the latest state is kept
+        with self._session_write_lock:
+            self._session_state = {"tabs": tabs, "active_index": active_idx}
+        if not self._session_flusher:
+            self._session_flusher = threading.Thread(
+                target=self._session_flush_loop, name="session-writer", daemon=True,
+            )
+            self._session_flusher.start()
+            atexit.register(self._flush_session)
+        self._session_dirty.set()
+
+    def _session_flush_loop(self):
+        while True:
+            self._session_dirty.wait()
+            # Debounce: let back-to-back saves collapse into one write
+            time.sleep(_SESSION_DEBOUNCE)
+            self._session_dirty.clear()
+            self._flush_session()
+
+    def _flush_session(self):
+        """Write the pending session state (if any) atomically."""
+        with self._session_write_lock:
+            state, self._session_state = self._session_state, None
+            if state is None:
+                return
+            tmp = _SESSION_PATH + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(orjson.dumps(state))
+                os.replace(tmp, _SESSION_PATH)
+            except Exception:
+                pass
+
+    def _restore_budget(self) -> float:
+        """Seconds _restore_session may spend navigating the saved tabs."""
+        with self._session_write_lock:
+            session = self._session_state
+        if session is None:
+            try:
+                with open(_SESSION_PATH, "rb") as f:
+                    session = orjson.loads(f.read())
+            except Exception:
+                return 0.0
+        tabs = session.get("tabs", []) if isinstance(session, dict) else []
+        return len(tabs) * _seconds(cfg.get("nav_timeout")) / 1000
 
     def _restore_session(self):
         """Open tabs from previous session. Returns count restored or 0."""
+        self._flush_session()  # a close() just before may still be pending
         try:
-            with open(_SESSION_PATH, encoding="utf-8") as f:
-                session = json.load(f)
+            with open(_SESSION_PATH, "rb") as f:
+                session = orjson.loads(f.read())
         except Exception:
             return 0
         tabs = session.get("tabs", [])
@@ -401,14 +1053,27 @@ class BrowserManager:
         return len(tabs)
 
     def _get_tabs_info(self) -> list[dict]:
+        # p.url is tracked locally by Playwright, but p.title() is a CDP
+        # round-trip.  Only the active tab is re-queried every time (actions
+        # can retitle it without navigating); background tabs reuse their
+        # title until their URL changes.
         tabs = []
+        titles = self._tab_titles
         for i, p in enumerate(self._context.pages):
+            url = p.url
+            active = p is self._page
+            cached = titles.get(p)
+            if active or not cached or cached[0] != url:
+                title = p.title()
+                titles[p] = (url, title)
+            else:
+                title = cached[1]
             tabs.append({
                 "tab_id": i,
                 "page_id": str(id(p)),
-                "url": p.url,
-                "title": p.title(),
-                "active": p is self._page,
+                "url": url,
+                "title": title,
+                "active": active,
             })
         return tabs
 
@@ -422,26 +1087,38 @@ class BrowserManager:
         except Exception:
             pass
         # Wait for DOM mutations to settle (dropdowns, autocomplete, dynamic UI)
-        # Uses MutationObserver: wait until no DOM changes for dom_settle_wait ms.
+        # Polls the page's persistent MutationObserver stamp (__bLastMut, see
+        # open()): wait until no DOM changes for dom_settle_wait ms.
         # Hard cap at 5× settle_ms to prevent infinite hang on pages with
         # continuous animations, CSS transitions, or AJAX polling.
         settle_ms = cfg.get("dom_settle_wait") or 500
         try:
             self._page.evaluate("""(settleMs) => new Promise(resolve => {
-                let timer = null
-                const done = () => { observer.disconnect(); resolve() }
-                const observer = new MutationObserver(() => {
-                    clearTimeout(timer)
-                    timer = setTimeout(done, settleMs)
-                })
-                observer.observe(document.body, {
-                    childList: true, subtree: true,
-                    attributes: true, characterData: true
-                })
-                // If no mutation at all, resolve after settleMs
-                timer = setTimeout(done, settleMs)
-                // Hard cap: never wait longer than 5× settleMs
-                setTimeout(done, settleMs * 5)
+                // Quiescent page: loaded, nothing animating, no fetch/XHR
+                // in flight and already quiet for settleMs — nothing left to
+                // settle.  The quiet check keeps e.g. a debounced
+                // autocomplete just typed into on the normal wait below.
+                if (document.readyState === 'complete'
+                        && !document.getAnimations().length
+                        && window.__bPending === 0
+                        && performance.now() - (window.__bLastMut || 0) >= settleMs) {
+                    resolve()
+                    return
+                }
+                // Quiet period counts from whichever is later: the last
+                // mutation or now (pages without the tracker just wait settleMs)
+                const start = performance.now()
+                const tick = () => {
+                    const now = performance.now()
+                    const quietSince = Math.max(window.__bLastMut || 0, start)
+                    // Hard cap: never wait longer than 5× settleMs
+                    if (now - quietSince >= settleMs || now - start >= settleMs * 5) {
+                        resolve()
+                    } else {
+                        setTimeout(tick, settleMs - (now - quietSince))
+                    }
+                }
+                setTimeout(tick, settleMs)
             })""", settle_ms)
         except Exception:
             pass
@@ -473,8 +1150,9 @@ class BrowserManager:
 
         result: dict = {"status": "ok", "message": message}
 
+        tabs = None
         if refresh_dom:
-            dom_result = self._refresh_dom()
+            dom_result, tabs = self._refresh_dom_with(self._get_tabs_info)
             if fields:
                 field_map = {
                     "dom": ("dom", dom_result["tree"]),
@@ -490,7 +1168,7 @@ class BrowserManager:
                 result["interactive"] = dom_result["interactive"]
                 result["stats"] = dom_result["stats"]
 
-        result["tabs"] = self._get_tabs_info()
+        result["tabs"] = tabs if tabs is not None else self._get_tabs_info()
         if new_tab_opened:
             result["new_tab_opened"] = True
         return result
@@ -499,6 +1177,7 @@ class BrowserManager:
     # 1-5  Basic Navigation
     # ==================================================================
 
+    @_call_budget(lambda self, url=None, **_: 0.0 if url else self._restore_budget())
     def open(self, url=None, refresh_dom=True, fields=None):                      # 1
         with self._lock:
             fresh = not self._browser
@@ -539,6 +1218,49 @@ class BrowserManager:
                         };
                     })();
                 """)
+                # Quiescence tracking for _wait_stable / _refresh_dom: count
+                # in-flight fetch/XHR, and keep one page-lifetime
+                # MutationObserver (plus input listeners, for state that
+                # changes without DOM mutations — values, :hover, scroll)
+                # stamping the time of the last change.
+                self._context.add_init_script("""
+                    (() => {
+                        const touch = () => { window.__bLastMut = performance.now(); };
+                        touch();
+                        window.__bObserver = new MutationObserver(touch);
+                        window.__bObserver.observe(document, {
+                            childList: true, subtree: true,
+                            attributes: true, characterData: true
+                        });
+                        for (const type of ['input', 'change', 'focusin', 'mouseover',
+                                            'mouseout', 'scroll', 'resize']) {
+                            window.addEventListener(type, touch, { capture: true, passive: true });
+                        }
+                        window.__bPending = 0;
+                        const origFetch = window.fetch;
+                        if (origFetch) {
+                            window.fetch = function(...args) {
+                                window.__bPending++;
+                                return origFetch.apply(this, args)
+                                    .finally(() => { window.__bPending--; });
+                            };
+                        }
+                        const origSend = XMLHttpRequest.prototype.send;
+                        XMLHttpRequest.prototype.send = function(...args) {
+                            window.__bPending++;
+                            this.addEventListener('loadend', () => { window.__bPending--; }, { once: true });
+                            try {
+                                return origSend.apply(this, args);
+                            } catch (e) {
+                                window.__bPending--;
+                                throw e;
+                            }
+                        };
+                    })();
+                """)
+                self._context.add_init_script(_JS_INJECT)
+                self._context.add_init_script(_walker_init_script())
+                self._walker_ver = _JS_WALKER_MTIME
                 self._context.on("page", self._on_new_page)
                 self._page = self._context.new_page()
                 initial_page = self._page
@@ -558,33 +1280,30 @@ class BrowserManager:
                     return self._action_result(f"Restored {n} tab(s) from previous session", refresh_dom=refresh_dom, fields=fields)
             return self._action_result("Opened blank", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def back(self, refresh_dom=True, fields=None):                               # 2
-        with self._lock:
-            self._ensure_open()
-            self._page.go_back(wait_until="domcontentloaded", timeout=cfg.get("nav_timeout"))
-            return self._action_result("Navigated back", refresh_dom=refresh_dom, fields=fields)
+        self._page.go_back(wait_until="domcontentloaded", timeout=cfg.get("nav_timeout"))
+        return self._action_result("Navigated back", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def forward(self, refresh_dom=True, fields=None):                            # 3
-        with self._lock:
-            self._ensure_open()
-            self._page.go_forward(wait_until="domcontentloaded", timeout=cfg.get("nav_timeout"))
-            return self._action_result("Navigated forward", refresh_dom=refresh_dom, fields=fields)
+        self._page.go_forward(wait_until="domcontentloaded", timeout=cfg.get("nav_timeout"))
+        return self._action_result("Navigated forward", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def refresh(self, refresh_dom=True, fields=None):                            # 4
-        with self._lock:
-            self._ensure_open()
-            self._page.reload(wait_until="domcontentloaded", timeout=cfg.get("reload_timeout"))
-            return self._action_result("Page refreshed", refresh_dom=refresh_dom, fields=fields)
+        self._page.reload(wait_until="domcontentloaded", timeout=cfg.get("reload_timeout"))
+        return self._action_result("Page refreshed", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def get_url(self):                                              # 5
-        with self._lock:
-            self._ensure_open()
-            return {"status": "ok", "current_url": self._page.url}
+        return {"status": "ok", "current_url": self._page.url}
 
     # ==================================================================
     # 6-11  DOM Reading
     # ==================================================================
 
+    @_open_action
     def get_dom(self, fields=None, lite=False):                       # 6
         """Unified DOM endpoint with optional field selection and lite mode.
 
@@ -596,116 +1315,126 @@ class BrowserManager:
         truncated text.  The walk is the same as ``/dom`` — lite only
         affects the final formatting step, guaranteeing identical node IDs.
         """
-        with self._lock:
-            self._ensure_open()
-            dom_result = self._refresh_dom()
-
-            # Lite mode: re-assemble the same walk result with truncation
-            if lite and "_filtered_nodes" in dom_result:
-                from dom_parser import assemble_result
-                text_max = cfg.get("lite_text_max") or 50
-                text_head = cfg.get("lite_text_head") or 30
-                dom_result = assemble_result(
-                    dom_result["_dom_nodes"],
-                    dom_result["_filtered_nodes"],
-                    dom_result["_html_len"],
-                    text_max_len=text_max,
-                    text_head_len=text_head,
-                )
+        dom_result = self._refresh_dom()
+
+        # Lite mode: re-assemble the same walk result with truncation
+        if lite and "_filtered_nodes" in dom_result:
+            from dom_parser import assemble_result
+            text_max = cfg.get("lite_text_max") or 50
+            text_head = cfg.get("lite_text_head") or 30
+            dom_result = assemble_result(
+                dom_result["_node_count"],
+                dom_result["_filtered_nodes"],
+                dom_result["_html_len"],
+                text_max_len=text_max,
+                text_head_len=text_head,
+            )
 
-            if not fields:
-                return {
-                    "status": "ok",
-                    "dom": dom_result["tree"],
-                    "xpath_map": dom_result["xpath_map"],
-                    "interactive": dom_result["interactive"],
-                    "stats": dom_result["stats"],
-                }
-            result: dict = {"status": "ok"}
-            field_map = {
-                "dom": ("dom", dom_result["tree"]),
-                "interactive": ("interactive", dom_result["interactive"]),
-                "xpath_map": ("xpath_map", dom_result["xpath_map"]),
-                "stats": ("stats", dom_result["stats"]),
+        if not fields:
+            return {
+                "status": "ok",
+                "dom": dom_result["tree"],
+                "xpath_map": dom_result["xpath_map"],
+                "interactive": dom_result["interactive"],
+                "stats": dom_result["stats"],
             }
-            for f in fields:
-                if f in field_map:
-                    key, val = field_map[f]
-                    result[key] = val
-            return result
+        result: dict = {"status": "ok"}
+        field_map = {
+            "dom": ("dom", dom_result["tree"]),
+            "interactive": ("interactive", dom_result["interactive"]),
+            "xpath_map": ("xpath_map", dom_result["xpath_map"]),
+            "stats": ("stats", dom_result["stats"]),
+        }
+        for f in fields:
+            if f in field_map:
+                key, val = field_map[f]
+                result[key] = val
+        return result
 
+    @_open_action
     def get_dom_detail(self, node_id):                              # 7
         """Return full detail for a node: attrs, rect, state, xpath, css_selector."""
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            xpath = self._xpath_map.get(str(node_id), "")
-            detail = self._page.locator(sel).first.evaluate("""el => {
-                const attrs = {};
-                for (const a of el.attributes) attrs[a.name] = a.value;
-                const rect = el.getBoundingClientRect();
-                const cs = window.getComputedStyle(el);
-                return {
-                    tag: el.tagName.toLowerCase(),
-                    text: (el.innerText || '').substring(0, 500),
-                    attrs,
-                    rect: {x: rect.x, y: rect.y, w: rect.width, h: rect.height},
-                    visible: rect.width > 0 && rect.height > 0
-                             && cs.display !== 'none'
-                             && cs.visibility !== 'hidden'
-                             && cs.opacity !== '0',
-                    enabled: !el.disabled,
-                    checked: el.checked ?? null,
-                    value: el.value ?? null,
-                    focused: document.activeElement === el,
-                    readonly: el.readOnly ?? false,
-                    ariaExpanded: el.getAttribute('aria-expanded'),
-                    ariaSelected: el.getAttribute('aria-selected'),
-                    childCount: el.children.length,
-                };
-            }""")
-            detail["css_selector"] = sel
-            detail["xpath"] = xpath
-            return {"status": "ok", "detail": detail}
+        sel = self._resolve(node_id)
+        xpath = self._xpath_map.get(str(node_id), "")
+        detail = self._locate(sel).evaluate("""el => {
+            const attrs = {};
+            for (const a of el.attributes) attrs[a.name] = a.value;
+            const rect = el.getBoundingClientRect();
+            const cs = window.getComputedStyle(el);
+            return {
+                tag: el.tagName.toLowerCase(),
+                text: (el.innerText || '').substring(0, 500),
+                attrs,
+                rect: {x: rect.x, y: rect.y, w: rect.width, h: rect.height},
+                visible: rect.width > 0 && rect.height > 0
+                         && cs.display !== 'none'
+                         && cs.visibility !== 'hidden'
+                         && cs.opacity !== '0',
+                enabled: !el.disabled,
+                checked: el.checked ?? null,
+                value: el.value ?? null,
+                focused: document.activeElement === el,
+                readonly: el.readOnly ?? false,
+                ariaExpanded: el.getAttribute('aria-expanded'),
+                ariaSelected: el.getAttribute('aria-selected'),
+                childCount: el.children.length,
+            };
+        }""")
+        detail["css_selector"] = sel
+        detail["xpath"] = xpath
+        return {"status": "ok", "detail": detail}
 
+    @_open_action
     def get_dom_children(self, node_id):                            # 8
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            inner = self._page.locator(sel).first.inner_html()
-            from dom_parser import extract_dom_tree
-            subtree = extract_dom_tree(f"<body>{inner}</body>")
-            return {"status": "ok", "dom": subtree}
-
-    def get_dom_source(self, node_id):                              # 9
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            html = self._page.locator(sel).first.evaluate("el => el.outerHTML")
+        sel = self._resolve(node_id)
+        inner = self._locate(sel).inner_html()
+        from dom_parser import extract_dom_tree
+        subtree = extract_dom_tree(f"<body>{inner}</body>")
+        return {"status": "ok", "dom": subtree}
+
+    @_open_action
+    def get_dom_source(self, node_id, max_length=None):              # 9
+        """Outer HTML of a node.  With *max_length*, the markup is cut in the
+        page so only that preview crosses CDP."""
+        sel = self._resolve(node_id)
+        if not max_length:
+            html = self._locate(sel).evaluate("el => el.outerHTML")
             return {"status": "ok", "html": html}
+        src = self._locate(sel).evaluate("""(el, max) => {
+            const html = el.outerHTML
+            return {html: html.length > max ? html.slice(0, max) : html, length: html.length}
+        }""", int(max_length))
+        result = {"status": "ok", "html": src["html"]}
+        if src["length"] > len(src["html"]):
+            result["truncated"] = True
+            result["html_length"] = src["length"]
+        return result
 
+    @_open_action
     def get_page_source(self):                                      # 10
-        with self._lock:
-            self._ensure_open()
-            return {"status": "ok", "html": self._page.content()}
+        return {"status": "ok", "html": self._page.content()}
 
+    @_open_action
     def get_text(self, node_id=None):                               # 11
-        with self._lock:
-            self._ensure_open()
-            if node_id:
-                sel = self._resolve(node_id)
-                text = self._page.locator(sel).first.inner_text()
-            else:
-                text = self._page.locator("body").inner_text()
-            return {"status": "ok", "text": text}
+        if node_id:
+            sel = self._resolve(node_id)
+            text = self._locate(sel).inner_text()
+        else:
+            text = self._page.locator("body").inner_text()
+        return {"status": "ok", "text": text}
 
     # ==================================================================
     # 12-18  Interaction
     # ==================================================================
 
     def _attach_dom_diff(self, before, result, refresh_dom):
-        """Compute DOM diff if we have a before snapshot and refresh_dom is on."""
-        if refresh_dom and before:
+        """Compute DOM diff if we have a before snapshot and refresh_dom is on.
+
+        Callers pass before=None when refresh_dom is off — nothing to diff.
+        """
+        if not refresh_dom:
+            return
+        if before:
             from dom_parser import diff_dom
             diff = diff_dom(before, self._last_filtered)
             print(f"[DOM Diff] before={len(before)} after={len(self._last_filtered)} "
@@ -713,188 +1442,190 @@ class BrowserManager:
                   f"changed={len(diff['changed'])}")
             result["dom_changes"] = diff
         else:
-            print(f"[DOM Diff] skipped: refresh_dom={refresh_dom} before_len={len(before)}")
+            print("[DOM Diff] skipped: no snapshot before the action")
 
+    @_open_action
     def click(self, node_id, refresh_dom=True, fields=None):                      # 12
-        with self._lock:
-            self._ensure_open()
-            before = list(self._last_filtered)
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.click(timeout=cfg.get("click_timeout"))
-            result = self._action_result(f"Clicked [{node_id}]", refresh_dom=refresh_dom, fields=fields)
-            self._attach_dom_diff(before, result, refresh_dom)
-            return result
+        before = self._last_filtered if refresh_dom else None
+        sel = self._resolve(node_id)
+        self._locate(sel).click(timeout=cfg.get("click_timeout"))
+        result = self._action_result(f"Clicked [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        self._attach_dom_diff(before, result, refresh_dom)
+        return result
 
+    @_open_action
     def input_text(self, node_id, text, refresh_dom=True, fields=None):          # 13
-        """Click to focus, select all, then type character-by-character (fires key events)."""
-        with self._lock:
-            self._ensure_open()
-            before = list(self._last_filtered)
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.click(timeout=cfg.get("click_timeout"))
-            mod = "Meta" if self._is_mac() else "Control"
-            self._page.keyboard.press(f"{mod}+a")
-            self._page.keyboard.type(text, delay=cfg.get("type_delay"))
-            result = self._action_result(f"Typed into [{node_id}]", refresh_dom=refresh_dom, fields=fields)
-            self._attach_dom_diff(before, result, refresh_dom)
-            return result
+        """Click to focus, select all, then type character-by-character (fires key events).
+
+        With type_delay set to 0 the text is inserted in one go instead
+        (fires input, not per-key keydown/keyup).
+        """
+        before = self._last_filtered if refresh_dom else None
+        sel = self._resolve(node_id)
+        self._locate(sel).click(timeout=cfg.get("click_timeout"))
+        mod = "Meta" if self._is_mac() else "Control"
+        self._page.keyboard.press(f"{mod}+a")
+        delay = cfg.get("type_delay")
+        if delay:
+            self._page.keyboard.type(text, delay=delay)
+        else:
+            self._page.keyboard.insert_text(text)
+        result = self._action_result(f"Typed into [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        self._attach_dom_diff(before, result, refresh_dom)
+        return result
 
+    @_open_action
     def fill_text(self, node_id, text, refresh_dom=True, fields=None):           # 13b
         """Fast-path: use Playwright .fill() for simple forms that don't need key events."""
-        with self._lock:
-            self._ensure_open()
-            before = list(self._last_filtered)
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.fill(text, timeout=cfg.get("input_timeout"))
-            result = self._action_result(f"Filled [{node_id}]", refresh_dom=refresh_dom, fields=fields)
-            self._attach_dom_diff(before, result, refresh_dom)
-            return result
+        before = self._last_filtered if refresh_dom else None
+        sel = self._resolve(node_id)
+        self._locate(sel).fill(text, timeout=cfg.get("input_timeout"))
+        result = self._action_result(f"Filled [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        self._attach_dom_diff(before, result, refresh_dom)
+        return result
 
+    @_open_action
     def select(self, node_id, value, refresh_dom=True, fields=None):             # 14
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.select_option(value, timeout=cfg.get("input_timeout"))
-            return self._action_result(f"Selected '{value}' in [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).select_option(value, timeout=cfg.get("input_timeout"))
+        return self._action_result(f"Selected '{value}' in [{node_id}]", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def check(self, node_id, checked=True, refresh_dom=True, fields=None):       # 15
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.set_checked(checked, timeout=cfg.get("input_timeout"))
-            return self._action_result(f"{'Checked' if checked else 'Unchecked'} [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).set_checked(checked, timeout=cfg.get("input_timeout"))
+        return self._action_result(f"{'Checked' if checked else 'Unchecked'} [{node_id}]", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def submit(self, node_id, refresh_dom=True, fields=None):                    # 16
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.evaluate("el => { if (el.submit) el.submit(); else el.closest('form')?.submit(); }")
-            return self._action_result(f"Submitted [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).evaluate("el => { if (el.submit) el.submit(); else el.closest('form')?.submit(); }")
+        return self._action_result(f"Submitted [{node_id}]", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def hover(self, node_id, refresh_dom=True, fields=None):                     # 17
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.hover(timeout=cfg.get("hover_timeout"))
-            return self._action_result(f"Hovered [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).hover(timeout=cfg.get("hover_timeout"))
+        return self._action_result(f"Hovered [{node_id}]", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def focus(self, node_id, refresh_dom=True, fields=None):                     # 18
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.focus(timeout=cfg.get("click_timeout"))
-            return self._action_result(f"Focused [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).focus(timeout=cfg.get("click_timeout"))
+        return self._action_result(f"Focused [{node_id}]", refresh_dom=refresh_dom, fields=fields)
 
     # ==================================================================
     # 18b  JavaScript Execution
     # ==================================================================
 
-    def execute_js(self, script, refresh_dom=True, fields=None):
-        """Execute arbitrary JavaScript on the current page and return the result."""
-        with self._lock:
-            self._ensure_open()
-            result = self._page.evaluate(script)
-            return self._action_result(
-                f"JS result: {str(result)[:200]}",
-                refresh_dom=refresh_dom,
-                fields=fields,
-            )
+    @_call_budget(lambda _, *__, timeout=None, **___: _seconds(timeout))
+    @_open_action
+    def execute_js(self, script, refresh_dom=True, fields=None, timeout=None):
+        """Execute arbitrary JavaScript on the current page and return the result.
+
+        *timeout* (seconds) is how long an intentionally slow script may run
+        beyond action_hard_timeout before the call counts as hung.
+        """
+        result = self._page.evaluate(script)
+        # Scripts can change state without a mutation or event (el.value =
+        # ..., el.checked = ...), so the change stamp can't vouch for the page
+        self._snapshots.pop(self._page, None)
+        return self._action_result(
+            f"JS result: {str(result)[:200]}",
+            refresh_dom=refresh_dom,
+            fields=fields,
+        )
 
     # ==================================================================
     # 19-21  Scrolling
     # ==================================================================
 
+    def _scroll(self, delta: int):
+        # Constant source with the delta as an argument, so the page compiles
+        # the function once instead of a new script per distance
+        self._page.evaluate(_JS_SCROLL_BY, delta)
+
+    @_open_action
     def scroll_down(self, pixels=500, refresh_dom=True, fields=None):             # 19
-        with self._lock:
-            self._ensure_open()
-            self._page.evaluate(f"window.scrollBy(0, {int(pixels)})")
-            return self._action_result(f"Scrolled down {pixels}px", refresh_dom=refresh_dom, fields=fields)
+        self._scroll(int(pixels))
+        return self._action_result(f"Scrolled down {pixels}px", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def scroll_up(self, pixels=500, refresh_dom=True, fields=None):              # 20
-        with self._lock:
-            self._ensure_open()
-            self._page.evaluate(f"window.scrollBy(0, -{int(pixels)})")
-            return self._action_result(f"Scrolled up {pixels}px", refresh_dom=refresh_dom, fields=fields)
+        self._scroll(-int(pixels))
+        return self._action_result(f"Scrolled up {pixels}px", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def scroll_to(self, node_id, refresh_dom=True, fields=None):                 # 21
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.scroll_into_view_if_needed(timeout=cfg.get("scroll_timeout"))
-            return self._action_result(f"Scrolled to [{node_id}]", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).scroll_into_view_if_needed(timeout=cfg.get("scroll_timeout"))
+        return self._action_result(f"Scrolled to [{node_id}]", refresh_dom=refresh_dom, fields=fields)
 
     # ==================================================================
     # 22-23  Keyboard
     # ==================================================================
 
+    @_open_action
     def keypress(self, key, refresh_dom=True, fields=None):                       # 22
-        with self._lock:
-            self._ensure_open()
-            self._page.keyboard.press(key)
-            return self._action_result(f"Pressed {key}", refresh_dom=refresh_dom, fields=fields)
+        self._page.keyboard.press(key)
+        return self._action_result(f"Pressed {key}", refresh_dom=refresh_dom, fields=fields)
 
+    @_open_action
     def hotkey(self, keys, refresh_dom=True, fields=None):                       # 23
-        with self._lock:
-            self._ensure_open()
-            # Playwright accepts "Control+A" format directly
-            self._page.keyboard.press(keys)
-            return self._action_result(f"Pressed {keys}", refresh_dom=refresh_dom, fields=fields)
+        # Playwright accepts "Control+A" format directly
+        self._page.keyboard.press(keys)
+        return self._action_result(f"Pressed {keys}", refresh_dom=refresh_dom, fields=fields)
 
     # ==================================================================
     # 24-27  Tab Management
     # ==================================================================
 
+    @_open_action
     def get_tabs(self):                                             # 24
-        with self._lock:
-            self._ensure_open()
-            return {"status": "ok", "tabs": self._get_tabs_info()}
+        return {"status": "ok", "tabs": self._get_tabs_info()}
 
+    @_open_action
     def switch_tab(self, tab_id, refresh_dom=True, fields=None):                  # 25
-        with self._lock:
-            self._ensure_open()
-            pages = self._context.pages
+        pages = self._context.pages
+        if tab_id < 0 or tab_id >= len(pages):
+            raise ValueError(f"Invalid tab_id: {tab_id}")
+        self._page = pages[tab_id]
+        self._page.bring_to_front()
+        return self._action_result(f"Switched to tab {tab_id}", refresh_dom=refresh_dom, fields=fields)
+
+    @_open_action
+    def close_tab(self, tab_id=None):                               # 26
+        pages = self._context.pages
+        if tab_id is None:
+            target = self._page
+        else:
             if tab_id < 0 or tab_id >= len(pages):
                 raise ValueError(f"Invalid tab_id: {tab_id}")
-            self._page = pages[tab_id]
+            target = pages[tab_id]
+        target.close()
+        # switch to last remaining page
+        remaining = self._context.pages
+        if remaining:
+            self._page = remaining[-1]
             self._page.bring_to_front()
-            return self._action_result(f"Switched to tab {tab_id}", refresh_dom=refresh_dom, fields=fields)
-
-    def close_tab(self, tab_id=None):                               # 26
-        with self._lock:
-            self._ensure_open()
-            pages = self._context.pages
-            if tab_id is None:
-                target = self._page
-            else:
-                if tab_id < 0 or tab_id >= len(pages):
-                    raise ValueError(f"Invalid tab_id: {tab_id}")
-                target = pages[tab_id]
-            target.close()
-            # switch to last remaining page
-            remaining = self._context.pages
-            if remaining:
-                self._page = remaining[-1]
-                self._page.bring_to_front()
-            else:
-                self._page = None
-            tabs = [{"tab_id": i, "page_id": str(id(p)), "url": p.url, "title": p.title(), "active": p is self._page}
-                    for i, p in enumerate(remaining)]
-            return {"status": "ok", "tabs": tabs}
+        else:
+            self._page = None
+        # Background tab titles come from the _get_tabs_info cache
+        return {"status": "ok", "tabs": self._get_tabs_info()}
 
+    @_open_action
     def new_tab(self, url=None, refresh_dom=True, fields=None):                   # 27
-        with self._lock:
-            self._ensure_open()
-            new_page = self._context.new_page()
-            # download handler already registered via _on_new_page callback
-            # remove from _new_pages since this is an explicit new tab
-            if new_page in self._new_pages:
-                self._new_pages.remove(new_page)
-            self._page = new_page
-            if url:
-                if not url.startswith(("http://", "https://", "about:", "data:", "chrome:")):
-                    url = "https://" + url
-                self._page.goto(url, wait_until="domcontentloaded", timeout=cfg.get("nav_timeout"))
-            return self._action_result(f"New tab: {url or 'blank'}", refresh_dom=refresh_dom, fields=fields)
+        new_page = self._context.new_page()
+        # download handler already registered via _on_new_page callback
+        # remove from _new_pages since this is an explicit new tab
+        if new_page in self._new_pages:
+            self._new_pages.remove(new_page)
+        self._page = new_page
+        if url:
+            if not url.startswith(("http://", "https://", "about:", "data:", "chrome:")):
+                url = "https://" + url
+            self._page.goto(url, wait_until="domcontentloaded", timeout=cfg.get("nav_timeout"))
+        return self._action_result(f"New tab: {url or 'blank'}", refresh_dom=refresh_dom, fields=fields)
 
     # ==================================================================
     # 28-29  Screenshot
@@ -913,31 +1644,37 @@ class BrowserManager:
             except Exception:
                 return None
 
+    @_open_action
     def screenshot_element(self, node_id):                          # 29
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            return self._page.locator(sel).first.screenshot()
+        sel = self._resolve(node_id)
+        return self._locate(sel).screenshot()
 
     # ==================================================================
     # 30-31  File & Download
     # ==================================================================
 
+    @_open_action
     def upload(self, node_id, file_path, refresh_dom=True, fields=None):          # 30
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.set_input_files(file_path)
-            return self._action_result(f"Uploaded {file_path}", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).set_input_files(file_path)
+        return self._action_result(f"Uploaded {file_path}", refresh_dom=refresh_dom, fields=fields)
 
+    @_off_pw_thread
     def get_downloads(self):                                        # 31
-        with self._lock:
-            return {"status": "ok", "files": list(self._downloads)}
+        # Plain list copy — no need to queue behind a running action
+        return {"status": "ok", "files": list(self._downloads)}
 
     def _on_download(self, download):
+        if self._stale():
+            return
         path = os.path.join(self._download_dir, download.suggested_filename)
         try:
-            download.save_as(path)
+            # Move Playwright's finished temp file into place (a rename when
+            # both live on the same filesystem); copy only across devices.
+            try:
+                os.replace(download.path(), path)
+            except OSError:
+                download.save_as(path)
             self._downloads.append(path)
         except Exception:
             pass
@@ -946,43 +1683,39 @@ class BrowserManager:
     # 32-36  Page State
     # ==================================================================
 
+    @_open_action
     def get_cookies(self):                                          # 32
-        with self._lock:
-            self._ensure_open()
-            cookies = self._context.cookies()
-            return {"status": "ok", "cookies": cookies}
+        cookies = self._context.cookies()
+        return {"status": "ok", "cookies": cookies}
 
+    @_open_action
     def set_cookie(self, name, value):                              # 33
-        with self._lock:
-            self._ensure_open()
-            url = self._page.url
-            self._context.add_cookies([{"name": name, "value": value, "url": url}])
-            return {"status": "ok", "message": f"Cookie set: {name}"}
+        url = self._page.url
+        self._context.add_cookies([{"name": name, "value": value, "url": url}])
+        return {"status": "ok", "message": f"Cookie set: {name}"}
 
+    @_open_action
     def get_viewport(self):                                         # 34
-        with self._lock:
-            self._ensure_open()
-            info = self._page.evaluate("""() => ({
-                width: window.innerWidth,
-                height: window.innerHeight,
-                scroll_x: window.scrollX,
-                scroll_y: window.scrollY,
-                page_height: document.documentElement.scrollHeight,
-            })""")
-            return {"status": "ok", "viewport": info}
-
+        info = self._page.evaluate("""() => ({
+            width: window.innerWidth,
+            height: window.innerHeight,
+            scroll_x: window.scrollX,
+            scroll_y: window.scrollY,
+            page_height: document.documentElement.scrollHeight,
+        })""")
+        return {"status": "ok", "viewport": info}
+
+    @_call_budget(lambda _, seconds, **__: _seconds(seconds))
+    @_open_action
     def wait(self, seconds):                                        # 35
-        with self._lock:
-            self._ensure_open()
-            self._page.wait_for_timeout(int(seconds * 1000))
-            return {"status": "ok", "message": f"Waited {seconds}s"}
+        self._page.wait_for_timeout(int(seconds * 1000))
+        return {"status": "ok", "message": f"Waited {seconds}s"}
 
+    @_open_action
     def wait_for(self, node_id, refresh_dom=True, fields=None):                   # 36
-        with self._lock:
-            self._ensure_open()
-            sel = self._resolve(node_id)
-            self._page.locator(sel).first.wait_for(state="visible", timeout=cfg.get("wait_for_element_timeout"))
-            return self._action_result(f"[{node_id}] appeared", refresh_dom=refresh_dom, fields=fields)
+        sel = self._resolve(node_id)
+        self._locate(sel).wait_for(state="visible", timeout=cfg.get("wait_for_element_timeout"))
+        return self._action_result(f"[{node_id}] appeared", refresh_dom=refresh_dom, fields=fields)
 
     # ==================================================================
     # 37  Browser Control
@@ -994,24 +1727,8 @@ class BrowserManager:
                 return {"status": "error", "message": "Browser is not open"}
             if save_session:
                 self._save_session()
-            try:
-                self._browser.close()
-            except Exception:
-                pass
-            try:
-                self._playwright.stop()
-            except Exception:
-                pass
-            self._page = None
-            self._context = None
-            self._browser = None
-            self._playwright = None
-            self._node_map = {}
-            self._xpath_map = {}
-            self._last_filtered = []
-            self._last_result = {}
+            self._cleanup_browser()
             self._downloads = []
-            self._new_pages = []
             return {"status": "ok", "message": "Browser closed"}
 
     # ==================================================================
@@ -1058,8 +1775,6 @@ class BrowserManager:
         Uses an isolated Playwright page so the main browser session is
         never touched.
         """
-        import re
-
         # Navigate to URL
         page.goto(url, wait_until="domcontentloaded", timeout=cfg.get("benchmark_timeout"))
         try:
@@ -1067,100 +1782,17 @@ class BrowserManager:
         except Exception:
             pass
 
-        # 1. Get visible-only text via JS  (same hidden logic as dom_walker)
-        visible_text = page.evaluate("""() => {
-            const SKIP = new Set([
-                'SCRIPT','STYLE','NOSCRIPT','TEMPLATE','SVG','LINK','META',
-                'HEAD','IFRAME','OBJECT','EMBED'
-            ]);
-
-            function isHidden(el) {
-                if (!el || el.nodeType !== 1) return false;
-                if (el.hasAttribute('hidden')) return true;
-                if ((el.getAttribute('aria-hidden') || '').toLowerCase() === 'true') return true;
-                if (el.tagName === 'INPUT' && (el.getAttribute('type') || '').toLowerCase() === 'hidden') return true;
-                if (el.tagName === 'DIALOG' && !el.hasAttribute('open')) return true;
-                const cs = window.getComputedStyle(el);
-                if (cs.display === 'none' || cs.visibility === 'hidden' || cs.opacity === '0') return true;
-                const rect = el.getBoundingClientRect();
-                if (rect.width === 0 && rect.height === 0 && el.children.length === 0) return true;
-                return false;
-            }
-
-            function collectText(el) {
-                if (SKIP.has(el.tagName)) return '';
-                if (isHidden(el)) return '';
-                const parts = [];
-                for (const child of el.childNodes) {
-                    if (child.nodeType === 3) {
-                        const t = child.textContent.trim();
-                        if (t) parts.push(t);
-                    } else if (child.nodeType === 1) {
-                        parts.push(collectText(child));
-                    }
-                }
-                return parts.filter(Boolean).join('\\n');
-            }
-
-            return collectText(document.body);
-        }""")
-
-        # 2. Run DOM parsing on the benchmark page (not self._page)
+        # 1+2. Visible-only text, title and the walker output in one round-trip
         _load_js_walker()
-        hints = _get_hints()
-        prefix_re = "|".join(hints["icon_class_prefixes"])
-        material_re = "|".join(
-            c.replace("-", "[_-]") for c in hints["material_icon_classes"]
-        )
-        clone_sel = ", ".join(hints.get("carousel_clone_selectors", []))
-        walker_cfg = {
-            "skipTags": [
-                "script", "style", "meta", "link", "noscript",
-                "head", "br", "hr", "iframe", "object", "embed",
-                "template", "slot", "col",
-            ],
-            "inlineTags": [
-                "a", "span", "strong", "em", "b", "i", "u", "s",
-                "code", "kbd", "mark", "small", "sub", "sup",
-                "abbr", "cite", "time", "label",
-            ],
-            "attrRules": {
-                "a": ["href"], "img": ["src", "alt"],
-                "input": ["type", "name", "placeholder", "value"],
-                "textarea": ["name", "placeholder"],
-                "select": ["name"], "option": ["value"],
-                "button": ["type"],
-                "form": ["action", "method"],
-                "video": ["src"], "audio": ["src"],
-                "source": ["src", "type"],
-                "th": ["colspan", "rowspan"], "td": ["colspan", "rowspan"],
-            },
-            "globalAttrs": ["id", "role", "aria-label", "title"],
-            "stateAttrs": [
-                "disabled", "checked", "readonly", "required",
-                "aria-expanded", "aria-selected", "aria-checked",
-                "aria-pressed", "aria-current",
-                "aria-valuenow", "aria-valuemin", "aria-valuemax",
-            ],
-            "maxTextLen": 0,
-            "maxDepth": cfg.get("max_depth"),
-            "maxNodes": cfg.get("max_nodes"),
-            "iconPrefixes": prefix_re,
-            "materialClasses": material_re,
-            "semanticKeywords": hints["semantic_keywords"],
-            "cloneSelectors": clone_sel,
-            "stateClasses": hints.get("switchable_state_classes", []),
-            "typeableInputTypes": [
-                "text", "search", "email", "password", "url", "tel", "number", "",
-            ],
-            "clickableInputTypes": ["submit", "button", "reset", "image"],
-            "grayTextMinRgb": cfg.get("gray_text_min_rgb"),
-            "grayTextMaxDiff": cfg.get("gray_text_max_diff"),
-            "iconMaxSize": cfg.get("icon_max_size"),
-        }
-        dom_nodes = page.evaluate(_JS_DOM_WALKER, walker_cfg)
-        html_len = page.evaluate("document.documentElement.outerHTML.length")
-        page_url = page.url
+        res = page.evaluate(
+            _JS_BENCH_CALL, [_get_hints().walker_cfg, _JS_WALKER_MTIME])
+        visible_text, title, walked = res["text"], res["title"], res["walk"]
+        if walked is None:
+            # Context lacks the current walker (dom_walker.js just changed)
+            dom_nodes, html_len, page_url, _ = _run_walker(page, _get_hints().walker_cfg)
+        else:
+            dom_nodes = _nodes_from_columns(walked["nodes"])
+            html_len, page_url = walked["htmlLen"], walked["url"]
 
         import compressor_manager
         dom_result = compressor_manager.run(page_url, dom_nodes, html_len)
@@ -1169,39 +1801,13 @@ class BrowserManager:
         stats = dom_result["stats"]
 
         # 3. Calculate completeness: visible text lines matched in tree
-        #    Strip structural markers ⟨ ⟩, [edit] suffixes, etc.
-        clean_tree = tree
-        clean_tree = re.sub(r'[⟨⟩]', '', clean_tree)   # remove link markers
-        clean_tree = re.sub(r'\[edit\]', '', clean_tree)
-        clean_tree_lower = clean_tree.lower()
-
-        visible_lines = [
-            ln.strip() for ln in visible_text.split('\n')
-            if ln.strip() and len(ln.strip()) >= 3
-        ]
-
-        matched = 0
-        for line in visible_lines:
-            clean_line = re.sub(r'\[edit\]', '', line).strip()
-            if not clean_line:
-                continue
-            # Try exact first-N-chars match
-            probe = clean_line[:50].lower()
-            if probe in clean_tree_lower:
-                matched += 1
-            elif len(clean_line) >= 10:
-                # Try shorter match for truncated content
-                short = clean_line[:25].lower()
-                if short in clean_tree_lower:
-                    matched += 1
-
-        total = max(len(visible_lines), 1)
+        matched, total = _score_completeness(visible_text, tree)
         completeness = round(matched / total, 4)
 
         return {
             "status": "ok",
             "url": page_url,
-            "title": page.title(),
+            "title": title,
             "stats": stats,
             "completeness": completeness,
             "completeness_pct": f"{completeness * 100:.1f}%",
@@ -1213,27 +1819,42 @@ class BrowserManager:
     def _launch_benchmark_browser(self):
         """Launch an isolated browser for benchmarking.
 
-        Reuses the existing Playwright instance (if the main browser is
-        running) so we don't hit the "sync API inside asyncio loop" error.
-        If no main browser exists, starts a fresh Playwright.
+        Benchmarks run off the Playwright thread, and the sync API can't be
+        shared across threads, so each call starts its own Playwright.
 
-        Returns (pw_to_stop, browser, page):
-          - pw_to_stop: the Playwright handle to stop afterwards, or None
-                        if we borrowed the main one.
+        Returns (pw_to_stop, browser).
         """
-        own_pw = None
-        pw = self._playwright
-        if pw is None:
-            pw = sync_playwright().start()
-            own_pw = pw
-        browser = pw.chromium.launch(
-            headless=cfg.get("headless"), channel="chrome",
-            args=["--no-sandbox", "--disable-dev-shm-usage"],
-        )
+        pw = sync_playwright().start()
+        try:
+            browser = pw.chromium.launch(
+                headless=cfg.get("headless"), channel="chrome",
+                args=["--no-sandbox", "--disable-dev-shm-usage"],
+            )
+        except Exception:
+            pw.stop()
+            raise
+        return pw, browser
+
+    @staticmethod
+    def _new_benchmark_context(browser):
+        """Fresh context with the walker preloaded on every page."""
+        _load_js_walker()
         context = browser.new_context()
-        page = context.new_page()
-        return own_pw, browser, page
+        context.add_init_script(_walker_init_script())
+        return context
+
+    @staticmethod
+    def _close_benchmark_browser(pw, browser):
+        try:
+            browser.close()
+        except Exception:
+            pass
+        try:
+            pw.stop()
+        except Exception:
+            pass
 
+    @_off_pw_thread
     def benchmark(self, url=None):
         """Benchmark DOM parsing quality for a given URL.
 
@@ -1242,64 +1863,94 @@ class BrowserManager:
         """
         if not url:
             raise ValueError("url is required for benchmark")
-        own_pw, browser, page = self._launch_benchmark_browser()
+        pw, browser = self._launch_benchmark_browser()
         try:
+            page = self._new_benchmark_context(browser).new_page()
             return self._benchmark_page(page, url)
         finally:
-            try:
-                browser.close()
-            except Exception:
-                pass
-            if own_pw:
+            self._close_benchmark_browser(pw, browser)
+
+    def _benchmark_urls(self, urls):
+        """Benchmark *urls* sequentially in one isolated browser.
+
+        Consecutive URLs on the same host share one BrowserContext (and
+        page), so DNS / TLS / HTTP/2 connections are reused within the
+        group; each new host gets a fresh context.
+        """
+        pw, browser = self._launch_benchmark_browser()
+        results = []
+        try:
+            for _, group in itertools.groupby(urls, key=_url_origin):
+                context = self._new_benchmark_context(browser)
+                page = context.new_page()
+                for url in group:
+                    try:
+                        result = self._benchmark_page(page, url)
+                        results.append(result)
+                    except Exception as e:
+                        results.append({
+                            "status": "error",
+                            "url": url,
+                            "message": str(e),
+                        })
                 try:
-                    own_pw.stop()
+                    context.close()
                 except Exception:
                     pass
+        finally:
+            self._close_benchmark_browser(pw, browser)
+        return results
 
+    @_off_pw_thread
     def benchmark_batch(self, urls):
-        """Benchmark multiple URLs in one isolated browser session.
+        """Benchmark multiple URLs using isolated browser sessions.
 
-        Uses a separate browser instance — the main session is untouched.
+        URLs are grouped by host and the groups spread over up to
+        ``benchmark_concurrency`` threads, each with its own Playwright + browser,
+        so page loads overlap instead of queueing while same-host URLs
+        still share connections.  Results keep the input order.  The main
+        session is untouched.
         """
         if not urls:
             raise ValueError("urls list is required")
-        own_pw, browser, page = self._launch_benchmark_browser()
-        results = []
-        try:
-            for url in urls:
-                try:
-                    result = self._benchmark_page(page, url)
-                    results.append(result)
-                except Exception as e:
-                    results.append({
-                        "status": "error",
-                        "url": url,
-                        "message": str(e),
-                    })
-        finally:
-            try:
-                browser.close()
-            except Exception:
-                pass
-            if own_pw:
-                try:
-                    own_pw.stop()
-                except Exception:
-                    pass
+        groups: dict[str, list[int]] = {}
+        for i, url in enumerate(urls):
+            groups.setdefault(_url_origin(url), []).append(i)
+        workers = max(1, min(int(cfg.get("benchmark_concurrency")), len(groups)))
+        if workers <= 1:
+            order = [i for idxs in groups.values() for i in idxs]
+            out = self._benchmark_urls([urls[i] for i in order])
+            results = [None] * len(urls)
+            for i, res in zip(order, out):
+                results[i] = res
+            return results
+        # Largest groups first, each onto the least-loaded worker
+        shards: list[list[int]] = [[] for _ in range(workers)]
+        for idxs in sorted(groups.values(), key=len, reverse=True):
+            min(shards, key=len).extend(idxs)
+        results = [None] * len(urls)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="benchmark"
+        ) as ex:
+            shard_results = ex.map(
+                lambda shard: self._benchmark_urls([urls[i] for i in shard]),
+                shards,
+            )
+            for shard, res in zip(shards, shard_results):
+                for i, r in zip(shard, res):
+                    results[i] = r
         return results
 
     def _cleanup_browser(self):
         """Tear down browser without relaunching (caller holds _lock)."""
         if self._browser:
-            try:
-                self._browser.close()
-            except Exception:
-                pass
+            _best_effort(self._browser.close)
         if self._playwright:
-            try:
-                self._playwright.stop()
-            except Exception:
-                pass
+            _best_effort(self._playwright.stop)
+        self._forget_browser()
+
+    def _forget_browser(self):
+        """Drop every reference to the browser session and its page state."""
         self._page = None
         self._context = None
         self._browser = None
@@ -1309,3 +1960,6 @@ class BrowserManager:
         self._last_filtered = []
         self._last_result = {}
         self._new_pages = []
+        self._tab_titles = {}
+        self._snapshots = {}
+        self._locators = {}
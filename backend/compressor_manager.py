@@ -16,13 +16,22 @@ URL matching priority:
 """
 
 import importlib.util
-import inspect
 import os
+import re
+import stat
+import time
+import types
 import fnmatch
+import functools
 
 import config as _cfg
 from dom_parser import assemble_result
 
+try:
+    import ahocorasick  # pyahocorasick — one-pass literal prefilter for big rule sets
+except ImportError:
+    ahocorasick = None
+
 _COMPRESSOR_DIR = os.path.join(os.path.dirname(__file__), "compressors")
 
 # Official bundled compressor names (not including "default")
@@ -51,17 +60,12 @@ def process(dom_nodes, settings=None):
     """
     # Import helpers from the default compressor:
     from compressors.default import (
-        _flat_to_tree, _simplify, _collapse_popups,
+        _flat_to_tree, _simplify_until_stable, _collapse_popups,
         _truncate_long_lists, _prune_empty_leaves, _tree_to_flat,
-        _count_nodes,
     )
 
     tree = _flat_to_tree(dom_nodes)
-    for _ in range(10):
-        before = _count_nodes(tree)
-        tree = _simplify(tree)
-        if _count_nodes(tree) == before:
-            break
+    tree = _simplify_until_stable(tree)
     tree = _collapse_popups(tree)
     tree = _truncate_long_lists(tree)
     tree = _prune_empty_leaves(tree)
@@ -69,44 +73,146 @@ def process(dom_nodes, settings=None):
 '''
 
 # ---------------------------------------------------------------------------
-# Script loading (with mtime cache)
+# Script loading (with stat cache)
 # ---------------------------------------------------------------------------
 
-_cache = {}  # {name: (mtime, module)}
+_cache = {}  # {name: (stat key, module, URL_PATTERNS tuple, settings defaults, takes settings)}
+_missing = {}  # {name: monotonic time until which the script is known absent}
+_MISSING_TTL = 2.0
+_registry = {"key": None, "names": ()}  # script names, keyed on the dir's stat
+_sources = {}  # {name: (stat key, source code)}
 
+# Bumped whenever a script is written or deleted, so callers can cache
+# compressor output (see BrowserManager._refresh_dom_with)
+scripts_version = 0
+
+
+def _stat_key(st):
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _invalidate(name):
+    """Forget a script's cached module (and absence) after writing/deleting it."""
+    global scripts_version
+    scripts_version += 1
+    _cache.pop(name, None)
+    _missing.pop(name, None)
+    _sources.pop(name, None)
+    _registry["key"] = None
+
+
+def _script_names():
+    """Sorted script names (no .py, no _private files) in the compressors dir.
+
+    The directory is only re-listed when its own mtime changes, i.e. when a
+    script is added, removed or renamed; edits in place are caught by the
+    per-file stat in _load_entry.
+    """
+    st = os.stat(_COMPRESSOR_DIR)
+    key = (st.st_mtime_ns, st.st_ino)
+    if _registry["key"] != key:
+        with os.scandir(_COMPRESSOR_DIR) as it:
+            fnames = sorted(
+                e.name for e in it
+                if e.name.endswith(".py") and not e.name.startswith("_")
+                and e.is_file()
+            )
+        _registry["names"] = tuple(f[:-3] for f in fnames)
+        _registry["key"] = key
+    return _registry["names"]
+
+
+def _read_source(name):
+    """A script's source code (cached per file stat), or None if missing."""
+    path = os.path.join(_COMPRESSOR_DIR, f"{name}.py")
+    try:
+        st = os.stat(path)
+    except OSError:
+        _sources.pop(name, None)
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    key = _stat_key(st)
+    cached = _sources.get(name)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        code = f.read()
+    _sources[name] = (key, code)
+    return code
 
-def _load_script(name):
-    """Load a compressor script by name (without .py). Returns module or None.
 
-    Uses mtime-based caching: only re-reads from disk if file was modified.
+def _load_entry(name):
+    """Load a compressor script by name; returns its _cache entry or None.
+
+    One stat() per call: the file is only re-read when its mtime, size or
+    inode changed.  Missing scripts are remembered for _MISSING_TTL seconds.
     """
+    now = time.monotonic()
+    if _missing.get(name, 0) > now:
+        return None
     path = os.path.join(_COMPRESSOR_DIR, f"{name}.py")
-    if not os.path.isfile(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         _cache.pop(name, None)
+        _missing[name] = now + _MISSING_TTL
         return None
-    mtime = os.path.getmtime(path)
+    key = _stat_key(st)
     cached = _cache.get(name)
-    if cached and cached[0] == mtime:
-        return cached[1]
+    if cached and cached[0] == key:
+        return cached
     # (Re)load from disk
     spec = importlib.util.spec_from_file_location(f"compressors.{name}", path)
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)
-    _cache[name] = (mtime, mod)
-    return mod
+    patterns = getattr(mod, "URL_PATTERNS", ())
+    patterns = tuple(patterns) if isinstance(patterns, (list, tuple)) else ()
+    try:
+        defaults = {item["key"]: item["default"]
+                    for item in getattr(mod, "SCRIPT_SETTINGS", ())}
+    except Exception:
+        defaults = {}
+    entry = (key, mod, patterns, defaults, _takes_settings(getattr(mod, "process", None)))
+    _cache[name] = entry
+    return entry
+
+
+def _takes_settings(process):
+    """Whether process() accepts a second (settings) parameter.
+
+    Old scripts take process(dom_nodes), newer ones process(dom_nodes,
+    settings).  Plain functions are read off their code object; anything
+    else (bound methods, whose code counts self; wrapped or callable
+    objects) goes through inspect.signature.
+    """
+    if type(process) is types.FunctionType and not hasattr(process, "__wrapped__"):
+        code = process.__code__
+        n = code.co_argcount + code.co_kwonlyargcount
+        n += bool(code.co_flags & 0x04) + bool(code.co_flags & 0x08)  # *args, **kwargs
+        return n >= 2
+    import inspect
+    try:
+        return len(inspect.signature(process).parameters) >= 2
+    except (TypeError, ValueError):
+        return False
+
+
+def _load_script(name):
+    """Load a compressor script by name (without .py). Returns module or None."""
+    entry = _load_entry(name)
+    return entry[1] if entry else None
 
 
 def _get_script_patterns(name):
-    """Read URL_PATTERNS from a script. Returns list of patterns or []."""
+    """Read URL_PATTERNS from a script. Returns a tuple of patterns or ()."""
     try:
-        mod = _load_script(name)
-        if mod and hasattr(mod, "URL_PATTERNS"):
-            patterns = mod.URL_PATTERNS
-            if isinstance(patterns, (list, tuple)):
-                return list(patterns)
+        entry = _load_entry(name)
     except Exception:
-        pass
-    return []
+        return ()
+    return entry[2] if entry else ()
 
 
 def _is_disabled(name):
@@ -117,11 +223,8 @@ def _is_disabled(name):
 
 def _resolve_settings(name):
     """Build resolved settings for a script: SCRIPT_SETTINGS defaults + user overrides."""
-    mod = _load_script(name)
-    result = {}
-    if mod and hasattr(mod, "SCRIPT_SETTINGS"):
-        for item in mod.SCRIPT_SETTINGS:
-            result[item["key"]] = item["default"]
+    entry = _load_entry(name)
+    result = dict(entry[3]) if entry else {}
     # Apply user overrides
     all_overrides = _cfg.get("compressor_settings") or {}
     user = all_overrides.get(name, {})
@@ -133,6 +236,134 @@ def _resolve_settings(name):
 # URL matching (two-tier)
 # ---------------------------------------------------------------------------
 
+def _glob_predicate(pattern):
+    """A fnmatch-equivalent test for one (already normcased) glob.
+
+    Globs made only of literals and '*' — every URL_PATTERNS entry and
+    nearly every rule — become str.startswith/find/endswith checks, which
+    beat a regex with a leading '.*' several times over on a miss.
+    Anything with '?' or '[...]' falls back to the translated regex.
+    """
+    if "?" in pattern or "[" in pattern:
+        return re.compile(fnmatch.translate(pattern)).match
+    parts = pattern.split("*")
+    if len(parts) == 1:
+        return pattern.__eq__
+    first, middles, last = parts[0], [m for m in parts[1:-1] if m], parts[-1]
+    if not first and not last and len(middles) == 1:
+        (literal,) = middles
+        return lambda url: literal in url  # "*literal*"
+    min_len = len(first) + len(last)
+
+    def match(url):
+        if (len(url) < min_len or not url.startswith(first)
+                or not url.endswith(last)):
+            return False
+        # '*' spans anything, so leftmost placement of each middle part
+        # is always a valid choice.
+        pos, end = len(first), len(url) - len(last)
+        for m in middles:
+            i = url.find(m, pos, end)
+            if i < 0:
+                return False
+            pos = i + len(m)
+        return True
+
+    return match
+
+
+# Below this many globs a straight in-order loop is cheaper than the prefilter.
+_PREFILTER_MIN = 32
+
+
+def _glob_key_literal(pattern):
+    """Longest literal run a URL must contain to match a '*'-only glob,
+    or "" when there is none (or the glob uses '?' / '[...]')."""
+    if "?" in pattern or "[" in pattern:
+        return ""
+    return max(pattern.split("*"), key=len)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_globs(entries):
+    """Compile a tuple of (glob, target) for _match_globs.
+
+    Returns (pairs, automaton, always): ordered (predicate, target) pairs
+    and, for large sets with pyahocorasick available, an automaton that
+    maps each glob's key literal to its indices plus the indices of globs
+    with no key literal (always candidates).  Otherwise automaton is None.
+    """
+    patterns = [os.path.normcase(pattern) for pattern, _ in entries]
+    pairs = tuple(
+        (_glob_predicate(pattern), target)
+        for pattern, (_, target) in zip(patterns, entries)
+    )
+    if ahocorasick is None or len(pairs) < _PREFILTER_MIN:
+        return pairs, None, ()
+    by_literal = {}
+    always = []
+    for i, pattern in enumerate(patterns):
+        literal = _glob_key_literal(pattern)
+        if literal:
+            by_literal.setdefault(literal, []).append(i)
+        else:
+            always.append(i)
+    automaton = ahocorasick.Automaton()
+    for literal, indices in by_literal.items():
+        automaton.add_word(literal, tuple(indices))
+    automaton.make_automaton()
+    return pairs, automaton, tuple(always)
+
+
+@functools.lru_cache(maxsize=256)
+def _match_globs(url, entries):
+    """Target of the first (glob, target) in *entries* matching *url*, or None.
+
+    Memoized: the same page is usually compressed many times in a row (once
+    per action), and a changed rule or script yields a different *entries*.
+    """
+    url = os.path.normcase(url)
+    pairs, automaton, always = _compile_globs(entries)
+    if automaton is None:
+        for matches, target in pairs:
+            if matches(url):
+                return target
+        return None
+    # Large rule set: one sweep finds the globs whose key literal occurs in
+    # the URL; only those (in order) get the full check.
+    candidates = set(always)
+    for _, indices in automaton.iter(url):
+        candidates.update(indices)
+    for i in sorted(candidates):
+        matches, target = pairs[i]
+        if matches(url):
+            return target
+    return None
+
+
+_rule_entries_cache = (None, None, ())  # (rules list, config version, entries)
+
+
+def _rule_entries(rules):
+    """Platform rules as an ordered (glob, script) tuple for _match_globs.
+
+    Rebuilt only when a different rules list comes in or config changes,
+    so the per-request cost is an identity check.  The cache is swapped as
+    one tuple, so concurrent requests never see a mixed state.
+    """
+    global _rule_entries_cache
+    cached_rules, cached_version, entries = _rule_entries_cache
+    version = _cfg.version
+    if cached_rules is not rules or cached_version != version:
+        entries = tuple(
+            (rule.get("pattern", ""), rule.get("script", ""))
+            for rule in rules
+            if rule.get("pattern") and rule.get("script")
+        )
+        _rule_entries_cache = (rules, version, entries)
+    return entries
+
+
 def match_script(url, rules=None):
     """Return the compressor script name for this URL.
 
@@ -144,27 +375,22 @@ def match_script(url, rules=None):
     # --- Tier 1: platform-level rules ---
     if rules is None:
         rules = _cfg.get("compressor_rules") or []
-    for rule in rules:
-        pattern = rule.get("pattern", "")
-        script = rule.get("script", "")
-        if pattern and script and fnmatch.fnmatch(url, pattern):
-            return script
+    script = _match_globs(url, _rule_entries(rules))
+    if script:
+        return script
 
     # --- Tier 2: script-level URL_PATTERNS (skip disabled scripts) ---
-    for fname in sorted(os.listdir(_COMPRESSOR_DIR)):
-        if not fname.endswith(".py") or fname.startswith("_"):
-            continue
-        name = fname[:-3]
+    entries = []
+    for name in _script_names():
         if name == "default":
             continue
         # Skip disabled scripts
         if _is_disabled(name):
             continue
-        for pattern in _get_script_patterns(name):
-            if pattern and fnmatch.fnmatch(url, pattern):
-                return name
-
-    return "default"
+        entries.extend(
+            (pattern, name) for pattern in _get_script_patterns(name) if pattern
+        )
+    return _match_globs(url, tuple(entries)) or "default"
 
 
 # ---------------------------------------------------------------------------
@@ -176,50 +402,58 @@ def run(url, dom_nodes, html_len):
     rules = _cfg.get("compressor_rules") or []
     script_name = match_script(url, rules)
 
-    mod = _load_script(script_name)
-    if mod is None or not hasattr(mod, "process"):
-        mod = _load_script("default")
+    entry = _load_entry(script_name)
+    if entry is None or not hasattr(entry[1], "process"):
+        entry = _load_entry("default")
         script_name = "default"
+    mod = entry[1]
 
     # Build per-script settings
     settings = _resolve_settings(script_name)
 
+    # Compressors build their tree in place (_flat_to_tree); a non-default
+    # script gets copies so the default fallback below sees untouched nodes.
+    # The default itself isn't retried: it would only see its own half-built
+    # tree.
+    script_nodes = (dom_nodes if script_name == "default"
+                    else [dict(n) for n in dom_nodes])
     try:
         # Support both old (dom_nodes) and new (dom_nodes, settings) signatures
-        sig = inspect.signature(mod.process)
-        if len(sig.parameters) >= 2:
-            filtered = mod.process(dom_nodes, settings=settings)
+        if entry[4]:
+            filtered = mod.process(script_nodes, settings=settings)
         else:
-            filtered = mod.process(dom_nodes)
+            filtered = mod.process(script_nodes)
     except Exception as e:
+        if script_name == "default":
+            raise
         print(f"[Compressor] Error in '{script_name}': {e}, falling back to default")
         default_mod = _load_script("default")
         filtered = default_mod.process(dom_nodes)
 
-    return assemble_result(dom_nodes, filtered, html_len)
+    return assemble_result(len(dom_nodes), filtered, html_len)
 
 
 # ---------------------------------------------------------------------------
 # CRUD helpers
 # ---------------------------------------------------------------------------
 
-def list_scripts():
+def list_scripts(include_code=False):
     """List all compressor scripts with metadata.
 
-    Also detects duplicate SCRIPT_ID values and marks them.
+    Source code is only included with *include_code*; editors fetch it per
+    script through read_script().  Also detects duplicate SCRIPT_ID values
+    and marks them.
     """
     disabled = _cfg.get("disabled_compressors") or []
     all_overrides = _cfg.get("compressor_settings") or {}
     scripts = []
     seen_ids = {}  # {script_id: [name, ...]}
 
-    for fname in sorted(os.listdir(_COMPRESSOR_DIR)):
-        if not fname.endswith(".py") or fname.startswith("_"):
-            continue
-        name = fname[:-3]
-        path = os.path.join(_COMPRESSOR_DIR, fname)
-        with open(path, "r", encoding="utf-8") as f:
-            code = f.read()
+    for name in _script_names():
+        if include_code:
+            code = _read_source(name)
+            if code is None:
+                continue  # removed since the listing
         # Extract metadata from module
         desc = ""
         patterns = []
@@ -228,6 +462,8 @@ def list_scripts():
         script_settings = []
         try:
             mod = _load_script(name)
+            if mod is None and not include_code:
+                continue  # removed since the listing
             if mod and mod.__doc__:
                 desc = mod.__doc__.strip().split("\n")[0]
             if mod and hasattr(mod, "URL_PATTERNS"):
@@ -253,19 +489,21 @@ def list_scripts():
         user_overrides = all_overrides.get(name, {})
         settings_values.update(user_overrides)
 
-        scripts.append({
+        entry = {
             "name": name,
             "description": desc,
             "builtin": name == "default",
             "official": is_official,
             "enabled": name not in disabled,
-            "code": code,
             "url_patterns": patterns,
             "script_id": resolved_id,
             "version": version,
             "settings": script_settings,
             "settings_values": settings_values,
-        })
+        }
+        if include_code:
+            entry["code"] = code
+        scripts.append(entry)
 
     # Mark duplicate IDs
     dup_ids = {sid for sid, names in seen_ids.items() if len(names) > 1}
@@ -278,11 +516,7 @@ def list_scripts():
 
 def read_script(name):
     """Read a script's source code. Returns None if not found."""
-    path = os.path.join(_COMPRESSOR_DIR, f"{name}.py")
-    if not os.path.isfile(path):
-        return None
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    return _read_source(name)
 
 
 def write_script(name, code):
@@ -296,7 +530,7 @@ def write_script(name, code):
     path = os.path.join(_COMPRESSOR_DIR, f"{name}.py")
     with open(path, "w", encoding="utf-8") as f:
         f.write(code)
-    _cache.pop(name, None)  # invalidate cache so next load picks up new code
+    _invalidate(name)  # so the next load picks up the new code
 
 
 def delete_script(name):
@@ -308,6 +542,6 @@ def delete_script(name):
     path = os.path.join(_COMPRESSOR_DIR, f"{name}.py")
     if os.path.isfile(path):
         os.remove(path)
-        _cache.pop(name, None)
+        _invalidate(name)
     else:
         raise ValueError(f"Script '{name}' not found")
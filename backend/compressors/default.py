@@ -15,6 +15,7 @@ Pipeline:
 SCRIPT_ID = "default"
 SCRIPT_VERSION = "2025.01.15.1"
 
+import functools
 import re
 
 # ---------------------------------------------------------------------------
@@ -36,51 +37,98 @@ _RE_TRANSPARENT_ROLE = re.compile(
     r',?\s*role="(?:' + "|".join(TRANSPARENT_ROLES) + r')"'
 )
 _RE_ID_ATTR = re.compile(r',?\s*id="[^"]*"')
+_POPUP_ROLE_ATTRS = tuple(f'role="{role}"' for role in POPUP_ROLES)
 
 # ---------------------------------------------------------------------------
 # Tree conversion
 # ---------------------------------------------------------------------------
 
 def _flat_to_tree(nodes):
+    """Rebuild the hierarchy from the depth-ordered *nodes*, in place.
+
+    Each node dict gets its own "children" list and becomes the tree node
+    itself (no per-node copy), so the caller hands the dicts over.
+    """
     roots = []
-    stack = [(-1, None)]
+    depths = [-1]
+    parents = [None]
     for n in nodes:
-        tree_node = {**n, "children": []}
+        n["children"] = []
         d = n["depth"]
-        while len(stack) > 1 and stack[-1][0] >= d:
-            stack.pop()
-        parent = stack[-1][1]
+        while len(depths) > 1 and depths[-1] >= d:
+            depths.pop()
+            parents.pop()
+        parent = parents[-1]
         if parent is None:
-            roots.append(tree_node)
+            roots.append(n)
         else:
-            parent["children"].append(tree_node)
-        stack.append((d, tree_node))
+            parent["children"].append(n)
+        depths.append(d)
+        parents.append(n)
     return roots
 
 
+def _post_order(roots, visit, enter=None):
+    """Rebuild a forest bottom-up without recursion.
+
+    For every node, its children list is rewritten first, then
+    ``visit(node, out)`` appends whatever should replace the node (itself,
+    its children, or nothing) to *out*, its parent's new children list.
+    ``enter(node, out)`` may return False to handle a node without
+    descending into it.  Returns the new root list.
+    """
+    out_root = []
+    stack = [(iter(roots), out_root, None, None)]
+    while stack:
+        it, out, owner, owner_out = stack[-1]
+        for node in it:
+            if enter is not None and not enter(node, out):
+                continue
+            if node["children"]:
+                stack.append((iter(node["children"]), [], node, out))
+                break
+            visit(node, out)  # leaf: nothing to rewrite below it
+        else:
+            stack.pop()
+            if owner is not None:
+                owner["children"] = out
+                visit(owner, owner_out)
+    return out_root
+
+
 def _tree_to_flat(roots):
-    flat = []
+    """Flatten in pre-order, numbering nodes with hierarchical IDs (1.2.3).
 
-    def _walk(nodes, depth, prefix):
-        for i, node in enumerate(nodes, 1):
-            hid = f"{prefix}{i}" if prefix else str(i)
-            flat.append({
+    Iterative, like _post_order: each stack frame is a level's
+    (enumerate iterator, depth, hid prefix).
+    """
+    flat = []
+    append = flat.append
+    stack = [(enumerate(roots, 1), 0, "")]
+    while stack:
+        it, depth, prefix = stack[-1]
+        for i, node in it:
+            hid = f"{prefix}{i}"
+            get = node.get
+            append({
                 "hid": hid,
                 "depth": depth,
                 "tag": node["tag"],
                 "attrs": node["attrs"],
                 "text": node["text"],
-                "selector": node.get("selector", ""),
-                "xpath": node.get("xpath", ""),
-                "actions": node.get("actions", []),
-                "label": node.get("label", ""),
-                "formLabel": node.get("formLabel", ""),
-                "state": node.get("state", {}),
-                "inlined": node.get("inlined", False),
+                "selector": get("selector", ""),
+                "xpath": get("xpath", ""),
+                "actions": get("actions", []),
+                "label": get("label", ""),
+                "formLabel": get("formLabel", ""),
+                "state": get("state", {}),
+                "inlined": get("inlined", False),
             })
-            _walk(node["children"], depth + 1, hid + ".")
-
-    _walk(roots, 0, "")
+            if node["children"]:
+                stack.append((enumerate(node["children"], 1), depth + 1, hid + "."))
+                break
+        else:
+            stack.pop()
     return flat
 
 # ---------------------------------------------------------------------------
@@ -88,17 +136,15 @@ def _tree_to_flat(roots):
 # ---------------------------------------------------------------------------
 
 def _is_collapsible(node):
-    st = node.get("state", {})
-    if st.get("selected"):
+    st = node.get("state")
+    if st and st.get("selected"):
         return False
     text = node.get("text", "")
     if "\u27e8" in text and "\u27e9" in text:
         return False
     if node["tag"] in WRAPPER_TAGS:
         return True
-    if _RE_TRANSPARENT_ROLE.search(node.get("attrs", "")):
-        return True
-    return False
+    return _attr_flags(node.get("attrs", ""))[1]
 
 
 def _meaningful_attrs(attrs):
@@ -107,6 +153,21 @@ def _meaningful_attrs(attrs):
     return s.strip(", ")
 
 
+@functools.lru_cache(maxsize=4096)
+def _attr_flags(attrs):
+    """(has meaningful attrs, has a transparent role, has a popup role).
+
+    A node's attrs string never changes during a run and the same strings
+    repeat across many nodes, so each distinct one is scanned once rather
+    than once per check per simplify pass.
+    """
+    return (
+        bool(_meaningful_attrs(attrs)),
+        _RE_TRANSPARENT_ROLE.search(attrs) is not None,
+        any(r in attrs for r in _POPUP_ROLE_ATTRS),
+    )
+
+
 def _children_text(node):
     parts = [c["text"] for c in node["children"] if c["text"]]
     return " ".join(parts)
@@ -127,51 +188,99 @@ def _text_overlap(parent_text, child_text):
     return False
 
 
-def _simplify(children):
-    result = []
-    for node in children:
-        node["children"] = _simplify(node["children"])
-
-        collapsible = _is_collapsible(node)
-        n_children = len(node["children"])
+def _simplify(children, stats=None):
+    """One simplify pass.  *stats*, if given, is a one-item list counting
+    the nodes dropped or unwrapped — 0 means the pass changed no structure."""
+    if stats is None:
+        return _post_order(children, _simplify_node)
 
-        node_text = node["text"]
-        if node_text and n_children > 0:
-            ct = _children_text(node)
-            if ct and (node_text == ct or ct.startswith(node_text)
-                      or (node_text.startswith(ct) and len(ct) > len(node_text) * 0.8)):
-                node_text = ""
-                node["text"] = ""
+    def visit(node, result):
+        if not _simplify_node(node, result):
+            stats[0] += 1
 
-        if node["text"] and n_children > 0:
-            for child in node["children"]:
-                if child["text"] and not child.get("actions"):
-                    if _text_overlap(node["text"], child["text"]):
-                        child["text"] = ""
+    return _post_order(children, visit)
 
-        has_content = bool(node_text) or bool(_meaningful_attrs(node["attrs"]))
 
-        if collapsible and not has_content and n_children == 0:
-            continue
-        if collapsible and not has_content and n_children == 1:
-            result.append(node["children"][0])
-            continue
-        if collapsible and not has_content and n_children > 1:
-            result.extend(node["children"])
-            continue
+def _simplify_node(node, result, changed=None):
+    """Append *node* (children already simplified) or its replacement.
 
+    Returns False when the node itself was dropped or unwrapped.  The id()
+    of every node whose text gets cleared is added to *changed*, if given.
+    """
+    collapsible = _is_collapsible(node)  # judged on the text before dedup
+    children = node["children"]
+    node_text = node["text"]
+    if node_text and children:
+        ct = _children_text(node)
+        if ct and (node_text == ct or ct.startswith(node_text)
+                  or (node_text.startswith(ct) and len(ct) > len(node_text) * 0.8)):
+            node_text = ""
+            node["text"] = ""
+            if changed is not None:
+                changed.add(id(node))
+
+    if node_text and children:
+        for child in children:
+            if child["text"] and not child.get("actions"):
+                if _text_overlap(node_text, child["text"]):
+                    child["text"] = ""
+                    if changed is not None:
+                        changed.add(id(child))
+
+    if not collapsible or node_text or _attr_flags(node["attrs"])[0]:
         result.append(node)
-    return result
+        return True
+    # Collapsible wrapper with no content of its own: splice its children
+    # (if any) into the parent.
+    result.extend(children)
+    return False
+
+
+def _simplify_until_stable(tree, max_rounds=10):
+    """Repeat _simplify until a pass removes no node (at most *max_rounds*).
+
+    After the first pass only the nodes something changed under are
+    walked again.  A node is settled when, during the last pass, its
+    text, its children list and its children's texts all stayed the same;
+    running _simplify_node on it again would then do nothing, so skipping
+    it gives the same tree as a full pass.
+    """
+    dirty = None  # id()s to revisit; None on the first pass = every node
+
+    def enter(node, out):
+        if id(node) in dirty:
+            return True
+        out.append(node)  # settled: keep the whole subtree as it is
+        return False
+
+    for _ in range(max_rounds):
+        removed = 0
+        changed = set()       # ids of nodes to revisit next pass
+        spliced_into = set()  # ids of children lists that lost a node
+
+        def visit(node, result):
+            nonlocal removed
+            if not _simplify_node(node, result, changed):
+                removed += 1
+                spliced_into.add(id(result))
+                return
+            if (id(node["children"]) in spliced_into
+                    or any(id(c) in changed for c in node["children"])):
+                changed.add(id(node))
+
+        tree = _post_order(tree, visit, enter if dirty is not None else None)
+        if not removed:
+            break
+        dirty = changed
+    return tree
 
 # ---------------------------------------------------------------------------
 # Popup & list handling
 # ---------------------------------------------------------------------------
 
 def _is_popup(node):
-    attrs = node.get("attrs", "")
-    for role in POPUP_ROLES:
-        if f'role="{role}"' in attrs:
-            return True
+    if _attr_flags(node.get("attrs", ""))[2]:
+        return True
     tag = node["tag"]
     if "-" in tag and "dialog" in tag.lower():
         return True
@@ -180,53 +289,103 @@ def _is_popup(node):
 
 def _count_nodes(roots):
     total = 0
-    for n in roots:
-        total += 1 + _count_nodes(n.get("children", []))
+    stack = list(roots)
+    while stack:
+        n = stack.pop()
+        total += 1
+        stack.extend(n.get("children", ()))
     return total
 
 
 def _collapse_popups(roots):
-    result = []
-    for node in roots:
-        if _is_popup(node) and node["children"] and not _has_interactive(node):
-            # Only collapse popups with no interactive elements inside.
-            # Visible dialogs with buttons (e.g. cookie consent banners)
-            # must be kept — visual visibility is the sole criterion.
-            n = _count_nodes(node["children"])
-            node["text"] = f"··· {n} children"
-            node["children"] = []
-            result.append(node)
-            continue
-        node["children"] = _collapse_popups(node["children"])
-        result.append(node)
-    return result
+    return _post_order(roots, _keep, _collapse_popup)
+
+
+def _collapse_popup(node, out):
+    """``enter`` hook: collapse *node* in place if it is a popup; returns
+    False when it did (nothing below it needs visiting)."""
+    if _is_popup(node) and node["children"] and not _has_interactive(node):
+        # Only collapse popups with no interactive elements inside.
+        # Visible dialogs with buttons (e.g. cookie consent banners)
+        # must be kept — visual visibility is the sole criterion.
+        n = _count_nodes(node["children"])
+        node["text"] = f"··· {n} children"
+        node["children"] = []
+        out.append(node)
+        return False
+    return True
+
+
+def _keep(node, out):
+    out.append(node)
 
 
 def _has_interactive(node):
-    if node.get("actions"):
-        return True
-    for c in node.get("children", []):
-        if _has_interactive(c):
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if n.get("actions"):
             return True
+        stack.extend(n.get("children", ()))
     return False
 
 
 def _truncate_long_lists(roots, max_items=50, show_head=10):
-    for node in roots:
-        node["children"] = _truncate_long_lists(node["children"], max_items, show_head)
+    truncate = _list_truncator(max_items, show_head)
+
+    def visit(node, out):
+        out.append(node)
+        truncate(node)
+
+    return _post_order(roots, visit)
+
+
+def _list_truncator(max_items, show_head):
+    """Return ``truncate(node)``, which shortens a long uniform child list
+    in place.  Nodes must be passed bottom-up (children before parents).
+    """
+    # id(node) -> (node, has actions in subtree) for list items already
+    # checked.  The walk is post-order, so an inner list's items are
+    # settled before any enclosing list is checked and its scan can stop
+    # at them instead of rescanning.  The node is kept in the value so a
+    # recycled id() can't alias a dropped item.
+    memo = {}
+
+    def has_interactive(root):
+        hit = memo.get(id(root))
+        if hit is not None and hit[0] is root:
+            return hit[1]
+        found = False
+        stack = [root]
+        while stack:
+            n = stack.pop()
+            hit = memo.get(id(n))
+            if hit is not None and hit[0] is n:
+                if hit[1]:
+                    found = True
+                    break
+                continue
+            if n.get("actions"):
+                found = True
+                break
+            stack.extend(n.get("children", ()))
+        memo[id(root)] = (root, found)
+        return found
+
+    def truncate(node):
         children = node["children"]
         n = len(children)
         if n <= max_items:
-            continue
+            return
         tag_freq = {}
         for c in children:
             tag_freq[c["tag"]] = tag_freq.get(c["tag"], 0) + 1
         top_tag = max(tag_freq, key=tag_freq.get)
         if tag_freq[top_tag] < n * 0.7:
-            continue
-        interactive_count = sum(1 for c in children if _has_interactive(c))
+            return
+        interactive_count = sum(1 for c in children if has_interactive(c))
         if interactive_count > n * 0.3:
-            continue
+            return
         total = n
         node["children"] = children[:show_head] + [{
             "idx": 0, "depth": 0,
@@ -237,21 +396,46 @@ def _truncate_long_lists(roots, max_items=50, show_head=10):
             "actions": [], "label": "", "state": {},
             "children": [],
         }]
-    return roots
+
+    return truncate
 
 
 def _prune_empty_leaves(roots):
-    result = []
-    for node in roots:
-        node["children"] = _prune_empty_leaves(node["children"])
-        txt = (node.get("text") or "").strip()
-        if (not node["children"]
-                and not txt
-                and not node.get("actions")
-                and not _meaningful_attrs(node.get("attrs", ""))):
-            continue
-        result.append(node)
-    return result
+    return _post_order(roots, _keep_unless_empty)
+
+
+def _keep_unless_empty(node, out):
+    if not _is_empty_leaf(node):
+        out.append(node)
+
+
+def _is_empty_leaf(node):
+    return (not node["children"]
+            and not (node.get("text") or "").strip()
+            and not node.get("actions")
+            and not _attr_flags(node.get("attrs", ""))[0])
+
+
+def _collapse_truncate_prune(roots, max_items=50, show_head=10):
+    """_collapse_popups, _truncate_long_lists and _prune_empty_leaves fused
+    into one walk, with the same result as running them in that order.
+
+    Popups collapse on the way down, before anything below them changes.
+    On the way up a node's list is truncated while it still holds its
+    empty leaves (they count towards the list's shape) and only then are
+    those leaves dropped.
+    """
+    truncate = _list_truncator(max_items, show_head)
+
+    def visit(node, out):
+        if node["children"]:
+            truncate(node)
+            node["children"] = [c for c in node["children"]
+                                if not _is_empty_leaf(c)]
+        out.append(node)
+
+    return [n for n in _post_order(roots, visit, _collapse_popup)
+            if not _is_empty_leaf(n)]
 
 # ---------------------------------------------------------------------------
 # Public interface
@@ -266,13 +450,13 @@ def process(dom_nodes):
     Returns:
         list of filtered/simplified node dicts with 'hid' field
     """
+    return _run_pipeline(dom_nodes)
+
+
+def _run_pipeline(dom_nodes, max_items=50, show_head=10):
+    """The standard pipeline (steps 1-6 above) — shared by the bundled
+    site compressors after their own noise filtering."""
     tree = _flat_to_tree(dom_nodes)
-    for _ in range(10):
-        before = _count_nodes(tree)
-        tree = _simplify(tree)
-        if _count_nodes(tree) == before:
-            break
-    tree = _collapse_popups(tree)
-    tree = _truncate_long_lists(tree)
-    tree = _prune_empty_leaves(tree)
+    tree = _simplify_until_stable(tree)
+    tree = _collapse_truncate_prune(tree, max_items, show_head)
     return _tree_to_flat(tree)
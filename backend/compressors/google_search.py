@@ -18,36 +18,25 @@ _NOISE_TEXTS = frozenset([
 ])
 
 
-def _is_noise(node, cfg):
-    tag = node.get("tag", "")
-    if tag in _NOISE_TAGS:
-        return True
-    text = (node.get("text") or "").strip()
-    if text in _NOISE_TEXTS:
-        return True
-    attrs = node.get("attrs", "")
-    if cfg.get("remove_footer", True) and 'role="contentinfo"' in attrs:
-        return True
-    return False
+def _make_noise_filter(cfg):
+    """Predicate for footer links, scripts and (optionally) the page footer."""
+    remove_footer = cfg.get("remove_footer", True)
+
+    def is_noise(node):
+        if node.get("tag", "") in _NOISE_TAGS:
+            return True
+        if (node.get("text") or "").strip() in _NOISE_TEXTS:
+            return True
+        return remove_footer and 'role="contentinfo"' in node.get("attrs", "")
+
+    return is_noise
 
 
 def process(dom_nodes, settings=None):
-    from compressors.default import (
-        _flat_to_tree, _simplify, _collapse_popups,
-        _truncate_long_lists, _prune_empty_leaves, _tree_to_flat,
-        _count_nodes,
-    )
+    from compressors.default import _run_pipeline
 
     cfg = settings or {}
-    filtered = [n for n in dom_nodes if not _is_noise(n, cfg)]
-
-    tree = _flat_to_tree(filtered)
-    for _ in range(10):
-        before = _count_nodes(tree)
-        tree = _simplify(tree)
-        if _count_nodes(tree) == before:
-            break
-    tree = _collapse_popups(tree)
-    tree = _truncate_long_lists(tree, max_items=cfg.get("max_items", 30), show_head=cfg.get("show_head", 10))
-    tree = _prune_empty_leaves(tree)
-    return _tree_to_flat(tree)
+    is_noise = _make_noise_filter(cfg)
+    filtered = [n for n in dom_nodes if not is_noise(n)]
+
+    return _run_pipeline(filtered, max_items=cfg.get("max_items", 30), show_head=cfg.get("show_head", 10))
@@ -1,5 +1,7 @@
 """Stack Overflow — extract question, answers, votes, and comments."""
 
+import re
+
 SCRIPT_ID = "stackoverflow"
 SCRIPT_VERSION = "2025.01.15.1"
 
@@ -17,40 +19,32 @@ _NOISE_TEXTS = frozenset([
     "Stack Overflow for Teams",
 ])
 
+# Attribute markers as one scan each.  "sidebar" is matched ASCII-case-
+# insensitively (it also covers "js-sidebar-zone"); the consent banner
+# class is case-sensitive.
+_SIDEBAR_OR_BANNER_RE = re.compile(r"(?i:sidebar)|js-consent-banner", re.ASCII)
+_BANNER_RE = re.compile(r"js-consent-banner")
+
+
+def _make_noise_filter(cfg):
+    """Predicate for site chrome, the consent banner and (optionally) the sidebar."""
+    attrs_search = (_SIDEBAR_OR_BANNER_RE if cfg.get("remove_sidebar", True) else _BANNER_RE).search
 
-def _is_noise(node, cfg):
-    tag = node.get("tag", "")
-    if tag in _NOISE_TAGS:
-        return True
-    text = (node.get("text") or "").strip()
-    if text in _NOISE_TEXTS:
-        return True
-    attrs = node.get("attrs", "")
-    if cfg.get("remove_sidebar", True):
-        if "js-sidebar-zone" in attrs or "sidebar" in attrs.lower():
+    def is_noise(node):
+        if node.get("tag", "") in _NOISE_TAGS:
             return True
-    if "js-consent-banner" in attrs:
-        return True
-    return False
+        if (node.get("text") or "").strip() in _NOISE_TEXTS:
+            return True
+        return attrs_search(node.get("attrs", "")) is not None
+
+    return is_noise
 
 
 def process(dom_nodes, settings=None):
-    from compressors.default import (
-        _flat_to_tree, _simplify, _collapse_popups,
-        _truncate_long_lists, _prune_empty_leaves, _tree_to_flat,
-        _count_nodes,
-    )
+    from compressors.default import _run_pipeline
 
     cfg = settings or {}
-    filtered = [n for n in dom_nodes if not _is_noise(n, cfg)]
-
-    tree = _flat_to_tree(filtered)
-    for _ in range(10):
-        before = _count_nodes(tree)
-        tree = _simplify(tree)
-        if _count_nodes(tree) == before:
-            break
-    tree = _collapse_popups(tree)
-    tree = _truncate_long_lists(tree, max_items=cfg.get("max_items", 30), show_head=cfg.get("show_head", 10))
-    tree = _prune_empty_leaves(tree)
-    return _tree_to_flat(tree)
+    is_noise = _make_noise_filter(cfg)
+    filtered = [n for n in dom_nodes if not is_noise(n)]
+
+    return _run_pipeline(filtered, max_items=cfg.get("max_items", 30), show_head=cfg.get("show_head", 10))
@@ -1,5 +1,7 @@
 """Wikipedia — focus on article content, table of contents, and infoboxes."""
 
+import re
+
 SCRIPT_ID = "wikipedia"
 SCRIPT_VERSION = "2025.01.15.1"
 
@@ -16,59 +18,64 @@ _SKIP_SECTIONS = frozenset([
     "External links", "References", "Notes", "Citations",
     "Further reading", "Bibliography",
 ])
+_SECTION_TAGS = frozenset(["h2", "h3"])
+_EDIT_SUFFIX_RE = re.compile(r"\s*\[edit\]\s*$")
 _NOISE_TAGS = frozenset(["footer", "style", "script", "noscript", "svg", "sup"])
+_EDIT_LINK_TEXTS = frozenset(["[edit]", "[citation needed]"])
+
 
+def _make_noise_filter(cfg):
+    """Predicate for nav boxes, footnote marks and (optionally) [edit] links."""
+    remove_edit_links = cfg.get("remove_edit_links", True)
 
-def _is_noise(node, cfg):
-    tag = node.get("tag", "")
-    if tag in _NOISE_TAGS:
-        return True
-    text = (node.get("text") or "").strip()
-    attrs = node.get("attrs", "")
-    if 'role="navigation"' in attrs and "mw-" not in attrs:
-        return True
-    if cfg.get("remove_edit_links", True) and text in ("[edit]", "[citation needed]"):
-        return True
-    return False
+    def is_noise(node):
+        if node.get("tag", "") in _NOISE_TAGS:
+            return True
+        attrs = node.get("attrs", "")
+        if 'role="navigation"' in attrs and "mw-" not in attrs:
+            return True
+        return remove_edit_links and (node.get("text") or "").strip() in _EDIT_LINK_TEXTS
+
+    return is_noise
 
 
 def _should_skip_section(text):
-    return text.strip().rstrip("[edit]").strip() in _SKIP_SECTIONS
+    return _EDIT_SUFFIX_RE.sub("", text.strip()) in _SKIP_SECTIONS
+
+
+def _drop_skipped_sections(nodes):
+    """Drop each skipped section: its heading and everything after it up to
+    the next h2/h3 at the same or a shallower depth.
+
+    Only the headings are inspected; the kept runs between them are copied
+    over as slices.
+    """
+    result = []
+    keep_from = 0
+    skip_depth = None
+    for i, n in enumerate(nodes):
+        if n.get("tag", "") not in _SECTION_TAGS:
+            continue
+        if _should_skip_section(n.get("text", "")):
+            if skip_depth is None:
+                result.extend(nodes[keep_from:i])
+            skip_depth = n["depth"]
+        elif skip_depth is not None and n["depth"] <= skip_depth:
+            skip_depth = None
+            keep_from = i
+    if skip_depth is None:
+        result.extend(nodes[keep_from:])
+    return result
 
 
 def process(dom_nodes, settings=None):
-    from compressors.default import (
-        _flat_to_tree, _simplify, _collapse_popups,
-        _truncate_long_lists, _prune_empty_leaves, _tree_to_flat,
-        _count_nodes,
-    )
+    from compressors.default import _run_pipeline
 
     cfg = settings or {}
-    filtered = [n for n in dom_nodes if not _is_noise(n, cfg)]
+    is_noise = _make_noise_filter(cfg)
+    filtered = [n for n in dom_nodes if not is_noise(n)]
 
     if cfg.get("skip_references", True):
-        result = []
-        skip_depth = None
-        for n in filtered:
-            tag = n.get("tag", "")
-            if tag in ("h2", "h3") and _should_skip_section(n.get("text", "")):
-                skip_depth = n["depth"]
-                continue
-            if skip_depth is not None:
-                if tag in ("h2", "h3") and n["depth"] <= skip_depth:
-                    skip_depth = None
-                else:
-                    continue
-            result.append(n)
-        filtered = result
-
-    tree = _flat_to_tree(filtered)
-    for _ in range(10):
-        before = _count_nodes(tree)
-        tree = _simplify(tree)
-        if _count_nodes(tree) == before:
-            break
-    tree = _collapse_popups(tree)
-    tree = _truncate_long_lists(tree, max_items=cfg.get("max_items", 40), show_head=cfg.get("show_head", 15))
-    tree = _prune_empty_leaves(tree)
-    return _tree_to_flat(tree)
+        filtered = _drop_skipped_sections(filtered)
+
+    return _run_pipeline(filtered, max_items=cfg.get("max_items", 40), show_head=cfg.get("show_head", 15))
@@ -1,5 +1,7 @@
 """YouTube — extract video info, search results, and comments."""
 
+import re
+
 SCRIPT_ID = "youtube"
 SCRIPT_VERSION = "2025.01.15.1"
 
@@ -19,41 +21,33 @@ _NOISE_TEXTS = frozenset([
 ])
 
 
-def _is_noise(node, cfg):
-    tag = node.get("tag", "")
-    if tag in _NOISE_TAGS:
-        return True
-    text = (node.get("text") or "").strip()
-    if text in _NOISE_TEXTS:
-        return True
+def _make_noise_filter(cfg):
+    """Predicate for YouTube chrome, the mini player and the guide drawer."""
+    markers = []
     # Mini player, popup overlays
     if cfg.get("remove_miniplayer", True):
-        if "ytd-miniplayer" in tag or "ytd-popup" in tag:
-            return True
+        markers += ["ytd-miniplayer", "ytd-popup"]
     # Guide/sidebar drawer
     if cfg.get("remove_guide", True):
-        if "tp-yt-app-drawer" in tag or "ytd-guide" in tag:
+        markers += ["tp-yt-app-drawer", "ytd-guide"]
+    tag_search = re.compile("|".join(markers)).search if markers else None
+
+    def is_noise(node):
+        tag = node.get("tag", "")
+        if tag in _NOISE_TAGS:
             return True
-    return False
+        if (node.get("text") or "").strip() in _NOISE_TEXTS:
+            return True
+        return tag_search is not None and tag_search(tag) is not None
+
+    return is_noise
 
 
 def process(dom_nodes, settings=None):
-    from compressors.default import (
-        _flat_to_tree, _simplify, _collapse_popups,
-        _truncate_long_lists, _prune_empty_leaves, _tree_to_flat,
-        _count_nodes,
-    )
+    from compressors.default import _run_pipeline
 
     cfg = settings or {}
-    filtered = [n for n in dom_nodes if not _is_noise(n, cfg)]
-
-    tree = _flat_to_tree(filtered)
-    for _ in range(10):
-        before = _count_nodes(tree)
-        tree = _simplify(tree)
-        if _count_nodes(tree) == before:
-            break
-    tree = _collapse_popups(tree)
-    tree = _truncate_long_lists(tree, max_items=cfg.get("max_items", 20), show_head=cfg.get("show_head", 8))
-    tree = _prune_empty_leaves(tree)
-    return _tree_to_flat(tree)
+    is_noise = _make_noise_filter(cfg)
+    filtered = [n for n in dom_nodes if not is_noise(n)]
+
+    return _run_pipeline(filtered, max_items=cfg.get("max_items", 20), show_head=cfg.get("show_head", 8))
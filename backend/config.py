@@ -10,9 +10,13 @@ Priority order (highest wins):
   3. Defaults (DEFAULTS dict below)
 """
 
-import json
+import atexit
 import os
 import threading
+import time
+from types import MappingProxyType
+
+import orjson
 
 _CONFIG_FILE = os.path.join(os.path.dirname(__file__), ".browser_config.json")
 _lock = threading.Lock()
@@ -54,9 +58,10 @@ DEFAULTS = {
     "hover_timeout": 5000,
     "scroll_timeout": 5000,
     "wait_for_element_timeout": 10000,
+    "action_hard_timeout": 120000,  # any single browser call; on expiry the session is reset
 
     # Keyboard
-    "type_delay": 20,       # ms between keystrokes
+    "type_delay": 20,       # ms between keystrokes (0 = insert text at once, no key events)
 
     # Scroll
     "scroll_pixels": 500,
@@ -146,6 +151,7 @@ DEFAULTS = {
     # Benchmark
     "benchmark_timeout": 30000,
     "benchmark_idle_wait": 8000,
+    "benchmark_concurrency": 4,         # max parallel browsers for benchmark_batch
 
     # Compressor rules: URL pattern → script name mapping
     # e.g. [{"pattern": "*google.com/search*", "script": "google_search"}]
@@ -184,121 +190,257 @@ DEFAULTS = {
     # Max chat history messages sent to LLM (controls token usage)
     "agent_max_history": 20,
 }
+# Read-only: overrides live in _config, so a stray write here is a bug
+DEFAULTS = MappingProxyType(DEFAULTS)
 
 # ── Runtime state ──
 
+# Both dicts are copy-on-write: writers (serialized by _lock) build a new
+# dict and rebind the name, and a published dict is never mutated, so
+# readers take no lock.
 _config: dict = {}
+# defaults + env vars + overrides, rebuilt by _rebuild_merged() on every write
+_merged: dict = {}
+
+# Bumped on every write so callers can cache values derived from config
+version = 0
+
+
+_UNLOADED = object()
+_loaded_stat = _UNLOADED  # (mtime_ns, size) of the file as last read/written
+
+
+def _file_stat():
+    try:
+        st = os.stat(_CONFIG_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
 
 def _load():
-    """Load persisted overrides from disk."""
-    global _config
-    if os.path.exists(_CONFIG_FILE):
+    """Load persisted overrides from disk.
+
+    Returns False without reading when the file is unchanged since it was
+    last loaded or written.
+    """
+    global _config, _loaded_stat
+    key = _file_stat()
+    if key == _loaded_stat:
+        return False
+    if key is not None:
         try:
-            with open(_CONFIG_FILE, "r") as f:
-                _config = json.load(f)
+            with open(_CONFIG_FILE, "rb") as f:
+                _config = orjson.loads(f.read())
         except Exception:
             _config = {}
     else:
         _config = {}
+    _loaded_stat = key
+    _rebuild_merged()
+    return True
+
+
+def reload_if_stale() -> bool:
+    """Re-read the config file if it was changed outside this process.
+
+    One stat() when nothing changed.  Skipped while one of our own writes
+    is still pending, since the file is then behind memory.  Returns True
+    when the config was reloaded.
+    """
+    global version
+    with _lock:
+        if _save_pending.is_set() or not _load():
+            return False
+        version += 1
+        return True
+
+
+def _rebuild_merged():
+    """Recompute _merged from the three layers.
+
+    Called on load and after every write, so reads are a single lookup in
+    a ready-made dict.  The dict is built aside and swapped in with one
+    assignment; readers never see it half-filled.
+    """
+    global _merged
+    merged = dict(DEFAULTS)
+    # Layer 2: environment variables
+    for key, env_name in _ENV_MAP.items():
+        env_val = os.environ.get(env_name)
+        if env_val is not None and env_val != "":
+            merged[key] = _coerce(key, env_val)
+    # Layer 3: persisted overrides (highest priority)
+    merged.update(_config)
+    _merged = merged
+
+
+# Writes happen on a background thread so callers (holding _lock) don't
+# wait on disk; a burst of updates within _SAVE_DELAY becomes one write.
+_SAVE_DELAY = 0.1
+_save_pending = threading.Event()
+_save_io_lock = threading.Lock()  # one writer at a time (thread vs atexit)
+_saver = None
 
 
 def _save():
-    """Persist current overrides to disk."""
-    try:
-        with open(_CONFIG_FILE, "w") as f:
-            json.dump(_config, f, indent=2)
-    except Exception:
-        pass
+    """Schedule persisting the current overrides (see _saver_loop)."""
+    global _saver
+    _save_pending.set()
+    if _saver is None:
+        _saver = threading.Thread(target=_saver_loop, name="config-saver",
+                                  daemon=True)
+        _saver.start()
+
+
+def _saver_loop():
+    while True:
+        _save_pending.wait()
+        time.sleep(_SAVE_DELAY)
+        _flush()
+
+
+def _flush():
+    """Write the overrides to disk now if a save is pending.
+
+    Written to a temp file and renamed over the old one, so a crash
+    mid-write never leaves a truncated config behind.
+    """
+    global _loaded_stat
+    with _save_io_lock:
+        if not _save_pending.is_set():
+            return
+        _save_pending.clear()
+        snapshot = _config  # published dicts are never mutated
+        tmp = _CONFIG_FILE + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(orjson.dumps(snapshot, option=orjson.OPT_INDENT_2))
+            os.replace(tmp, _CONFIG_FILE)
+            _loaded_stat = _file_stat()
+        except Exception as e:
+            print(f"[config] Failed to save {_CONFIG_FILE}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
 
 
-# Initialize on import
-_load()
+atexit.register(_flush)
+
+
+def _env_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _coercer_for(default):
+    """Coercer _coerce applies to a raw (env) value for a key with *default*."""
+    t = type(default)
+    if t is bool:
+        return _env_bool
+    if t is int or t is float:
+        return t
+    return None
+
+
+# Key → coercer, built once from DEFAULTS; None means store the value as-is
+_COERCERS = {k: _coercer_for(v) for k, v in DEFAULTS.items()}
 
 
 def _coerce(key: str, value):
     """Coerce value to match the type of DEFAULTS[key]."""
-    if key not in DEFAULTS:
+    coerce = _COERCERS.get(key)
+    if coerce is None:
         return value
-    default_type = type(DEFAULTS[key])
     try:
-        if default_type == bool:
-            if isinstance(value, str):
-                return value.lower() in ("1", "true", "yes")
-            return bool(value)
-        elif default_type == int:
-            return int(value)
-        elif default_type == float:
-            return float(value)
+        return coerce(value)
     except (ValueError, TypeError):
-        pass
-    return value
+        return value
+
+
+# Initialize on import (after _coerce, which the env layer uses)
+_load()
 
 
 def get(key: str):
-    """Get config value — persisted override > env var > default."""
-    with _lock:
-        if key in _config:
-            return _config[key]
-        # Check environment variable
-        env_name = _ENV_MAP.get(key)
-        if env_name:
-            env_val = os.environ.get(env_name)
-            if env_val is not None and env_val != "":
-                return _coerce(key, env_val)
-        return DEFAULTS.get(key)
+    """Get config value — persisted override > env var > default.
+
+    Lock-free: one lookup in the pre-merged snapshot, which writers swap
+    wholesale, so every action's timeout reads don't contend on the lock.
+    Env vars are read when config is loaded or written.
+    """
+    return _merged.get(key)
 
 
 def get_all() -> dict:
-    """Get merged config (defaults + env vars + overrides)."""
-    with _lock:
-        merged = dict(DEFAULTS)
-        # Layer 2: environment variables
-        for key, env_name in _ENV_MAP.items():
-            env_val = os.environ.get(env_name)
-            if env_val is not None and env_val != "":
-                merged[key] = _coerce(key, env_val)
-        # Layer 3: persisted overrides (highest priority)
-        merged.update(_config)
-        return merged
+    """Get merged config (defaults + env vars + overrides) as a fresh copy."""
+    return dict(_merged)
+
+
+_SKIP = object()  # set_values coercer result: reject this value
+
+
+def _setter_for(default):
+    """Coercer set_values applies to a new value for a key with *default*."""
+    t = type(default)
+    if t in (bool, int, float):
+        return t
+    if t in (list, dict):
+        return lambda v: v if isinstance(v, t) else _SKIP
+    return lambda v: v
+
+
+# Key → coercer, built once from DEFAULTS (unknown keys are ignored)
+_SETTERS = {k: _setter_for(v) for k, v in DEFAULTS.items()}
 
 
 def set_values(updates: dict):
-    """Update config values. Only accepts known keys."""
+    """Update config values. Only accepts known keys.
+
+    A call that changes no stored override (unknown keys, rejected values,
+    or the value already set) leaves the config, version and file alone.
+    """
+    global _config, version
     with _lock:
+        overrides = dict(_config)
+        changed = False
         for k, v in updates.items():
-            if k not in DEFAULTS:
+            coerce = _SETTERS.get(k)
+            if coerce is None:
                 continue
             # Type coerce to match default
-            default_type = type(DEFAULTS[k])
             try:
-                if default_type == bool:
-                    v = bool(v)
-                elif default_type == int:
-                    v = int(v)
-                elif default_type == float:
-                    v = float(v)
-                elif default_type == list:
-                    if not isinstance(v, list):
-                        continue
-                elif default_type == dict:
-                    if not isinstance(v, dict):
-                        continue
+                v = coerce(v)
             except (ValueError, TypeError):
                 continue
-            _config[k] = v
+            if v is _SKIP:
+                continue
+            if k in overrides and overrides[k] == v:
+                continue
+            overrides[k] = v
+            changed = True
+        if not changed:
+            return
+        _config = overrides
+        _rebuild_merged()
+        version += 1
         _save()
 
 
 def reset():
     """Reset all overrides to defaults."""
-    global _config
+    global _config, version
     with _lock:
+        if not _config:
+            return
         _config = {}
+        _rebuild_merged()
+        version += 1
         _save()
 
 
 def get_overrides() -> dict:
     """Get only user-changed values."""
-    with _lock:
-        return dict(_config)
+    return dict(_config)
@@ -10,13 +10,25 @@ Public API kept for backward compatibility:
   process_raw_nodes(dom_nodes, html_len) → unified dict
 """
 
+import os
 import re
 from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.builder import builder_registry
 
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
 
+# Tree builder for parse_dom: lxml's C parser when installed (several times
+# faster on large pages), html.parser otherwise.  CLAWOME_USE_LXML=0 forces
+# html.parser.
+_BS4_PARSER = (
+    "lxml"
+    if os.environ.get("CLAWOME_USE_LXML", "1") == "1"
+    and builder_registry.lookup("lxml")
+    else "html.parser"
+)
+
 SKIP_TAGS = frozenset([
     "script", "style", "meta", "link", "noscript", "svg",
     "head", "br", "hr", "iframe", "object", "embed",
@@ -47,122 +59,178 @@ ATTR_RULES = {
 
 GLOBAL_ATTRS = ["id", "role", "aria-label", "title"]
 
+# Attribute keys _fmt_attrs prints, per tag (global ones first).  None of
+# them is one of bs4's multi-valued attributes (class, rel, headers, ...),
+# so their values are always plain strings.
+_FMT_KEYS = {
+    tag: tuple(GLOBAL_ATTRS) + tuple(keys) for tag, keys in ATTR_RULES.items()
+}
+_FMT_KEYS_DEFAULT = tuple(GLOBAL_ATTRS)
+
 STATE_ATTRS = [
     "disabled", "checked", "readonly", "required",
     "aria-expanded", "aria-selected", "aria-checked", "aria-pressed",
     "aria-current",
     "aria-valuenow", "aria-valuemin", "aria-valuemax",
 ]
+_STATE_ATTR_SET = frozenset(STATE_ATTRS)
 
 import config as _cfg
 
-_RE_DISPLAY_NONE = re.compile(r"display\s*:\s*none", re.IGNORECASE)
-_RE_VISIBILITY_HIDDEN = re.compile(r"visibility\s*:\s*hidden", re.IGNORECASE)
+_RE_HIDDEN_STYLE = re.compile(
+    r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE
+)
 
 # ---------------------------------------------------------------------------
 # Hidden detection
 # ---------------------------------------------------------------------------
 
 def _is_hidden(tag: Tag) -> bool:
-    if tag.get("data-bgroup") == "active":
+    attrs = tag.attrs
+    if not attrs:
+        # Attribute-less tags (most wrappers): only a closed <dialog> hides
+        return tag.name == "dialog"
+    if attrs.get("data-bgroup") == "active":
         return False
-    if tag.get("data-bhidden") == "1":
+    if attrs.get("data-bhidden") == "1":
         return True
-    if tag.has_attr("hidden"):
+    if "hidden" in attrs:
         return True
-    if tag.get("aria-hidden", "").lower() == "true":
+    if attrs.get("aria-hidden", "").lower() == "true":
         return True
-    if tag.name == "input" and tag.get("type", "").lower() == "hidden":
+    if tag.name == "input" and attrs.get("type", "").lower() == "hidden":
         return True
-    if tag.name == "dialog" and not tag.has_attr("open"):
+    if tag.name == "dialog" and "open" not in attrs:
+        return True
+    style = attrs.get("style", "")
+    if style and ":" in style and _RE_HIDDEN_STYLE.search(style):
         return True
-    style = tag.get("style", "")
-    if style:
-        if _RE_DISPLAY_NONE.search(style):
-            return True
-        if _RE_VISIBILITY_HIDDEN.search(style):
-            return True
     return False
 
+def _src_filename(src: str) -> str:
+    """Last path segment of *src*, minus the final ?query and #fragment."""
+    name = src.rpartition("/")[2]
+    if "?" in name:
+        name = name.rpartition("?")[0]
+    if "#" in name:
+        name = name.rpartition("#")[0]
+    return name
+
 # ---------------------------------------------------------------------------
-# CSS selector generation
+# CSS / XPath selector generation
 # ---------------------------------------------------------------------------
 
-def _css_selector(tag: Tag) -> str:
-    bid = tag.get("data-bid")
+def _sibling_position(el: Tag, parent: Tag, positions: dict | None) -> tuple[int, int]:
+    """(1-based index, count) of *el* among its parent's same-name tags.
+
+    Siblings are compared by identity: bs4's Tag == compares markup, so two
+    identical siblings would both get the first one's index.  *positions*
+    caches each parent's table, so a walk that computes selectors for every
+    node scans each child list once instead of once per descendant.
+    """
+    table = positions.get(id(parent)) if positions is not None else None
+    if table is None:
+        tags = [c for c in parent.children if isinstance(c, Tag)]
+        counts: dict[str, int] = {}
+        for c in tags:
+            counts[c.name] = counts.get(c.name, 0) + 1
+        seen: dict[str, int] = {}
+        table = {}
+        for c in tags:
+            n = seen[c.name] = seen.get(c.name, 0) + 1
+            table[id(c)] = (n, counts[c.name])
+        if positions is not None:
+            positions[id(parent)] = table
+    return table[id(el)]
+
+
+# Test hooks that pages set to be stable and unique, tried after data-bid/id
+_TEST_ID_ATTRS = ("data-testid", "data-qa")
+
+
+def _element_paths(el: Tag, positions: dict, paths: dict) -> tuple[str, str]:
+    """(CSS ancestor chain, XPath) for *el*, built in one walk up the tree.
+
+    Each element's paths extend its parent's, so they are memoized in
+    *paths* (id → pair): parse_dom visits parents first, making each
+    lookup a single step instead of a walk to the root.  The CSS chain
+    restarts at the nearest ancestor with a data-bid or id, keeping
+    selectors short.
+    """
+    chain = []
+    node = el
+    while True:
+        hit = paths.get(id(node))
+        if hit is not None:
+            css, xpath = hit
+            break
+        parent = node.parent
+        if not parent or not isinstance(parent, Tag) or parent.name == "[document]":
+            css, xpath = node.name, "/" + node.name
+            paths[id(node)] = (css, xpath)
+            break
+        chain.append((node, parent))
+        node = parent
+    for node, parent in reversed(chain):
+        idx, count = _sibling_position(node, parent, positions)
+        if count == 1:
+            css_part = xpath_part = node.name
+        else:
+            css_part = f"{node.name}:nth-of-type({idx})"
+            xpath_part = f"{node.name}[{idx}]"
+        node_attrs = node.attrs
+        bid = node_attrs.get("data-bid")
+        if bid:
+            css = f'[data-bid="{bid}"]'
+        else:
+            eid = node_attrs.get("id")
+            css = f"#{eid}" if eid else f"{css} > {css_part}"
+        xpath = f"{xpath}/{xpath_part}"
+        paths[id(node)] = (css, xpath)
+    return css, xpath
+
+
+def _selectors(tag: Tag, positions: dict, paths: dict) -> tuple[str, str]:
+    """(CSS selector, XPath) for *tag*; see _element_paths for the caches."""
+    css, xpath = _element_paths(tag, positions, paths)
+    attrs = tag.attrs
+    bid = attrs.get("data-bid")
     if bid:
-        return f'[data-bid="{bid}"]'
-    tid = tag.get("id")
+        return f'[data-bid="{bid}"]', xpath
+    tid = attrs.get("id")
     if tid:
-        return f"#{tid}"
-    aria = tag.get("aria-label")
+        return f"#{tid}", xpath
+    for test_attr in _TEST_ID_ATTRS:
+        test_id = attrs.get(test_attr)
+        if test_id:
+            safe = test_id.replace("\\", "\\\\").replace('"', '\\"')
+            return f'[{test_attr}="{safe}"]', xpath
+    aria = attrs.get("aria-label")
     if aria:
         safe = aria.replace("\\", "\\\\").replace('"', '\\"')
-        return f'{tag.name}[aria-label="{safe}"]'
-    name = tag.get("name")
+        return f'{tag.name}[aria-label="{safe}"]', xpath
+    name = attrs.get("name")
     if name:
-        return f'{tag.name}[name="{name}"]'
-    parts = []
-    el = tag
-    while el and isinstance(el, Tag) and el.name and el.name != "[document]":
-        parent = el.parent
-        if not parent or not isinstance(parent, Tag) or parent.name == "[document]":
-            parts.append(el.name)
-            break
-        eid = el.get("id")
-        if eid:
-            parts.append(f"#{eid}")
-            break
-        siblings = [
-            c for c in parent.children
-            if isinstance(c, Tag) and c.name == el.name
-        ]
-        if len(siblings) == 1:
-            parts.append(el.name)
-        else:
-            idx = siblings.index(el) + 1
-            parts.append(f"{el.name}:nth-of-type({idx})")
-        el = parent
-    return " > ".join(reversed(parts))
-
-# ---------------------------------------------------------------------------
-# XPath selector generation
-# ---------------------------------------------------------------------------
-
-def _xpath_selector(tag: Tag) -> str:
-    parts = []
-    el = tag
-    while el and isinstance(el, Tag) and el.name and el.name != "[document]":
-        parent = el.parent
-        if not parent or not isinstance(parent, Tag) or parent.name == "[document]":
-            parts.append(el.name)
-            break
-        siblings = [
-            c for c in parent.children
-            if isinstance(c, Tag) and c.name == el.name
-        ]
-        if len(siblings) == 1:
-            parts.append(el.name)
-        else:
-            idx = siblings.index(el) + 1
-            parts.append(f"{el.name}[{idx}]")
-        el = parent
-    return "/" + "/".join(reversed(parts))
+        return f'{tag.name}[name="{name}"]', xpath
+    return css, xpath
 
 # ---------------------------------------------------------------------------
 # State detection
 # ---------------------------------------------------------------------------
 
 def _detect_state(tag: Tag) -> dict:
+    attrs = tag.attrs
     state = {}
-    for attr in STATE_ATTRS:
-        val = tag.get(attr)
-        if val is not None:
-            if isinstance(val, list):
-                val = " ".join(val)
-            state[attr] = str(val) if val != "" else "true"
+    # Most tags carry none of STATE_ATTRS; one set check skips the lookups
+    if not _STATE_ATTR_SET.isdisjoint(attrs):
+        for attr in STATE_ATTRS:
+            val = attrs.get(attr)
+            if val is not None:
+                if isinstance(val, list):
+                    val = " ".join(val)
+                state[attr] = str(val) if val != "" else "true"
     if tag.name in ("input", "textarea", "select"):
-        v = tag.get("value")
+        v = attrs.get("value")
         if v is not None:
             state["value"] = str(v)[:80]
     return state
@@ -178,38 +246,70 @@ _CLICKABLE_INPUT_TYPES = frozenset([
     "submit", "button", "reset", "image",
 ])
 
+# Tags that have actions whatever their role; any other tag needs one
+_ACTION_TAG_NAMES = frozenset(["a", "button", "input", "textarea", "select"])
+_CLICK_INPUT_TYPES = _CLICKABLE_INPUT_TYPES | {"checkbox", "radio"}
+_CLICK_ROLES = frozenset([
+    "checkbox", "radio", "switch", "tab", "menuitem", "option",
+])
+
 def _detect_actions(tag_name: str, raw_attrs: dict) -> list[str]:
+    """Actions for a tag; *raw_attrs* may be the tag's own attrs dict."""
     role = raw_attrs.get("role", "")
-    input_type = raw_attrs.get("type", "text").lower()
-    if tag_name == "a" or role == "link":
-        return ["click"]
-    if tag_name == "button" or role == "button":
+    # Plain elements (div, span, li, ...) without a role: the common case
+    if not role and tag_name not in _ACTION_TAG_NAMES:
+        return []
+    if tag_name == "a" or tag_name == "button" or role == "link" or role == "button":
         return ["click"]
     if tag_name == "input":
+        input_type = raw_attrs.get("type", "text").lower()
         if input_type in _TYPEABLE_INPUT_TYPES:
             return ["type"]
-        if input_type in _CLICKABLE_INPUT_TYPES:
-            return ["click"]
-        if input_type in ("checkbox", "radio"):
+        if input_type in _CLICK_INPUT_TYPES:
             return ["click"]
         return []
     if tag_name == "textarea" or role == "combobox":
         return ["type"]
     if tag_name == "select":
         return ["select"]
-    if role in ("checkbox", "radio", "switch", "tab", "menuitem", "option"):
+    if role in _CLICK_ROLES:
         return ["click"]
     return []
 
+_ACTION_TAGS = frozenset(["a", "button", "textarea", "select"])
+_ACTION_INPUT_TYPES = _TYPEABLE_INPUT_TYPES | _CLICK_INPUT_TYPES
+_ACTION_ROLES = _CLICK_ROLES | {"combobox"}
+
+
+def _is_actionable(tag: Tag) -> bool:
+    """bool(_detect_actions(...)) for *tag*, without building the lists.
+
+    Used to scan whole table cells for anything interactive.
+    """
+    name = tag.name
+    if name in _ACTION_TAGS:
+        return True
+    attrs = tag.attrs
+    role = attrs.get("role")
+    if role == "link" or role == "button":
+        return True
+    if name == "input":
+        return (attrs.get("type") or "").lower() in _ACTION_INPUT_TYPES
+    return role in _ACTION_ROLES
+
 # ---------------------------------------------------------------------------
 # Stage 1: HTML → flat node list
 # ---------------------------------------------------------------------------
 
 def parse_dom(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, _BS4_PARSER)
     body = soup.body if soup.body else soup
     nodes: list[dict] = []
-    counter = [0]
+    # Read once per parse: the walk checks the limits at every node
+    max_nodes = _cfg.get("max_nodes")
+    max_depth = _cfg.get("max_depth")
+    positions: dict = {}  # parent id → sibling table, see _sibling_position
+    paths: dict = {}  # element id → (CSS chain, XPath), see _element_paths
 
     def _collect_text(el: Tag) -> str:
         parts = []
@@ -220,8 +320,7 @@ def parse_dom(html: str) -> list[dict]:
                 child_text = child.get_text(separator=" ", strip=True)
                 if not child_text:
                     continue
-                raw = {"role": child.get("role", ""), "type": child.get("type", "")}
-                if _detect_actions(child.name, raw):
+                if _is_actionable(child):
                     parts.append(f"\u27e8{child_text}\u27e9")
                 else:
                     parts.append(child_text)
@@ -229,16 +328,13 @@ def parse_dom(html: str) -> list[dict]:
         return text
 
     def _fmt_attrs(tag: Tag) -> str:
-        keys = list(GLOBAL_ATTRS)
-        keys.extend(ATTR_RULES.get(tag.name, []))
+        attrs = tag.attrs
         pairs = []
-        for k in keys:
-            v = tag.get(k)
-            if v is None:
+        for k in _FMT_KEYS.get(tag.name, _FMT_KEYS_DEFAULT):
+            v = attrs.get(k)
+            if not v:
                 continue
-            if isinstance(v, list):
-                v = " ".join(v)
-            v = str(v).strip()
+            v = v.strip()
             if not v:
                 continue
             if k == "href":
@@ -246,7 +342,7 @@ def parse_dom(html: str) -> list[dict]:
                 continue
             if k == "src":
                 if not v.startswith("data:"):
-                    fname = v.rsplit("/", 1)[-1].rsplit("?", 1)[0].rsplit("#", 1)[0]
+                    fname = _src_filename(v)
                     if fname and len(fname) <= 80:
                         pairs.append(f'src="{fname}"')
                         continue
@@ -263,126 +359,130 @@ def parse_dom(html: str) -> list[dict]:
             pairs.append(f'{k}="{v}"')
         return ", ".join(pairs)
 
-    def _raw_attrs(tag: Tag) -> dict:
-        return {
-            "role": (tag.get("role") or ""),
-            "type": (tag.get("type") or ""),
-        }
-
-    def _walk(el: Tag, depth: int):
-        if counter[0] >= _cfg.get("max_nodes") or depth > _cfg.get("max_depth"):
-            return
-        for child in el.children:
-            if counter[0] >= _cfg.get("max_nodes"):
-                return
-            if isinstance(child, NavigableString):
-                continue
-            if not isinstance(child, Tag):
-                continue
-            if child.name in SKIP_TAGS:
-                continue
-            if _is_hidden(child):
-                continue
+    # Depth-first walk with an explicit stack of child iterators: the top
+    # entry is the element being listed, so pushing a child's iterator
+    # emits its subtree before the child's next sibling (same order as the
+    # recursive walk, without a Python frame per element).
+    count = 0
+    stack = [(iter(body.children), 0)] if max_nodes > 0 and max_depth >= 0 else []
+    while stack:
+        children, depth = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            continue
+        if count >= max_nodes:
+            break
+        if isinstance(child, NavigableString):
+            continue
+        if not isinstance(child, Tag):
+            continue
+        if child.name in SKIP_TAGS:
+            continue
+        if _is_hidden(child):
+            continue
 
-            if child.name == "tr":
-                row_cells = []
-                cell_elements = []
-                for cell_child in child.children:
-                    if isinstance(cell_child, Tag) and cell_child.name in ("td", "th"):
-                        ct = _collect_text(cell_child)
-                        if not ct:
-                            ct = cell_child.get_text(separator=" ", strip=True)
-                        if len(ct) > 500:
-                            ct = ct[:500] + "\u2026"
-                        row_cells.append(ct or "")
-                        cell_elements.append(cell_child)
-                row_text = " | ".join(row_cells) if row_cells else ""
-                counter[0] += 1
-                nodes.append({
-                    "idx": counter[0],
-                    "depth": depth,
-                    "tag": "tr",
-                    "attrs": _fmt_attrs(child),
-                    "text": row_text,
-                    "selector": _css_selector(child),
-                    "xpath": _xpath_selector(child),
-                    "actions": [],
-                    "label": row_text,
-                    "state": _detect_state(child),
-                })
-                for cell_el in cell_elements:
+        if child.name == "tr":
+            row_cells = []
+            cell_elements = []
+            for cell_child in child.children:
+                if isinstance(cell_child, Tag) and cell_child.name in ("td", "th"):
+                    ct = _collect_text(cell_child)
+                    if not ct:
+                        ct = cell_child.get_text(separator=" ", strip=True)
+                    if len(ct) > 500:
+                        ct = ct[:500] + "\u2026"
+                    row_cells.append(ct or "")
+                    cell_elements.append(cell_child)
+            row_text = " | ".join(row_cells) if row_cells else ""
+            selector, xpath = _selectors(child, positions, paths)
+            count += 1
+            nodes.append({
+                "idx": count,
+                "depth": depth,
+                "tag": "tr",
+                "attrs": _fmt_attrs(child),
+                "text": row_text,
+                "selector": selector,
+                "xpath": xpath,
+                "actions": [],
+                "label": row_text,
+                "state": _detect_state(child),
+            })
+            if depth < max_depth:
+                # Pushed last-first so the cells are walked in order
+                for cell_el in reversed(cell_elements):
                     if any(
                         isinstance(desc, Tag)
                         and desc.name not in SKIP_TAGS
-                        and _detect_actions(desc.name, _raw_attrs(desc))
+                        and _is_actionable(desc)
                         for desc in cell_el.descendants
                     ):
-                        _walk(cell_el, depth + 1)
-                continue
+                        stack.append((iter(cell_el.children), depth + 1))
+            continue
 
-            text = _collect_text(child)
-            attrs = _fmt_attrs(child)
-            selector = _css_selector(child)
-            xpath = _xpath_selector(child)
-            actions = _detect_actions(child.name, _raw_attrs(child))
-            state = _detect_state(child)
-
-            group = child.get("data-bgroup", "")
-            if group == "active":
-                state["selected"] = "true"
-            elif group == "inactive":
-                state["hidden"] = "true"
-
-            icon = child.get("data-bicon", "")
-
-            img_name = ""
-            if child.name in ("img", "video", "audio", "source"):
-                src = child.get("src", "")
-                if src and not src.startswith("data:"):
-                    fname = src.rsplit("/", 1)[-1].rsplit("?", 1)[0].rsplit("#", 1)[0]
-                    img_name = fname.rsplit(".", 1)[0] if "." in fname else fname
-
-            label = (text
-                     or child.get("aria-label", "")
-                     or child.get("title", "")
-                     or (f"[icon: {icon}]" if icon else "")
-                     or child.get("placeholder", "")
-                     or child.get("alt", "")
-                     or (f"[img: {img_name}]" if img_name else "")
-                     or child.get("value", "")
-                     or "")
-            if isinstance(label, list):
-                label = " ".join(label)
-            if len(label) > 500:
-                label = label[:500] + "\u2026"
-
-            block_children = [
-                c for c in child.children
-                if isinstance(c, Tag) and c.name not in SKIP_TAGS
-            ]
-
-            is_inlined = child.name in INLINE_TAGS and actions and not block_children
-            display_text = "" if is_inlined else (text or (f"[icon: {icon}]" if icon else ""))
-
-            counter[0] += 1
-            nodes.append({
-                "idx": counter[0],
-                "depth": depth,
-                "tag": child.name,
-                "attrs": attrs,
-                "text": display_text,
-                "selector": selector,
-                "xpath": xpath,
-                "actions": actions,
-                "label": label,
-                "state": state,
-                "inlined": is_inlined,
-            })
+        child_attrs = child.attrs
+        text = _collect_text(child)
+        attrs = _fmt_attrs(child)
+        selector, xpath = _selectors(child, positions, paths)
+        actions = _detect_actions(child.name, child_attrs)
+        state = _detect_state(child)
+
+        group = child_attrs.get("data-bgroup", "")
+        if group == "active":
+            state["selected"] = "true"
+        elif group == "inactive":
+            state["hidden"] = "true"
+
+        icon = child_attrs.get("data-bicon", "")
+
+        img_name = ""
+        if child.name in ("img", "video", "audio", "source"):
+            src = child_attrs.get("src", "")
+            if src and not src.startswith("data:"):
+                fname = _src_filename(src)
+                img_name = fname.rpartition(".")[0] if "." in fname else fname
+
+        label = (text
+                 or child_attrs.get("aria-label", "")
+                 or child_attrs.get("title", "")
+                 or (f"[icon: {icon}]" if icon else "")
+                 or child_attrs.get("placeholder", "")
+                 or child_attrs.get("alt", "")
+                 or (f"[img: {img_name}]" if img_name else "")
+                 or child_attrs.get("value", "")
+                 or "")
+        if isinstance(label, list):
+            label = " ".join(label)
+        if len(label) > 500:
+            label = label[:500] + "\u2026"
+
+        block_children = [
+            c for c in child.children
+            if isinstance(c, Tag) and c.name not in SKIP_TAGS
+        ]
 
-            if block_children:
-                _walk(child, depth + 1)
+        is_inlined = child.name in INLINE_TAGS and actions and not block_children
+        display_text = "" if is_inlined else (text or (f"[icon: {icon}]" if icon else ""))
+
+        count += 1
+        nodes.append({
+            "idx": count,
+            "depth": depth,
+            "tag": child.name,
+            "attrs": attrs,
+            "text": display_text,
+            "selector": selector,
+            "xpath": xpath,
+            "actions": actions,
+            "label": label,
+            "state": state,
+            "inlined": is_inlined,
+        })
+
+        if block_children and depth < max_depth:
+            stack.append((iter(child.children), depth + 1))
 
-    _walk(body, 0)
     return nodes
 
 # ---------------------------------------------------------------------------
@@ -397,6 +497,10 @@ def _truncate_text(text: str, max_len: int, head_len: int) -> str:
     return f"{text[:head_len]}…({omitted} chars omitted)"
 
 
+# Indent strings for format_dom_tree, by depth (deeper ones are built)
+_INDENTS = tuple("  " * d for d in range(64))
+
+
 def format_dom_tree(nodes: list[dict], text_max_len: int = 0,
                     text_head_len: int = 0) -> str:
     """Format filtered nodes into rich markdown tree.
@@ -409,44 +513,46 @@ def format_dom_tree(nodes: list[dict], text_max_len: int = 0,
     for n in nodes:
         if n.get("inlined"):
             continue
-        indent = "  " * n["depth"]
-        tag = n["tag"]
-        attrs = f"({n['attrs']})" if n["attrs"] else ""
-
-        actions = n.get("actions", [])
-        action_str = f" [{'/'.join(actions)}]" if actions else ""
-
-        state = n.get("state", {})
+        depth = n["depth"]
+        indent = _INDENTS[depth] if depth < len(_INDENTS) else "  " * depth
+        # Only the parts a node has are appended: most lines are just
+        # "[hid] tag: text" or "[hid] tag(attrs) [actions]"
+        line = f"{indent}[{n['hid']}] {n['tag']}"
+        if n["attrs"]:
+            line = f"{line}({n['attrs']})"
+
+        actions = n.get("actions")
+        if actions:
+            line = f"{line} [{'/'.join(actions)}]"
+
+        state = n.get("state")
         if state:
-            state_parts = []
-            for k, v in state.items():
-                if v == "true":
-                    state_parts.append(k)
-                else:
-                    state_parts.append(f'{k}="{v}"')
-            state_str = " {" + ", ".join(state_parts) + "}"
-        else:
-            state_str = ""
+            state_str = ", ".join([
+                k if v == "true" else f'{k}="{v}"' for k, v in state.items()
+            ])
+            line = f"{line} {{{state_str}}}"
+
+        # Show form label association for inputs
+        fl = n.get("formLabel")
+        if fl:
+            line = f"{line} «{fl}»"
 
-        raw_text = n["text"]
+        text = n["text"]
         # Lite mode: truncate non-interactive node text
         if text_max_len > 0 and not actions:
-            raw_text = _truncate_text(raw_text, text_max_len, text_head_len)
-        text = f": {raw_text}" if raw_text else ""
-        # Show form label association for inputs
-        fl = n.get("formLabel", "")
-        form_label_str = f" «{fl}»" if fl else ""
-        lines.append(f"{indent}[{n['hid']}] {tag}{attrs}{action_str}{state_str}{form_label_str}{text}")
+            text = _truncate_text(text, text_max_len, text_head_len)
+        lines.append(f"{line}: {text}" if text else line)
     return "\n".join(lines)
 
 
-def assemble_result(dom_nodes: list[dict], filtered_nodes: list[dict],
+def assemble_result(node_count: int, filtered_nodes: list[dict],
                     html_len: int = 0, text_max_len: int = 0,
                     text_head_len: int = 0) -> dict:
     """Assemble the standard unified result dict from filtered nodes.
 
     This is the fixed output layer — all compressors produce filtered nodes,
     and this function wraps them into the standard response format.
+    *node_count* is the number of nodes before filtering.
 
     When *text_max_len* > 0, text is truncated in the tree output and
     interactive[].label for non-interactive nodes (lite mode).
@@ -454,41 +560,50 @@ def assemble_result(dom_nodes: list[dict], filtered_nodes: list[dict],
     tree = format_dom_tree(filtered_nodes, text_max_len=text_max_len,
                            text_head_len=text_head_len)
 
-    def _label(n):
+    # hids are dotted tree paths ("1.2.3"); both maps and the interactive
+    # list share the node's own hid / xpath / selector strings, built in a
+    # single pass
+    xpath_map = {}
+    node_map = {}
+    interactive = []
+    for n in filtered_nodes:
+        hid = n["hid"]
+        xpath = n["xpath"]
+        selector = n["selector"]
+        actions = n["actions"]
+        xpath_map[hid] = xpath
+        node_map[hid] = selector
         label = n["label"] or n["text"]
-        if text_max_len > 0 and not n.get("actions"):
+        if text_max_len > 0 and not actions:
             label = _truncate_text(label, text_max_len, text_head_len)
-        return label
+        interactive.append({
+            "hid": hid,
+            "depth": n["depth"],
+            "tag": n["tag"],
+            "label": label,
+            "selector": selector,
+            "xpath": xpath,
+            "actions": actions,
+            "state": n["state"],
+        })
 
     return {
         "tree": tree,
-        "xpath_map": {n["hid"]: n["xpath"] for n in filtered_nodes},
-        "node_map": {n["hid"]: n["selector"] for n in filtered_nodes},
-        "interactive": [
-            {
-                "hid": n["hid"],
-                "depth": n["depth"],
-                "tag": n["tag"],
-                "label": _label(n),
-                "selector": n["selector"],
-                "xpath": n["xpath"],
-                "actions": n["actions"],
-                "state": n["state"],
-            }
-            for n in filtered_nodes
-        ],
+        "xpath_map": xpath_map,
+        "node_map": node_map,
+        "interactive": interactive,
         "stats": {
             "raw_html_chars": html_len,
             "raw_html_tokens": html_len // 4,
             "tree_chars": len(tree),
             "tree_tokens": len(tree) // 4,
             "compression_ratio": round(len(tree) / max(html_len, 1), 3),
-            "nodes_before_filter": len(dom_nodes),
+            "nodes_before_filter": node_count,
             "nodes_after_filter": len(filtered_nodes),
         },
         # Internal: cached for lite-mode re-assembly (not serialized to API)
         "_filtered_nodes": filtered_nodes,
-        "_dom_nodes": dom_nodes,
+        "_node_count": node_count,
         "_html_len": html_len,
     }
 
@@ -500,7 +615,7 @@ def process_raw_nodes(raw_nodes: list[dict], html_len: int = 0) -> dict:
     """Raw node list → unified DOM response. Delegates to default compressor."""
     from compressors.default import process
     filtered = process(raw_nodes)
-    return assemble_result(raw_nodes, filtered, html_len)
+    return assemble_result(len(raw_nodes), filtered, html_len)
 
 
 def extract_unified_dom(html: str) -> dict:
@@ -547,25 +662,16 @@ def diff_dom(before_nodes: list[dict], after_nodes: list[dict],
             "changed": [{hid, tag, label, field, before, after}, ...],
         }
     """
-    # Build lookup by selector (skip nodes without one — e.g. synthetic …)
-    def _build_map(nodes):
-        m = {}
-        for n in nodes:
-            sel = n.get("selector") or ""
-            if sel:
-                m[sel] = n
-        return m
+    # Same snapshot object (page was unchanged and its result reused)
+    if before_nodes is after_nodes:
+        return {"has_changes": False, "summary": "无变化",
+                "added": [], "removed": [], "changed": []}
 
-    bmap = _build_map(before_nodes)
-    amap = _build_map(after_nodes)
-
-    bkeys = set(bmap)
-    akeys = set(amap)
-
-    # ── Added / removed ──
-    added_keys = akeys - bkeys
-    removed_keys = bkeys - akeys
-    common_keys = bkeys & akeys
+    # Build lookup by selector (skip nodes without one — e.g. synthetic …).
+    # Dicts keep document order, so each side is matched in one linear pass
+    # and the reported nodes come out in page order.
+    bmap = {n["selector"]: n for n in before_nodes if n.get("selector")}
+    amap = {n["selector"]: n for n in after_nodes if n.get("selector")}
 
     def _brief(n):
         return {
@@ -575,26 +681,32 @@ def diff_dom(before_nodes: list[dict], after_nodes: list[dict],
             "actions": n.get("actions", []),
         }
 
-    added_all = [_brief(amap[k]) for k in added_keys]
-    removed_all = [_brief(bmap[k]) for k in removed_keys]
+    # ── Added / removed ──
+    added_all = [_brief(n) for k, n in amap.items() if k not in bmap]
+    removed_all = [_brief(n) for k, n in bmap.items() if k not in amap]
 
     # ── Changed: hid / text / state / actions ──
     changed_all = []
-    for key in common_keys:
-        bn = bmap[key]
-        an = amap[key]
+    for key, an in amap.items():
+        bn = bmap.get(key)
+        # Whole-node equality runs in C; most common nodes are untouched
+        if bn is None or bn is an or bn == an:
+            continue
+
+        hid = an.get("hid", "")
+        tag = an.get("tag", "")
+        label = (an.get("label") or "")[:120]
 
         # HID change (same element, different position due to insert/delete)
         bh = bn.get("hid", "")
-        ah = an.get("hid", "")
-        if bh != ah:
+        if bh != hid:
             changed_all.append({
-                "hid": ah,
-                "tag": an.get("tag", ""),
-                "label": (an.get("label") or "")[:120],
+                "hid": hid,
+                "tag": tag,
+                "label": label,
                 "field": "hid",
                 "before": bh,
-                "after": ah,
+                "after": hid,
             })
 
         # Text change
@@ -602,39 +714,42 @@ def diff_dom(before_nodes: list[dict], after_nodes: list[dict],
         at = (an.get("text") or "")
         if bt != at:
             changed_all.append({
-                "hid": an.get("hid", ""),
-                "tag": an.get("tag", ""),
-                "label": (an.get("label") or at or "")[:120],
+                "hid": hid,
+                "tag": tag,
+                "label": label or at[:120],
                 "field": "text",
                 "before": bt[:80],
                 "after": at[:80],
             })
 
-        # State change (disabled, checked, value, aria-expanded, …)
+        # State change (disabled, checked, value, aria-expanded, …):
+        # before's keys in order, then keys only the after state has
         bs = bn.get("state") or {}
         as_ = an.get("state") or {}
-        all_state_keys = set(bs) | set(as_)
-        for sk in all_state_keys:
-            bv = bs.get(sk)
-            av = as_.get(sk)
-            if bv != av:
-                changed_all.append({
-                    "hid": an.get("hid", ""),
-                    "tag": an.get("tag", ""),
-                    "label": (an.get("label") or "")[:120],
-                    "field": f"state.{sk}",
-                    "before": str(bv) if bv is not None else "",
-                    "after": str(av) if av is not None else "",
-                })
+        if bs != as_:
+            state_keys = list(bs)
+            state_keys.extend(sk for sk in as_ if sk not in bs)
+            for sk in state_keys:
+                bv = bs.get(sk)
+                av = as_.get(sk)
+                if bv != av:
+                    changed_all.append({
+                        "hid": hid,
+                        "tag": tag,
+                        "label": label,
+                        "field": f"state.{sk}",
+                        "before": str(bv) if bv is not None else "",
+                        "after": str(av) if av is not None else "",
+                    })
 
         # Actions change
         ba = bn.get("actions") or []
         aa = an.get("actions") or []
         if ba != aa:
             changed_all.append({
-                "hid": an.get("hid", ""),
-                "tag": an.get("tag", ""),
-                "label": (an.get("label") or "")[:120],
+                "hid": hid,
+                "tag": tag,
+                "label": label,
                 "field": "actions",
                 "before": "/".join(ba),
                 "after": "/".join(aa),
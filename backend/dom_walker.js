@@ -1,9 +1,9 @@
 /**
  * dom_walker.js — Browser-side DOM walker for Clawome.
  *
- * Called via page.evaluate(code, cfg).
- * Walks the live DOM, returns a flat JSON node list that Python can
- * filter / compress / format without needing BeautifulSoup.
+ * Registered as window.__bWalker and called with cfg.
+ * Walks the live DOM, returns a flat node list (in columnar form) that
+ * Python can filter / compress / format without needing BeautifulSoup.
  *
  * cfg shape: {
  *   skipTags, inlineTags, attrRules, globalAttrs, stateAttrs,
@@ -77,7 +77,30 @@
 
     // 0b. Assign data-bid + icons (visibility is checked live in Phase 1)
     let bidCounter = 0
-    const semRegexes = SEMANTIC.map(w => new RegExp('(?:^|[\\s_-])' + w + '(?:$|[\\s_-])'))
+    // Semantic class keywords.  A plain alphanumeric keyword matches exactly
+    // when it is a whole [\s_-]-separated token of the class string, so those
+    // are one Map lookup per token (earliest list position wins); any other
+    // keyword keeps its regex.
+    const SEM_SEP = /[\s_-]+/
+    const semIndex = new Map()
+    const semComplex = []
+    SEMANTIC.forEach((w, j) => {
+        if (/^[A-Za-z0-9]+$/.test(w)) { if (!semIndex.has(w)) semIndex.set(w, j) }
+        else semComplex.push([j, new RegExp('(?:^|[\\s_-])' + w + '(?:$|[\\s_-])')])
+    })
+    function semanticKeyword(nc) {
+        let best = -1
+        for (const tok of nc.split(SEM_SEP)) {
+            const j = semIndex.get(tok)
+            if (j !== undefined && (best < 0 || j < best)) best = j
+        }
+        for (const [j, re] of semComplex) {
+            if (best >= 0 && j >= best) break
+            if (re.test(nc)) { best = j; break }
+        }
+        return best < 0 ? '' : SEMANTIC[best]
+    }
+    const INTER_TAGS = new Set(['a','button','input','select','textarea'])
 
     document.body.querySelectorAll('*').forEach(el => {
         el.setAttribute('data-bid', String(++bidCounter))
@@ -112,7 +135,6 @@
             if (svgTitle && svgTitle.textContent) icon = svgTitle.textContent.trim()
         }
         if (!icon) {
-            const INTER_TAGS = new Set(['a','button','input','select','textarea'])
             const isInter = INTER_TAGS.has(el.tagName.toLowerCase())
                 || el.getAttribute('role') === 'button'
                 || el.getAttribute('role') === 'link'
@@ -121,9 +143,8 @@
             for (let i = 0; i < maxLevels && node && node !== document.body; i++) {
                 const nc = typeof node.className === 'string' ? node.className.toLowerCase() : ''
                 if (nc) {
-                    for (let j = 0; j < SEMANTIC.length; j++) {
-                        if (semRegexes[j].test(nc)) { icon = SEMANTIC[j]; break }
-                    }
+                    const kw = semanticKeyword(nc)
+                    if (kw) icon = kw
                 }
                 if (icon) break
                 node = node.parentElement
@@ -287,21 +308,42 @@
         return false
     }
 
-    function buildXPath(el) {
-        const parts = []
-        let node = el
-        while (node && node.nodeType === 1 && node !== document.documentElement) {
-            const parent = node.parentElement
-            if (!parent) { parts.unshift(node.tagName.toLowerCase()); break }
-            const siblings = Array.from(parent.children).filter(c => c.tagName === node.tagName)
-            if (siblings.length === 1) {
-                parts.unshift(node.tagName.toLowerCase())
-            } else {
-                parts.unshift(node.tagName.toLowerCase() + '[' + (siblings.indexOf(node) + 1) + ']')
+    // XPaths are memoized per element: a child's path extends its parent's,
+    // and sibling positions are counted once per parent, instead of
+    // re-walking every ancestor chain for each emitted node.
+    const xpathCache = new Map()
+    const siblingSuffixes = new Map()
+
+    function siblingSuffix(el, parent) {
+        let suffixes = siblingSuffixes.get(parent)
+        if (!suffixes) {
+            suffixes = new Map()
+            const counts = new Map()
+            for (const c of parent.children) counts.set(c.tagName, (counts.get(c.tagName) || 0) + 1)
+            const seen = new Map()
+            for (const c of parent.children) {
+                const n = (seen.get(c.tagName) || 0) + 1
+                seen.set(c.tagName, n)
+                suffixes.set(c, counts.get(c.tagName) === 1 ? '' : '[' + n + ']')
             }
-            node = parent
+            siblingSuffixes.set(parent, suffixes)
+        }
+        return suffixes.get(el)
+    }
+
+    function buildXPath(el) {
+        let xp = xpathCache.get(el)
+        if (xp !== undefined) return xp
+        const tag = el.tagName.toLowerCase()
+        const parent = el.parentElement
+        if (!parent) {
+            xp = '/' + tag
+        } else {
+            const prefix = parent === document.documentElement ? '' : buildXPath(parent)
+            xp = prefix + '/' + tag + siblingSuffix(el, parent)
         }
-        return '/' + parts.join('/')
+        xpathCache.set(el, xp)
+        return xp
     }
 
     function fmtAttrs(el, tag) {
@@ -540,14 +582,13 @@
 
                 counter++
                 const bid = child.getAttribute('data-bid')
-                const selector = bid ? '[data-bid="' + bid + '"]' : ''
                 results.push({
                     idx: counter,
                     depth: depth,
                     tag: 'svg',
                     attrs: icon ? 'aria-label="' + icon + '"' : '',
                     text: '[icon: ' + icon + ']',
-                    selector: selector,
+                    bid: bid || '',
                     xpath: buildXPath(child),
                     actions: [],
                     label: '[icon: ' + icon + ']',
@@ -590,7 +631,7 @@
                     tag: 'tr',
                     attrs: fmtAttrs(child, 'tr'),
                     text: rowText,
-                    selector: bid ? '[data-bid="' + bid + '"]' : '',
+                    bid: bid || '',
                     xpath: buildXPath(child),
                     actions: [],
                     label: rowText,
@@ -628,7 +669,6 @@
             const text = collectText(child)
             const attrs = fmtAttrs(child, tag)
             const bid = child.getAttribute('data-bid')
-            const selector = bid ? '[data-bid="' + bid + '"]' : ''
             const xpath = buildXPath(child)
             const actions = detectActions(child, tag)
             const state = detectState(child, tag)
@@ -707,7 +747,7 @@
                 tag: tag,
                 attrs: attrs,
                 text: displayText,
-                selector: selector,
+                bid: bid || '',
                 xpath: xpath,
                 actions: actions,
                 label: label,
@@ -732,5 +772,46 @@
     }
 
     walk(document.body, 0)
-    return results
+
+    // ── Columnar result ──
+    // One array per field instead of one object per node, so field names
+    // cross CDP once rather than per node; tag names are sent as indexes
+    // into a small table (as are the few distinct action lists), and
+    // selectors as bare bids.  Python rebuilds the node dicts
+    // (browser_manager._nodes_from_columns), sharing the table entries.
+    const tags = []
+    const tagIndex = new Map()
+    const actionSets = []
+    const actionIndex = new Map()
+    const cols = {
+        depth: [], tag: [], attrs: [], text: [], bid: [], xpath: [],
+        actions: [], label: [], formLabel: [], state: [], inlined: [],
+    }
+    for (const r of results) {
+        let t = tagIndex.get(r.tag)
+        if (t === undefined) {
+            t = tags.length
+            tags.push(r.tag)
+            tagIndex.set(r.tag, t)
+        }
+        cols.depth.push(r.depth)
+        cols.tag.push(t)
+        cols.attrs.push(r.attrs)
+        cols.text.push(r.text)
+        cols.bid.push(r.bid)
+        cols.xpath.push(r.xpath)
+        const akey = r.actions.join(' ')
+        let a = actionIndex.get(akey)
+        if (a === undefined) {
+            a = actionSets.length
+            actionSets.push(r.actions)
+            actionIndex.set(akey, a)
+        }
+        cols.actions.push(a)
+        cols.label.push(r.label)
+        cols.formLabel.push(r.formLabel || '')
+        cols.state.push(r.state)
+        cols.inlined.push(r.inlined)
+    }
+    return {tags: tags, actionSets: actionSets, cols: cols}
 }
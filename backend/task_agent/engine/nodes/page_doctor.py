@@ -13,6 +13,11 @@ import time
 
 from langchain_core.messages import SystemMessage, HumanMessage
 
+try:
+    import ahocorasick  # pyahocorasick — one pass for all obstacle keywords
+except ImportError:
+    ahocorasick = None
+
 from llm import get_llm
 from browser import api as browser_api
 from models.state import AgentState
@@ -107,9 +112,28 @@ _OBSTACLE_KEYWORDS = [
 ]
 
 
+def _build_obstacle_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in _OBSTACLE_KEYWORDS:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+_OBSTACLE_AUTOMATON = _build_obstacle_automaton()
+
+
 def _has_obstacle_signals(dom: str, title: str) -> bool:
-    """Quick keyword scan for page obstacles."""
+    """Quick keyword scan for page obstacles.
+
+    With pyahocorasick this is a single sweep over the text that stops at
+    the first keyword; otherwise one substring scan per keyword.
+    """
     text = (dom + " " + title).lower()
+    if _OBSTACLE_AUTOMATON is not None:
+        return next(_OBSTACLE_AUTOMATON.iter(text), None) is not None
     return any(kw in text for kw in _OBSTACLE_KEYWORDS)
 
 
@@ -0,0 +1,25 @@
+"""
+WSGI entry point — run the Flask app under gunicorn instead of the dev server.
+
+    gunicorn -k gthread -w 1 --threads 32 -b 127.0.0.1:5001 wsgi:app
+
+Keep a single worker: the BrowserManager (and its Playwright thread) lives
+in-process, so multiple workers would each launch their own browser.
+Threaded workers are used rather than gevent — monkey-patching replaces
+threading with greenlets, which breaks the dedicated Playwright thread that
+_PlaywrightThreadProxy dispatches to (Playwright's sync API runs its own
+greenlet loop).
+"""
+
+import os
+import threading
+
+import app as _app_module
+
+_app_module._PORT = int(os.environ.get("CLAWOME_PORT", "5001"))
+
+from task_agent.chat.orchestrator import warmup
+
+threading.Thread(target=warmup, daemon=True).start()
+
+app = _app_module.app
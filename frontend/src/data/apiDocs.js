@@ -210,7 +210,7 @@ def process(dom_nodes):
 
 ## List Scripts
 
-List all compressor scripts with metadata, source code, and URL patterns.
+List all compressor scripts with metadata and URL patterns. Source code is left out unless \`?include_code=1\` is passed — use **Read Script** to fetch one script's code.
 
 \`\`\`
 GET /api/compressors
@@ -226,14 +226,12 @@ GET /api/compressors
       "name": "default",
       "description": "General-purpose DOM compressor",
       "builtin": true,
-      "code": "...",
       "url_patterns": []
     },
     {
       "name": "google_search",
       "description": "Optimized for Google search results",
       "builtin": false,
-      "code": "...",
       "url_patterns": ["*google.com/search*"]
     }
   ]
@@ -345,7 +343,7 @@ All runtime settings can be read and updated via the config API. Changes are per
 | \`hover_timeout\` | int | 5000 | Hover action timeout (ms) |
 | \`scroll_timeout\` | int | 5000 | Scroll action timeout (ms) |
 | \`wait_for_element_timeout\` | int | 10000 | Wait-for-element timeout (ms) |
-| \`type_delay\` | int | 20 | Delay between keystrokes (ms) |
+| \`type_delay\` | int | 20 | Delay between keystrokes (ms); 0 inserts the text at once without key events |
 | \`scroll_pixels\` | int | 500 | Default scroll distance (px) |
 | \`headless\` | bool | false | Run browser in headless mode |
 | \`compressor_rules\` | list | [] | Platform-level URL → compressor mapping rules |
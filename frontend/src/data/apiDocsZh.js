@@ -188,7 +188,7 @@ def process(dom_nodes):
 
 ## 列出脚本
 
-列出所有 compressor 脚本及其元数据、源代码和 URL 模式。
+列出所有 compressor 脚本及其元数据和 URL 模式。默认不包含源代码，传入 \`?include_code=1\` 才会返回 —— 单个脚本的代码请用**读取脚本**接口获取。
 
 \`\`\`
 GET /api/compressors
@@ -204,14 +204,12 @@ GET /api/compressors
       "name": "default",
       "description": "General-purpose DOM compressor",
       "builtin": true,
-      "code": "...",
       "url_patterns": []
     },
     {
       "name": "google_search",
       "description": "Optimized for Google search results",
       "builtin": false,
-      "code": "...",
       "url_patterns": ["*google.com/search*"]
     }
   ]
@@ -323,7 +321,7 @@ configuration: `# 配置
 | \`hover_timeout\` | int | 5000 | 悬停操作超时时间（毫秒） |
 | \`scroll_timeout\` | int | 5000 | 滚动操作超时时间（毫秒） |
 | \`wait_for_element_timeout\` | int | 10000 | 等待元素超时时间（毫秒） |
-| \`type_delay\` | int | 20 | 按键之间的延迟（毫秒） |
+| \`type_delay\` | int | 20 | 按键之间的延迟（毫秒）；0 表示一次性插入文本，不触发按键事件 |
 | \`scroll_pixels\` | int | 500 | 默认滚动距离（像素） |
 | \`headless\` | bool | false | 以无头模式运行浏览器 |
 | \`compressor_rules\` | list | [] | 平台级 URL → compressor 映射规则 |
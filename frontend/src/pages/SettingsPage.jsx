@@ -1,8 +1,8 @@
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useCallback, useRef } from 'react'
 import { useTranslation } from 'react-i18next'
 import {
   getConfig, setConfig, resetConfig,
-  getCompressors, saveCompressor, deleteCompressor, getCompressorTemplate,
+  getCompressors, getCompressorCode, saveCompressor, deleteCompressor, getCompressorTemplate,
 } from '../api'
 import './SettingsPage.css'
 
@@ -141,6 +141,7 @@ const SECTION_GROUPS = {
         { key: 'hover_timeout', label: 'Hover Timeout', unit: 'ms', desc: 'settings.hoverTimeoutDesc' },
         { key: 'scroll_timeout', label: 'Scroll Timeout', unit: 'ms', desc: 'settings.scrollTimeoutDesc' },
         { key: 'wait_for_element_timeout', label: 'Wait for Element', unit: 'ms', desc: 'settings.waitElementDesc' },
+        { key: 'action_hard_timeout', label: 'Hard Action Timeout', unit: 'ms', desc: 'settings.hardTimeoutDesc' },
       ],
     },
     {
@@ -148,6 +149,7 @@ const SECTION_GROUPS = {
       items: [
         { key: 'benchmark_timeout', label: 'Benchmark Nav Timeout', unit: 'ms', desc: 'settings.benchNavDesc' },
         { key: 'benchmark_idle_wait', label: 'Benchmark Idle Wait', unit: 'ms', desc: 'settings.benchIdleDesc' },
+        { key: 'benchmark_concurrency', label: 'Benchmark Concurrency', unit: '', desc: 'settings.benchConcurrencyDesc' },
       ],
     },
   ],
@@ -205,6 +207,20 @@ export default function SettingsPage() {
   const [disabledCompressors, setDisabledCompressors] = useState([])
   const [compressorSettings, setCompressorSettings] = useState({})
   const [scriptSubTab, setScriptSubTab] = useState('settings') // 'settings' | 'source'
+  const selectedScriptRef = useRef(null)
+
+  // The script list carries metadata only; source is fetched per script.
+  // A late response for a script that is no longer selected is dropped.
+  const loadScriptCode = useCallback(async (name) => {
+    selectedScriptRef.current = name
+    setEditCode('')
+    try {
+      const res = await getCompressorCode(name)
+      if (selectedScriptRef.current === name) setEditCode(res.data.code)
+    } catch (err) {
+      console.error('Failed to load script:', err)
+    }
+  }, [])
 
   const load = useCallback(async () => {
     try {
@@ -227,14 +243,14 @@ export default function SettingsPage() {
       if (compRes.data.scripts.length > 0) {
         const def = compRes.data.scripts.find(s => s.name === 'default') || compRes.data.scripts[0]
         setSelectedScript(def.name)
-        setEditCode(def.code)
+        loadScriptCode(def.name)
       }
     } catch (err) {
       console.error('Failed to load:', err)
     } finally {
       setLoading(false)
     }
-  }, [])
+  }, [loadScriptCode])
 
   useEffect(() => { load() }, [load])
 
@@ -358,7 +374,7 @@ export default function SettingsPage() {
     const s = scripts.find(sc => sc.name === name)
     if (s) {
       setSelectedScript(name)
-      setEditCode(s.code)
+      loadScriptCode(name)
       setCodeModified(false)
       // Auto-select appropriate sub-tab
       const hasSettings = s.settings && s.settings.length > 0
@@ -381,6 +397,7 @@ export default function SettingsPage() {
       const updated = await getCompressors()
       setScripts(updated.data.scripts)
       setSelectedScript(clean)
+      selectedScriptRef.current = clean
       setEditCode(code)
       setCodeModified(false)
     } catch (err) {